@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Optional, Tuple
+from fff_layouts import FilterAndConverter
+from fff_engine import CompiledSegment, extract_records, quarantine_frame
+
+
+# Arrow engine (FFFParser(engine='arrow')): the counterparts of extract_segment, validate_segment and convert_segment
+# producing a pyarrow Table with no pandas in between. The records go straight into Arrow string arrays, and the
+# FilterAndConverter checks and conversions used by the layouts run as pyarrow.compute kernels (see _CHECK_KERNELS
+# and _CONVERT_KERNELS). The few one-off lambdas of the layouts run per value on the Python strings.
+# The kernels give the same results as the Python functions; values outside the simple shapes a kernel handles
+# (e.g. '+12' or ' $5K' for an amount) go through the Python function, so the edge cases stay identical.
+def extract_segment_arrow(compiled: CompiledSegment, mfiles: list, ids: list, dates: list, index: dict,
+                          declared: Optional[np.ndarray] = None) -> Tuple[pa.Table, list]:
+    records, mismatches = extract_records(compiled, mfiles, ids, dates, index, declared)
+    columns = list(zip(*records)) if len(records) > 0 else [()] * len(compiled.columns)
+    n_fields = len(compiled.field_names)
+    types = [pa.string(), pa.date32()] + [pa.string()] * n_fields + [pa.string(), pa.string(), pa.int64()]
+    arrays = [pa.array(column, type=arrow_type) for column, arrow_type in zip(columns, types)]
+    return pa.Table.from_arrays(arrays, names=compiled.columns), mismatches
+
+
+# Same semantics as validate_segment, including the failed_checks bitmask of the rejected records
+def validate_segment_arrow(compiled: CompiledSegment, table: pa.Table, failures: Optional[list] = None,
+                           rejected: Optional[list] = None) -> pa.Table:
+    if len(compiled.checks) == 0:
+        return table
+    passed = {}
+    for check, column, func in compiled.checks:
+        result = _run(table, column, func, _CHECK_KERNELS, failures, pa.bool_())
+        passed[check] = pc.fill_null(result, False).to_numpy(zero_copy_only=False)
+    grouped = set(c for group in compiled.either for c in group)
+    keep = np.ones(table.num_rows, dtype=bool)
+    reasons = np.zeros(table.num_rows, dtype=np.int64) if rejected is not None else None
+    for bit, (check, _, _) in enumerate(compiled.checks):
+        if check not in grouped:
+            keep &= passed[check]
+            if reasons is not None:
+                reasons |= np.where(passed[check], 0, 1 << bit)
+    for group in compiled.either:
+        group_passed = np.logical_or.reduce([passed[check] for check in group])
+        keep &= group_passed
+        if reasons is not None:
+            bits = sum(1 << compiled.check_bits[check] for check in group)
+            reasons |= np.where(group_passed, 0, bits)
+    if reasons is not None and not keep.all():
+        failed_checks = reasons[~keep]
+        failed = table.filter(pa.array(~keep))
+        failed = failed.append_column('failed_checks', pa.array(failed_checks, type=pa.int64()))
+        failed = failed.append_column('failed_check_names', pa.array([compiled.check_names(int(mask)) for mask in failed_checks], type=pa.string()))
+        rejected.append(failed)
+    return table.filter(pa.array(keep))
+
+
+def convert_segment_arrow(compiled: CompiledSegment, table: pa.Table, failures: Optional[list] = None) -> pa.Table:
+    for column, source, func, dtype in compiled.converters:
+        converted = _run(table, source, func, _CONVERT_KERNELS, failures, pa.int64() if dtype == 'Int64' else None)
+        if column in table.column_names:
+            table = table.set_column(table.column_names.index(column), column, converted)
+        else:
+            table = table.append_column(column, converted)
+    return table
+
+
+def quarantine_failures_arrow(compiled: CompiledSegment, table: pa.Table, failures: list):
+    quarantine = quarantine_frame(compiled, failures)
+    failed = set(zip(quarantine['bus_ptnr'], quarantine['file_date']))
+    if table.num_rows > 0:
+        keys = zip(table['bus_ptnr'].to_pylist(), table['file_date'].to_pylist())
+        table = table.filter(pa.array([key not in failed for key in keys], type=pa.bool_()))
+    return table, quarantine
+
+
+# A check/conversion on one column: the compute kernel of the function when there is one, else the function per value.
+# As in _apply_isolated, only a function raising on the column is redone value by value, recording the failing rows.
+# A column built by a function without kernel from no rows, or only missing values, comes out null-typed: it is read
+# as strings, the type of the extracted fields, since the kernels have no null-typed inputs.
+def _run(table: pa.Table, column: str, func, kernels: dict, failures: Optional[list], arrow_type) -> pa.Array:
+    values = table[column].combine_chunks()
+    if pa.types.is_null(values.type):
+        values = values.cast(pa.string())
+    kernel = kernels.get(func)
+    if kernel is not None:
+        return kernel(values)
+    strings = values.to_pylist()
+    try:
+        return _to_arrow([func(value) for value in strings], arrow_type)
+    except Exception:
+        if failures is None:
+            raise
+    results = []
+    ids, dates, codes = table['bus_ptnr'].to_pylist(), table['file_date'].to_pylist(), table['segment_code'].to_pylist()
+    for row, value in enumerate(strings):
+        try:
+            results.append(func(value))
+        except Exception as e:
+            results.append(None)
+            failures.append((ids[row], dates[row], codes[row], column, e))
+    return _to_arrow(results, arrow_type)
+
+
+# the Python functions return pd.NA (and NaN) for missing values, both become nulls
+def _to_arrow(values: list, arrow_type) -> pa.Array:
+    values = [None if value is pd.NA or (isinstance(value, float) and value != value) else value for value in values]
+    return pa.array(values, type=arrow_type)
+
+
+# Python fallback for the values a kernel leaves undecided (mask True); usually none, so usually free
+def _patch(result: pa.Array, values: pa.Array, mask: pa.Array, func, arrow_type) -> pa.Array:
+    undecided = np.flatnonzero(pc.fill_null(mask, False).to_numpy(zero_copy_only=False))
+    if len(undecided) == 0:
+        return result
+    patched = result.to_pylist()
+    for row in undecided:
+        patched[row] = func(values[row].as_py())
+    return _to_arrow(patched, arrow_type)
+
+
+def _blank(values: pa.Array) -> pa.Array:
+    return pc.equal(pc.utf8_trim_whitespace(values), '')
+
+
+def _filter_6digits_date(values: pa.Array) -> pa.Array:
+    stripped = pc.utf8_trim_whitespace(values)
+    return pc.or_(pc.and_(pc.utf8_is_digit(stripped), pc.equal(pc.utf8_length(stripped), 6)), pc.equal(stripped, ''))
+
+
+def _filter_member_number(values: pa.Array) -> pa.Array:
+    stripped = pc.utf8_trim_whitespace(values)
+    check = pc.and_(pc.utf8_is_digit(pc.utf8_slice_codeunits(stripped, 0, 3)),
+                    pc.utf8_is_alpha(pc.utf8_slice_codeunits(stripped, 3, 5)))
+    check = pc.and_(check, pc.utf8_is_digit(pc.utf8_slice_codeunits(stripped, 5)))
+    return pc.or_(check, pc.equal(stripped, ''))
+
+
+def _filter_valid_name(values: pa.Array) -> pa.Array:
+    valid = pc.invert(pc.or_(pc.starts_with(values, ' '), pc.match_substring_regex(values, r'[/*]|\p{Nd}')))
+    return pc.or_(_blank(values), valid)
+
+
+def _filter_first_not_null(values: pa.Array) -> pa.Array:
+    return pc.or_(_blank(values), pc.invert(pc.starts_with(values, ' ')))
+
+
+def _filter_industry_code(values: pa.Array) -> pa.Array:
+    stripped = pc.utf8_trim_whitespace(values)
+    return pc.or_(pc.equal(stripped, ''), pc.and_(pc.equal(pc.utf8_length(stripped), 2), pc.utf8_is_alpha(stripped)))
+
+
+def _convert_int_with_missing(values: pa.Array) -> pa.Array:
+    stripped = pc.utf8_trim_whitespace(values)
+    simple = pc.match_substring_regex(stripped, r'^\d{1,18}$')
+    result = pc.cast(pc.if_else(simple, stripped, None), pa.int64())
+    return _patch(result, values, pc.and_(pc.invert(simple), pc.not_equal(stripped, '')),
+                  FilterAndConverter.convert_int_with_missing, pa.int64())
+
+
+def _convert_float_with_missing(values: pa.Array) -> pa.Array:
+    stripped = pc.utf8_trim_whitespace(values)
+    simple = pc.match_substring_regex(stripped, r'^\d{1,15}(\.\d{1,15})?$')
+    result = pc.cast(pc.if_else(simple, stripped, None), pa.float64())
+    return _patch(result, values, pc.and_(pc.invert(simple), pc.not_equal(stripped, '')),
+                  FilterAndConverter.convert_float_with_missing, pa.float64())
+
+
+# '$' prefix dropped, K/M suffixes multiplied out
+def _convert_amount_from_str(values: pa.Array) -> pa.Array:
+    stripped = pc.utf8_trim_whitespace(values)
+    simple = pc.match_substring_regex(stripped, r'^\$?\d{1,12}[KM]?$')
+    digits = pc.cast(pc.if_else(simple, pc.replace_substring_regex(stripped, r'[$KM]', ''), None), pa.int64())
+    scale = pc.if_else(pc.ends_with(stripped, 'K'), 1000, pc.if_else(pc.ends_with(stripped, 'M'), 1000000, 1))
+    result = pc.multiply(digits, pc.cast(scale, pa.int64()))
+    return _patch(result, values, pc.and_(pc.invert(simple), pc.not_equal(stripped, '')),
+                  FilterAndConverter.convert_amount_from_str, pa.int64())
+
+
+# 'MM/DD/YYYY' (any separators), as FilterAndConverter.convert_8digits_date
+def _convert_8digits_date(values: pa.Array) -> pa.Array:
+    stripped = pc.utf8_trim_whitespace(values)
+    simple = pc.match_substring_regex(stripped, r'^\d{2}.\d{2}.\d{4}$')
+    iso = pc.binary_join_element_wise(pc.utf8_slice_codeunits(stripped, 6), pc.utf8_slice_codeunits(stripped, 0, 2),
+                                      pc.utf8_slice_codeunits(stripped, 3, 5), '-')
+    parsed = pc.strptime(pc.if_else(simple, iso, None), format='%Y-%m-%d', unit='s', error_is_null=True)
+    # strptime rolls invalid days over (02/30 -> 03/01) and takes year 0, where date() raises; those are nulls as in
+    # the Python function
+    result = pc.cast(parsed, pa.date32())
+    valid = pc.and_(pc.equal(pc.strftime(result, format='%Y-%m-%d'), iso), pc.greater(pc.year(result), 0))
+    result = pc.if_else(valid, result, None)
+    return _patch(result, values, pc.and_(pc.invert(simple), pc.not_equal(stripped, '')),
+                  FilterAndConverter.convert_8digits_date, pa.date32())
+
+
+_CHECK_KERNELS = {
+    FilterAndConverter.filter_6digits_date: _filter_6digits_date,
+    FilterAndConverter.filter_member_number: _filter_member_number,
+    FilterAndConverter.filter_valid_name: _filter_valid_name,
+    FilterAndConverter.filter_first_not_null: _filter_first_not_null,
+    FilterAndConverter.filter_industry_code: _filter_industry_code,
+}
+
+_CONVERT_KERNELS = {
+    FilterAndConverter.convert_int_with_missing: _convert_int_with_missing,
+    FilterAndConverter.convert_float_with_missing: _convert_float_with_missing,
+    FilterAndConverter.convert_amount_from_str: _convert_amount_from_str,
+    FilterAndConverter.convert_8digits_date: _convert_8digits_date,
+}
@@ -0,0 +1,364 @@
+import os
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+from typing import Optional
+
+
+# An on-disk cache of parsed segment records, keyed by a hash of the report (mfile), the segment name and the version of
+# its compiled layout (CompiledSegment.version), so records parsed by another parser version are never reused.
+# The kept and the rejected records of a report ({'records': [...], 'rejected': [...]}) are stored without
+# bus_ptnr/file_date, so an identical report pulled for another id/date can reuse them.
+# When the total payload size goes over max_bytes, the least recently used entries are evicted.
+# One instance can be shared by the parse workers of several threads; its calls are serialized.
+class ParseCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(os.path.join(cache_dir, 'parse_cache.sqlite'), check_same_thread=False, timeout=60)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                report_hash TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                nbytes INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (report_hash, segment)
+            )
+            """
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_records_last_used ON records (last_used)')
+        self.conn.commit()
+
+    @staticmethod
+    def hash_report(mfile: str) -> str:
+        return hashlib.blake2b(mfile.encode('utf-8', errors='surrogatepass'), digest_size=16).hexdigest()
+
+    # the segment column holds segment@version; the entries of other versions are left to the eviction
+    @staticmethod
+    def _segment_key(segment: str, version: str) -> str:
+        return f'{segment}@{version}'
+
+    def get_many(self, report_hashes: list, segment: str, version: str) -> dict:
+        segment = self._segment_key(segment, version)
+        with self.lock:
+            output = {}
+            report_hashes = list(report_hashes)
+            # sqlite caps the number of bound parameters, so look the hashes up in slices
+            for start in range(0, len(report_hashes), 900):
+                chunk = report_hashes[start:start + 900]
+                placeholders = ', '.join(['?'] * len(chunk))
+                rows = self.conn.execute(
+                    f'SELECT report_hash, payload FROM records WHERE segment = ? AND report_hash IN ({placeholders})',
+                    [segment] + chunk
+                ).fetchall()
+                for report_hash, payload in rows:
+                    output[report_hash] = pickle.loads(payload)
+            if len(output) > 0:
+                now = time.time()
+                self.conn.executemany(
+                    'UPDATE records SET last_used = ? WHERE report_hash = ? AND segment = ?',
+                    [(now, h, segment) for h in output.keys()]
+                )
+                self.conn.commit()
+            return output
+
+    def put_many(self, records: dict, segment: str, version: str):
+        segment = self._segment_key(segment, version)
+        with self.lock:
+            if len(records) == 0:
+                return
+            now = time.time()
+            rows = []
+            for report_hash, recs in records.items():
+                payload = pickle.dumps(recs, protocol=pickle.HIGHEST_PROTOCOL)
+                rows.append((report_hash, segment, payload, len(payload), now))
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO records (report_hash, segment, payload, nbytes, last_used) VALUES (?, ?, ?, ?, ?)', rows
+            )
+            self.conn.commit()
+            self._evict()
+
+    def total_bytes(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COALESCE(SUM(nbytes), 0) FROM records').fetchone()[0]
+
+    def _evict(self):
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        freed = 0
+        victims = []
+        for report_hash, segment, nbytes in self.conn.execute(
+            'SELECT report_hash, segment, nbytes FROM records ORDER BY last_used'
+        ):
+            victims.append((report_hash, segment))
+            freed += nbytes
+            if freed >= excess:
+                break
+        self.conn.executemany('DELETE FROM records WHERE report_hash = ? AND segment = ?', victims)
+        self.conn.commit()
+
+    def clear(self, segment: Optional[str] = None):
+        with self.lock:
+            if segment is None:
+                self.conn.execute('DELETE FROM records')
+            else:
+                self.conn.execute('DELETE FROM records WHERE segment = ? OR segment LIKE ?', (segment, f'{segment}@%'))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+# An on-disk cache of fetched raw data, one Arrow IPC file per fetch query. The key is a hash of the query text, which
+# holds every parameter of _construct_fetch_query (source, date range, debug limit, shard filters, ordering), so a
+# different fetch never reuses another's rows. A cached month is opened memory-mapped: reparsing it starts at once,
+# and the worker processes reading the same month share its pages. Over max_bytes, the least recently used files are
+# evicted; invalidate() drops the entries of a range of months explicitly (e.g. after the source table was corrected).
+class RawCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 20 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(os.path.join(cache_dir, 'raw_cache.sqlite'), check_same_thread=False, timeout=60)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fetches (
+                key TEXT PRIMARY KEY,
+                begin_month INTEGER NOT NULL,
+                end_month INTEGER NOT NULL,
+                fetch_query TEXT NOT NULL,
+                n_rows INTEGER NOT NULL,
+                nbytes INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        # point-lookup index: every cached report by business_partner_id and id -> (fetch file, row offset)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reports (
+                key TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                business_partner_id TEXT,
+                id TEXT,
+                file_date TEXT,
+                PRIMARY KEY (key, row)
+            )
+            """
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_reports_bp ON reports (business_partner_id, file_date)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_reports_id ON reports (id)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS indexed (key TEXT PRIMARY KEY)')
+        self.conn.commit()
+
+    @staticmethod
+    def key(fetch_query: str) -> str:
+        normalized = ' '.join(fetch_query.split())
+        return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.arrow')
+
+    # the cached rows of the query as an Arrow table backed by the memory-mapped file, or None
+    def get(self, fetch_query: str):
+        import pyarrow as pa
+        key = self.key(fetch_query)
+        with self.lock:
+            row = self.conn.execute('SELECT key FROM fetches WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            path = self._path(key)
+            if not os.path.exists(path):
+                self.conn.execute('DELETE FROM fetches WHERE key = ?', (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute('UPDATE fetches SET last_used = ? WHERE key = ?', (time.time(), key))
+            self.conn.commit()
+        return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+    # begin_month/end_month as YYYYMM, used by invalidate
+    def put(self, fetch_query: str, frame, begin_month: int, end_month: int):
+        writer = self.writer(fetch_query, begin_month, end_month)
+        writer.write(frame)
+        writer.commit()
+
+    # for results arriving in pages (chunked runs): write() each page, commit() at the end; an uncommitted writer
+    # leaves nothing behind, so an interrupted fetch is never taken for a complete one
+    def writer(self, fetch_query: str, begin_month: int, end_month: int) -> 'RawCacheWriter':
+        return RawCacheWriter(self, self.key(fetch_query), fetch_query, begin_month, end_month)
+
+    def _register(self, key: str, fetch_query: str, begin_month: int, end_month: int, n_rows: int):
+        with self.lock:
+            now = time.time()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO fetches VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, begin_month, end_month, fetch_query, n_rows, os.path.getsize(self._path(key)), now, now)
+            )
+            self.conn.commit()
+            self._index(key)
+            self._evict(keep=key)
+
+    # the id columns of the file just written (memory-mapped, the raw contents are not read) go into the reports index
+    def _index(self, key: str):
+        import pyarrow as pa
+        table = pa.ipc.open_file(pa.memory_map(self._path(key), 'r')).read_all()
+        columns = [name for name in ('business_partner_id', 'id', 'file_date') if name in table.column_names]
+        values = {name: table[name].to_pylist() for name in columns}
+        n_rows = table.num_rows
+        bps = values.get('business_partner_id', [None] * n_rows)
+        ids = values.get('id', [None] * n_rows)
+        dates = [str(d) if d is not None else None for d in values.get('file_date', [None] * n_rows)]
+        self.conn.execute('DELETE FROM reports WHERE key = ?', (key,))
+        self.conn.executemany('INSERT INTO reports VALUES (?, ?, ?, ?, ?)', zip([key] * n_rows, range(n_rows), bps, ids, dates))
+        self.conn.execute('INSERT OR REPLACE INTO indexed VALUES (?)', (key,))
+        self.conn.commit()
+
+    # Raw rows (dicts of the fetched columns) of one consumer (business_partner_id) or one report (id), file_date in
+    # [start, end] when given (dates or 'YYYY-MM-DD'). A report cached in several fetches (a month and its shards, or
+    # overlapping ranges) is returned once, from the most recently written fetch.
+    def find(self, business_partner_id: Optional[str] = None, id: Optional[str] = None, start=None, end=None) -> list:
+        import pyarrow as pa
+        if business_partner_id is None and id is None:
+            raise ValueError('business_partner_id or id is required')
+        with self.lock:
+            for key, in self.conn.execute('SELECT key FROM fetches WHERE key NOT IN (SELECT key FROM indexed)').fetchall():
+                if os.path.exists(self._path(key)):
+                    self._index(key)
+            query = 'SELECT r.key, r.row FROM reports r JOIN fetches f ON f.key = r.key WHERE '
+            if business_partner_id is not None:
+                query += 'r.business_partner_id = ?'
+                params = [business_partner_id]
+            else:
+                query += 'r.id = ?'
+                params = [id]
+            if id is not None and business_partner_id is not None:
+                query += ' AND r.id = ?'
+                params.append(id)
+            if start is not None:
+                query += ' AND r.file_date >= ?'
+                params.append(str(start))
+            if end is not None:
+                query += ' AND r.file_date <= ?'
+                params.append(str(end))
+            locations = self.conn.execute(query + ' ORDER BY f.created DESC, r.row', params).fetchall()
+            if len(locations) > 0:
+                now = time.time()
+                self.conn.executemany('UPDATE fetches SET last_used = ? WHERE key = ?', [(now, k) for k in set(k for k, _ in locations)])
+                self.conn.commit()
+        rows_by_key = {}
+        for key, row in locations:
+            rows_by_key.setdefault(key, []).append(row)
+        output, seen = [], set()
+        for key, rows in rows_by_key.items():
+            if not os.path.exists(self._path(key)):
+                continue
+            table = pa.ipc.open_file(pa.memory_map(self._path(key), 'r')).read_all().take(rows)
+            for record in table.to_pylist():
+                report = (record.get('id'), str(record.get('file_date')))
+                if report not in seen:
+                    seen.add(report)
+                    output.append(record)
+        return sorted(output, key=lambda record: (str(record.get('file_date')), str(record.get('id'))))
+
+    def total_bytes(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COALESCE(SUM(nbytes), 0) FROM fetches').fetchone()[0]
+
+    # the fetch just written is kept even when it alone is over max_bytes
+    def _evict(self, keep: Optional[str] = None):
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        freed = 0
+        victims = []
+        for key, nbytes in self.conn.execute('SELECT key, nbytes FROM fetches WHERE key != ? ORDER BY last_used', (keep or '',)):
+            victims.append(key)
+            freed += nbytes
+            if freed >= excess:
+                break
+        self._delete(victims)
+
+    def _delete(self, keys: list):
+        self.conn.executemany('DELETE FROM fetches WHERE key = ?', [(key,) for key in keys])
+        self.conn.executemany('DELETE FROM reports WHERE key = ?', [(key,) for key in keys])
+        self.conn.executemany('DELETE FROM indexed WHERE key = ?', [(key,) for key in keys])
+        self.conn.commit()
+        # on POSIX a file still memory-mapped by a running parser stays readable until it is closed
+        for key in keys:
+            if os.path.exists(self._path(key)):
+                os.remove(self._path(key))
+
+    # every cached fetch overlapping the months [begin_month, end_month] (YYYYMM), whatever its shards or limits
+    def invalidate(self, begin_month: int, end_month: Optional[int] = None) -> int:
+        end_month = end_month if end_month is not None else begin_month
+        with self.lock:
+            keys = [key for key, in self.conn.execute(
+                'SELECT key FROM fetches WHERE begin_month <= ? AND end_month >= ?', (end_month, begin_month)
+            )]
+            self._delete(keys)
+            return len(keys)
+
+    def clear(self) -> int:
+        with self.lock:
+            keys = [key for key, in self.conn.execute('SELECT key FROM fetches')]
+            self._delete(keys)
+            return len(keys)
+
+    def entries(self) -> list:
+        with self.lock:
+            columns = ['key', 'begin_month', 'end_month', 'n_rows', 'nbytes', 'created', 'last_used']
+            rows = self.conn.execute(f'SELECT {", ".join(columns)} FROM fetches ORDER BY begin_month, end_month, created').fetchall()
+            return [dict(zip(columns, row)) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+# Writes the pages of one fetch to <key>.arrow.tmp and moves it in place on commit. The schema of the first page is
+# kept for the following ones, each page being cast to it; a column all null on the first page is kept as a string
+# column (the raw columns are strings and dates, which both cast to it) rather than as the null type no later page fits.
+class RawCacheWriter:
+    def __init__(self, cache: RawCache, key: str, fetch_query: str, begin_month: int, end_month: int):
+        self.cache = cache
+        self.key = key
+        self.fetch_query = fetch_query
+        self.begin_month = begin_month
+        self.end_month = end_month
+        self.tmp_path = f'{cache._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        self.schema = None
+        self.n_rows = 0
+        self._writer = None
+
+    def write(self, frame):
+        import pyarrow as pa
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            self.schema = pa.schema(
+                [field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in table.schema],
+                metadata=table.schema.metadata
+            )
+            self._writer = pa.ipc.new_file(self.tmp_path, self.schema)
+        self._writer.write_table(table.select(self.schema.names).cast(self.schema))
+        self.n_rows += len(frame)
+
+    def commit(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        os.replace(self.tmp_path, self.cache._path(self.key))
+        self.cache._register(self.key, self.fetch_query, self.begin_month, self.end_month, self.n_rows)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            os.remove(self.tmp_path)
+            self._writer = None
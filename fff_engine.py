@@ -0,0 +1,380 @@
+import re
+import hashlib
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from typing import Optional, Tuple
+from fff_layouts import HEADER_FIELDS, QUARANTINE_SCHEMA, SEGMENT_COUNTER_CODES, SEGMENT_LAYOUTS
+
+
+BASE_COLUMNS = ['bus_ptnr', 'file_date']
+TAIL_COLUMNS = ['segment_code', 'segment_description', 'order_in_segment']
+QUARANTINE_COLUMNS = [name for name, _ in QUARANTINE_SCHEMA]
+# bumped whenever the extraction, the checks, the conversions or the cached payload change in a way the layouts do not
+# show, so that the records cached by an older parser are not reused (see CompiledSegment.version)
+PARSER_VERSION = 2
+
+
+# A segment layout turned into what the parsing loop needs: compiled search patterns, one extraction function
+# returning the fields of a record as a tuple, and the checks/converters.
+class CompiledSegment:
+    def __init__(self, name: str, layout: dict):
+        self.name = name
+        self.table = layout['table']
+        self.attr = layout['attr']
+        self.codes = [
+            (code, re.compile(re.escape(pattern)), shift, description, self._counter_position(code))
+            for code, pattern, shift, description in layout['codes']
+        ]
+        self.field_names = list(layout['fields'].keys())
+        self.columns = BASE_COLUMNS + self.field_names + TAIL_COLUMNS
+        self.extract = eval(f"lambda segment: ({', '.join(layout['fields'].values())},)")
+        self.checks = layout['checks']
+        self.either = layout.get('either', [])
+        self.converters = layout['converters']
+        self.schema = layout['schema']
+        self.check_bits = {check: bit for bit, (check, _, _) in enumerate(self.checks)}
+        self.version = self._version(layout)
+
+    # hash of PARSER_VERSION and everything the layout feeds the parsing: codes, field slices, checks, converters (their
+    # code, not their address) and schema; any change to one of them gives the segment another version
+    @staticmethod
+    def _version(layout: dict) -> str:
+        digest = hashlib.blake2b(str(PARSER_VERSION).encode(), digest_size=8)
+        digest.update(repr([layout['codes'], list(layout['fields'].items()), layout.get('either', []), layout['schema']]).encode())
+        for check, column, func in layout['checks']:
+            digest.update(f'{check}:{column}:'.encode() + _code_fingerprint(func))
+        for column, source, func, dtype in layout['converters']:
+            digest.update(f'{column}:{source}:{dtype}:'.encode() + _code_fingerprint(func))
+        return digest.hexdigest()
+
+    # failed_checks bitmask -> 'check1,check3'
+    def check_names(self, mask: int) -> str:
+        return ','.join(check for check, bit in self.check_bits.items() if mask >> bit & 1)
+
+    @staticmethod
+    def _counter_position(code: str) -> Optional[int]:
+        return SEGMENT_COUNTER_CODES.index(code) if code in SEGMENT_COUNTER_CODES else None
+
+
+def _code_fingerprint(func) -> bytes:
+    code = getattr(getattr(func, '__func__', func), '__code__', None)
+    if code is None:
+        return repr(func).encode()
+    return _code_bytes(code)
+
+
+def _code_bytes(code) -> bytes:
+    consts = b''.join(_code_bytes(const) if hasattr(const, 'co_code') else repr(const).encode() for const in code.co_consts)
+    return code.co_code + consts + repr(code.co_names).encode()
+
+
+# layouts are compiled on first use, so a run only pays for the segments it asks for
+@lru_cache(maxsize=None)
+def compile_segment(name: str) -> CompiledSegment:
+    return CompiledSegment(name, SEGMENT_LAYOUTS[name])
+
+
+# What a run has to do, derived from the requested tables: which segment layouts (and their checks) are compiled,
+# which segment codes the tokenizer looks for and which header fields are sliced
+class ParsePlan:
+    def __init__(self, seg_names: list, header_fields: Optional[list] = None):
+        self.seg_names = list(seg_names)
+        self.segments = {seg: compile_segment(seg) for seg in self.seg_names}
+        if header_fields is None:
+            header_fields = list(HEADER_FIELDS.keys())
+        self.header_fields = {key: HEADER_FIELDS[key] for key in header_fields}
+        self.codes = {}
+        for compiled in self.segments.values():
+            for code, pattern, shift, _, pos in compiled.codes:
+                self.codes[code] = (pattern, shift, pos)
+
+    # Find the positions of the planned segment codes (or only those of `seg`) in each report, in one pass over the
+    # reports. A code declared with zero records is not scanned report by report: the reports declaring it zero are
+    # searched for it all at once, joined into one string, and only a report where it does appear (a wrong counter) is
+    # scanned, so its records are kept and extract_records reports the mismatch.
+    def tokenize(self, mfiles: list, declared: Optional[np.ndarray] = None, seg: Optional[str] = None) -> dict:
+        if seg is None:
+            codes = list(self.codes.keys())
+        else:
+            codes = [code for code, _, _, _, _ in self.segments[seg].codes]
+        n_reports = len(mfiles)
+        code_declared = np.full((n_reports, len(codes)), -1, dtype=np.int64)
+        if declared is not None:
+            for j, code in enumerate(codes):
+                pos = self.codes[code][2]
+                if pos is not None:
+                    code_declared[:, j] = declared[:, pos]
+        index = {code: [[] for _ in range(n_reports)] for code in codes}
+        scanners = [(index[code], self.codes[code][0], self.codes[code][1]) for code in codes]
+        scan = code_declared != 0
+        for j, (_, pattern, _) in enumerate(scanners):
+            scan[_undeclared_rows(mfiles, np.flatnonzero(code_declared[:, j] == 0), pattern), j] = True
+        for row in np.flatnonzero(scan.any(axis=1)):
+            mfile = mfiles[row]
+            row_scan = scan[row]
+            for j, (positions, pattern, shift) in enumerate(scanners):
+                if row_scan[j]:
+                    positions[row] = [m.start() + shift for m in pattern.finditer(mfile)]
+        return index
+
+
+# the rows (among `rows`) whose report holds `pattern` at all, from one search over the reports joined by newlines
+# (which no segment pattern matches across)
+def _undeclared_rows(mfiles: list, rows: np.ndarray, pattern) -> np.ndarray:
+    if len(rows) == 0:
+        return rows
+    texts = [mfiles[row] for row in rows]
+    starts = np.cumsum([0] + [len(text) + 1 for text in texts[:-1]])
+    hits = [m.start() for m in pattern.finditer('\n'.join(texts))]
+    if len(hits) == 0:
+        return rows[:0]
+    return np.unique(rows[np.searchsorted(starts, hits, side='right') - 1])
+
+
+# Decode the header segment_counter of every report at once into an (n_reports, 31) array of declared counts;
+# a count that is not two digits (blank or truncated header) is -1, i.e. unknown and the report has to be scanned
+def decode_segment_counter(counters: pd.Series) -> np.ndarray:
+    start, end = HEADER_FIELDS['segment_counter']
+    width = end - start
+    n_counts = len(SEGMENT_COUNTER_CODES)
+    if len(counters) == 0:
+        return np.zeros((0, n_counts), dtype=np.int64)
+    text = ''.join(c.ljust(width)[:width] if isinstance(c, str) else ' ' * width for c in counters)
+    digits = np.frombuffer(text.encode('ascii', errors='replace'), dtype=np.uint8).astype(np.int64) - ord('0')
+    digits = digits.reshape(len(counters), n_counts, 2)
+    valid = ((digits >= 0) & (digits <= 9)).all(axis=2)
+    counts = digits[:, :, 0] * 10 + digits[:, :, 1]
+    return np.where(valid, counts, -1)
+
+
+# Extract the records of one segment table from a batch of already tokenized reports.
+# The output buffer is sized up front from the counts declared in segment_counter (the counts found where a count is
+# not declared), and only the reports holding the segment are visited. Reports whose found count differs from the
+# declared one, zero included, are returned as mismatches; their records are all kept.
+def extract_segment(compiled: CompiledSegment, mfiles: list, ids: list, dates: list, index: dict,
+                    declared: Optional[np.ndarray] = None) -> Tuple[pd.DataFrame, list]:
+    records, mismatches = extract_records(compiled, mfiles, ids, dates, index, declared)
+    return pd.DataFrame.from_records(records, columns=compiled.columns), mismatches
+
+
+# the record tuples (in compiled.columns order) behind extract_segment, shared with the Arrow engine (fff_arrow.py)
+def extract_records(compiled: CompiledSegment, mfiles: list, ids: list, dates: list, index: dict,
+                    declared: Optional[np.ndarray] = None) -> Tuple[list, list]:
+    code_index = [index[code] for code, _, _, _, _ in compiled.codes]
+    found = np.zeros((len(mfiles), len(code_index)), dtype=np.int64)
+    for j, rows in enumerate(code_index):
+        found[:, j] = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    
+    mismatches = []
+    if declared is not None:
+        for j, (code, _, _, _, pos) in enumerate(compiled.codes):
+            if pos is None:
+                continue
+            n_declared = declared[:, pos]
+            for row in np.flatnonzero((n_declared >= 0) & (n_declared != found[:, j])):
+                mismatches.append((int(row), code, int(n_declared[row]), int(found[row, j])))
+    
+    expected = found.copy()
+    if declared is not None:
+        for j, (_, _, _, _, pos) in enumerate(compiled.codes):
+            if pos is not None:
+                expected[:, j] = np.where(declared[:, pos] >= 0, declared[:, pos], found[:, j])
+    records = [None] * int(expected.sum())
+    count = 0
+    extract = compiled.extract
+    for row in np.flatnonzero(found.sum(axis=1) > 0):
+        mfile, bp, dt = mfiles[row], ids[row], dates[row]
+        for j, (code, _, _, description, _) in enumerate(compiled.codes):
+            for order, i in enumerate(code_index[j][row], start=1):
+                record = (bp, dt) + extract(mfile[i:]) + (code, description, order)
+                # more records than declared (a mismatch) grow the buffer, fewer leave its tail unused
+                if count < len(records):
+                    records[count] = record
+                else:
+                    records.append(record)
+                count += 1
+    del records[count:]
+    return records, mismatches
+
+
+# Checks and converters run column-wise through .apply with no per-row error handling. Only when a column raises
+# (a malformed report, e.g. x[0] on an empty slice) is it redone row by row, the failing rows being recorded in
+# `failures` as (bus_ptnr, file_date, segment_code, column, exception) so their reports can be quarantined.
+def _apply_isolated(table: pd.DataFrame, column: str, func, failures: Optional[list]) -> pd.Series:
+    if failures is None:
+        return table[column].apply(func)
+    try:
+        return table[column].apply(func)
+    except Exception:
+        pass
+    values = []
+    for row, value in zip(table.itertuples(index=False), table[column]):
+        try:
+            values.append(func(value))
+        except Exception as e:
+            values.append(None)
+            failures.append((row.bus_ptnr, row.file_date, row.segment_code, column, e))
+    return pd.Series(values, index=table.index, dtype=object)
+
+
+# When `rejected` is a list, the records failing the checks are appended to it (raw columns, as extracted) with
+# `failed_checks`: a bitmask of the checks that rejected them, bit i for the i-th check of the layout (the checks of an
+# `either` group only when the whole group failed). It is built from the same masks as the filter, no second pass.
+def validate_segment(compiled: CompiledSegment, table: pd.DataFrame, failures: Optional[list] = None,
+                     rejected: Optional[list] = None) -> pd.DataFrame:
+    if len(compiled.checks) == 0:
+        return table
+    for check, column, func in compiled.checks:
+        table[check] = _apply_isolated(table, column, func, failures).fillna(False).astype(bool)
+    grouped = set(c for group in compiled.either for c in group)
+    keep = pd.Series(True, index=table.index)
+    reasons = np.zeros(len(table), dtype=np.int64) if rejected is not None else None
+    for bit, (check, _, _) in enumerate(compiled.checks):
+        if check not in grouped:
+            keep &= table[check]
+            if reasons is not None:
+                reasons |= np.where(table[check].to_numpy(), 0, 1 << bit)
+    for group in compiled.either:
+        passed = table[list(group)].any(axis=1)
+        keep &= passed
+        if reasons is not None:
+            bits = sum(1 << compiled.check_bits[check] for check in group)
+            reasons |= np.where(passed.to_numpy(), 0, bits)
+    checks = [check for check, _, _ in compiled.checks]
+    if reasons is not None and not keep.all():
+        failed = table.loc[~keep].drop(columns=checks)
+        failed['failed_checks'] = reasons[~keep.to_numpy()]
+        failed['failed_check_names'] = [compiled.check_names(mask) for mask in failed['failed_checks']]
+        rejected.append(failed)
+    table = table.loc[keep]
+    return table.drop(columns=checks)
+
+
+# number of rejected records per check, from the failed_checks bitmasks of validate_segment
+def count_rejections(compiled: CompiledSegment, failed_checks: np.ndarray) -> dict:
+    failed_checks = np.asarray(failed_checks, dtype=np.int64)
+    return {check: int(((failed_checks >> bit) & 1).sum()) for check, bit in compiled.check_bits.items()}
+
+
+def convert_segment(compiled: CompiledSegment, table: pd.DataFrame, failures: Optional[list] = None) -> pd.DataFrame:
+    for column, source, func, dtype in compiled.converters:
+        converted = _apply_isolated(table, source, func, failures)
+        table[column] = converted.astype(dtype) if dtype is not None else converted
+    return table
+
+
+# Take the reports with a failure out of a parsed segment table (all their records of this segment, a partial
+# segment would be misleading) and describe them in a quarantine table
+def quarantine_failures(compiled: CompiledSegment, table: pd.DataFrame, failures: list) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    quarantine = quarantine_frame(compiled, failures)
+    failed = set(zip(quarantine['bus_ptnr'], quarantine['file_date']))
+    if len(table) > 0:
+        table = table.loc[[key not in failed for key in zip(table['bus_ptnr'], table['file_date'])]]
+    return table, quarantine
+
+
+def quarantine_frame(compiled: CompiledSegment, failures: list) -> pd.DataFrame:
+    return pd.DataFrame(
+        [(bp, dt, compiled.name, code, column, type(e).__name__, str(e)) for bp, dt, code, column, e in failures],
+        columns=QUARANTINE_COLUMNS
+    ).drop_duplicates(subset=['bus_ptnr', 'file_date', 'segment_code', 'column'])
+
+
+# Per-report path: parse one raw hard pull on its own, without a DataFrame or a BigQuery client, for single pulls and
+# real-time decisioning. It runs the same compiled layouts, checks and conversions as the batch path above.
+@lru_cache(maxsize=None)
+def _report_plan(seg_names: tuple) -> ParsePlan:
+    return ParsePlan(list(seg_names), header_fields=['segment_counter'])
+
+
+def _decode_report_counter(counter: str) -> list:
+    counts = []
+    for k in range(0, 2 * len(SEGMENT_COUNTER_CODES), 2):
+        pair = counter[k:k + 2]
+        counts.append(int(pair) if len(pair) == 2 and pair.isdigit() else -1)
+    return counts
+
+
+def parse_report(raw_content: str, id: str, file_date, which_tables: Optional[list] = None,
+                 use_segment_counter: bool = True) -> dict:
+    plan = _report_plan(tuple(SEGMENT_LAYOUTS.keys()) if which_tables is None else tuple(which_tables))
+    output = {seg: [] for seg in plan.seg_names}
+    if not isinstance(raw_content, str) or 'FULL' not in raw_content:
+        return output
+    mfile = raw_content[raw_content.index('FULL'):]
+    declared = None
+    if use_segment_counter:
+        start, end = plan.header_fields['segment_counter']
+        declared = _decode_report_counter(mfile[start:end])
+    
+    for seg, compiled in plan.segments.items():
+        records = []
+        for code, pattern, shift, description, pos in compiled.codes:
+            # a code declared zero is only checked for presence, so a wrong counter still loses no records
+            if declared is not None and pos is not None and declared[pos] == 0 and pattern.search(mfile) is None:
+                continue
+            positions = [m.start() + shift for m in pattern.finditer(mfile)]
+            _append_records(records, compiled, mfile, id, file_date, code, description, positions)
+        output[seg] = _finish_records(compiled, records)
+    return output
+
+
+# Micro-batch path for services coalescing many single pulls: the batch is tokenized in one pass per segment (reports
+# declaring zero records are skipped through the decoded counters), then the records are assembled per report as in
+# parse_report. A DataFrame is deliberately not built here, its fixed cost dwarfs the parsing of a small batch.
+# Returns one {segment name: [record dicts]} per raw content, in order (or the exception the report raised).
+def parse_batch(raw_contents: list, ids: list, dates: list, which_tables: Optional[list] = None,
+                use_segment_counter: bool = True) -> list:
+    plan = _report_plan(tuple(SEGMENT_LAYOUTS.keys()) if which_tables is None else tuple(which_tables))
+    output = [{seg: [] for seg in plan.seg_names} for _ in raw_contents]
+    rows = [row for row, raw in enumerate(raw_contents) if isinstance(raw, str) and 'FULL' in raw]
+    if len(rows) == 0:
+        return output
+    mfiles = [raw_contents[row][raw_contents[row].index('FULL'):] for row in rows]
+    declared = None
+    if use_segment_counter:
+        start, end = plan.header_fields['segment_counter']
+        declared = np.array([_decode_report_counter(mfile[start:end]) for mfile in mfiles], dtype=np.int64)
+    
+    for seg, compiled in plan.segments.items():
+        index = plan.tokenize(mfiles, declared=declared, seg=seg)
+        for k, row in enumerate(rows):
+            if isinstance(output[row], Exception):
+                continue
+            records = []
+            for code, _, _, description, _ in compiled.codes:
+                _append_records(records, compiled, mfiles[k], ids[row], dates[row], code, description, index[code][k])
+            # a report raising in its checks/conversions gets its exception in place of its records, the rest of
+            # the batch is unaffected
+            try:
+                output[row][seg] = _finish_records(compiled, records)
+            except Exception as e:
+                e.add_note(f'segment {seg} of report {ids[row]}')
+                output[row] = e
+    return output
+
+
+def _append_records(records: list, compiled: CompiledSegment, mfile: str, id, file_date, code: str, description: str,
+                    positions: list):
+    columns, extract = compiled.columns, compiled.extract
+    for order, i in enumerate(positions, start=1):
+        records.append(dict(zip(columns, (id, file_date) + extract(mfile[i:]) + (code, description, order))))
+
+
+# the scalar counterpart of validate_segment and convert_segment
+def _finish_records(compiled: CompiledSegment, records: list) -> list:
+    if len(records) > 0 and len(compiled.checks) > 0:
+        records = [record for record in records if _passes_checks(compiled, record)]
+    for record in records:
+        for column, source, func, _ in compiled.converters:
+            record[column] = func(record[source])
+    return records
+
+
+def _passes_checks(compiled: CompiledSegment, record: dict) -> bool:
+    results = {check: bool(func(record[column])) for check, column, func in compiled.checks}
+    grouped = set(c for group in compiled.either for c in group)
+    if not all(ok for check, ok in results.items() if check not in grouped):
+        return False
+    return all(any(results[c] for c in group) for group in compiled.either)
@@ -0,0 +1,187 @@
+import os
+import time
+import socket
+import sqlite3
+from typing import Optional
+
+
+# A durable work queue of (month, segment) tasks in a local SQLite file, shared by any number of worker processes.
+# A worker claims one task at a time in an IMMEDIATE transaction, so two workers never get the same task. Tasks left
+# running by a crashed worker are claimed again once their lease expires; failed tasks are retried up to max_attempts.
+# Within a month the header task comes last, since pushing the header drops the raw columns the segments parse.
+class JobQueue:
+    def __init__(self, db_path: str, lease_seconds: float = 3600, max_attempts: int = 3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        if os.path.dirname(db_path) != '':
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                month TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                claimed_at REAL,
+                finished_at REAL,
+                seconds REAL,
+                n_reports INTEGER,
+                n_rows INTEGER,
+                error TEXT,
+                PRIMARY KEY (month, segment)
+            )
+            """
+        )
+
+    # months = [(year, month), ...]; existing tasks are left as they are, so enqueueing again is harmless
+    def enqueue(self, months: list, seg_names: list, push_header: bool = True) -> int:
+        segments = list(seg_names) + (['header'] if push_header else [])
+        rows = [(f'{year}-{month:02d}', seg) for year, month in months for seg in segments]
+        before = self.conn.total_changes
+        self.conn.executemany('INSERT OR IGNORE INTO tasks (month, segment) VALUES (?, ?)', rows)
+        return self.conn.total_changes - before
+
+    # the next task, preferring the month the worker already has in memory; None when nothing is left to claim
+    def claim(self, worker: str, prefer_month: Optional[str] = None) -> Optional[tuple]:
+        now = time.time()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute(
+                """
+                SELECT month, segment FROM tasks
+                WHERE status = 'pending'
+                   OR (status = 'failed' AND attempts < ?)
+                   OR (status = 'running' AND claimed_at < ?)
+                ORDER BY month != ?, month, segment = 'header', rowid
+                LIMIT 1
+                """,
+                (self.max_attempts, now - self.lease_seconds, prefer_month or '')
+            ).fetchone()
+            if row is not None:
+                self.conn.execute(
+                    """
+                    UPDATE tasks SET status = 'running', attempts = attempts + 1, worker = ?, claimed_at = ?,
+                                     finished_at = NULL, error = NULL
+                    WHERE month = ? AND segment = ?
+                    """,
+                    (worker, now, row[0], row[1])
+                )
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return row
+
+    def complete(self, month: str, segment: str, n_reports: int, n_rows: int):
+        now = time.time()
+        self.conn.execute(
+            """
+            UPDATE tasks SET status = 'done', finished_at = ?, seconds = ? - claimed_at, n_reports = ?, n_rows = ?
+            WHERE month = ? AND segment = ?
+            """,
+            (now, now, n_reports, n_rows, month, segment)
+        )
+
+    def fail(self, month: str, segment: str, error: str):
+        now = time.time()
+        self.conn.execute(
+            "UPDATE tasks SET status = 'failed', finished_at = ?, seconds = ? - claimed_at, error = ? WHERE month = ? AND segment = ?",
+            (now, now, error, month, segment)
+        )
+
+    # put tasks of crashed workers (or failed ones that ran out of attempts) back to pending
+    def reset(self, status: str = 'running') -> int:
+        before = self.conn.total_changes
+        self.conn.execute("UPDATE tasks SET status = 'pending', attempts = 0, worker = NULL WHERE status = ?", (status,))
+        return self.conn.total_changes - before
+
+    def status(self) -> dict:
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall())
+
+    # per-task timings and throughput of the finished tasks
+    def throughput(self, month: Optional[str] = None) -> list:
+        query = """
+            SELECT month, segment, worker, attempts, seconds, n_reports, n_rows,
+                   n_reports / MAX(seconds, 1e-9), n_rows / MAX(seconds, 1e-9)
+            FROM tasks WHERE status = 'done'
+        """
+        params = ()
+        if month is not None:
+            query += ' AND month = ?'
+            params = (month,)
+        query += ' ORDER BY month, rowid'
+        columns = ['month', 'segment', 'worker', 'attempts', 'seconds', 'n_reports', 'n_rows', 'reports_per_s', 'rows_per_s']
+        return [dict(zip(columns, row)) for row in self.conn.execute(query, params).fetchall()]
+
+    def failures(self) -> list:
+        return self.conn.execute(
+            "SELECT month, segment, attempts, error FROM tasks WHERE status = 'failed' ORDER BY month, rowid"
+        ).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+# Claim and run tasks until the queue is drained. The month of the claimed task is fetched once and kept while the
+# worker keeps claiming tasks of the same month; each task is one segment table (or the header table) pushed.
+# The queue, not the worker's which_tables/push_header, decides what a task parses: a claimed segment missing from the
+# plan of the loaded parser (or a header task of a worker without the header) gets a parser whose plan includes it.
+def run_worker(db_path: str, worker: Optional[str] = None, max_tasks: Optional[int] = None, **parser_kwargs) -> int:
+    from parser_with_filters import FFFParser
+    worker = worker if worker is not None else default_worker_id()
+    queue = JobQueue(db_path)
+    parser, loaded_month, n_done = None, None, 0
+    try:
+        while max_tasks is None or n_done < max_tasks:
+            task = queue.claim(worker, prefer_month=loaded_month)
+            if task is None:
+                break
+            month, seg = task
+            try:
+                if month != loaded_month or not _plans(parser, seg):
+                    parser, loaded_month = None, None
+                    year, mon = (int(x) for x in month.split('-'))
+                    parser = FFFParser(begin_year=year, begin_month=mon, **_task_kwargs(parser_kwargs, seg))
+                    parser._parse_header()
+                    loaded_month = month
+                rows_before = sum(parser.pushed_rows.values())
+                if seg == 'header':
+                    parser._push_header_table()
+                else:
+                    parser._parse_segment_with_cache(seg)
+                # each task is committed on its own (write_mode='overwrite' replaces the month of its tables)
+                if not parser.debug_mode:
+                    parser.sink.commit(parser._file_dates(), parser._commit_tables([] if seg == 'header' else [seg], seg == 'header'))
+                queue.complete(month, seg, n_reports=len(parser.data), n_rows=sum(parser.pushed_rows.values()) - rows_before)
+            except Exception as e:
+                # the parser may be half way through the task: a retry starts again from a fresh fetch
+                parser, loaded_month = None, None
+                queue.fail(month, seg, f'{type(e).__name__}: {e}')
+                print(f'{month} {seg} failed: {type(e).__name__}: {e}')
+            n_done += 1
+    finally:
+        queue.close()
+    return n_done
+
+
+def _plans(parser, seg: str) -> bool:
+    return parser.push_header if seg == 'header' else seg in parser.plan.segments
+
+
+# the worker's parser arguments, widened to the task's table: its segment added to which_tables (None is every
+# segment already), or the header turned on
+def _task_kwargs(parser_kwargs: dict, seg: str) -> dict:
+    kwargs = dict(parser_kwargs)
+    if seg == 'header':
+        kwargs['push_header'] = True
+    elif kwargs.get('which_tables') is not None and seg not in kwargs['which_tables']:
+        kwargs['which_tables'] = list(kwargs['which_tables']) + [seg]
+    return kwargs
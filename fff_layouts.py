@@ -0,0 +1,1038 @@
+import re
+import pandas as pd
+from datetime import date
+
+
+# A class that contains all common filters which used to guarantee the correctness of parsing
+class FilterAndConverter:
+    @classmethod
+    def convert_amount_from_str(cls, s: str):
+        s = s.strip()
+        if s == '':
+            return pd.NA
+        if s[0] == '$':
+            s = s[1:]
+
+        try:
+            if s[-1] == 'K':
+                return int(s[:-1]) * 1000
+            elif s[-1] == 'M':
+                return int(s[:-1]) * 1000000
+            else:
+                return int(s)
+        except:
+            return pd.NA
+        
+    @classmethod
+    def convert_int_with_missing(cls, s: str):
+        s = s.strip()
+        if s == '':
+            return pd.NA
+        else:
+            try:
+                return int(s)
+            except:
+                return pd.NA
+        
+    @classmethod
+    def convert_float_with_missing(cls, s: str):
+        s = s.strip()
+        if s == '':
+            return pd.NA
+        else:
+            try:
+                return float(s)
+            except:
+                return pd.NA
+        
+    @classmethod
+    def calc_length_with_strip(cls, s: str) -> int:
+        return len(s.strip())
+        
+    @classmethod
+    def filter_member_number(cls, s: str) -> bool:
+        # '999XX99999' and allow none    
+        s = s.strip()
+        check = s[:3].isdigit() and s[3:5].isalpha() and s[5:].isdigit()
+        check = check or s == ''
+        return check
+    
+    @classmethod
+    def filter_6digits_date(cls, s: str) -> bool:
+        # 'YYYYMM' and allow none 
+        s = s.strip()
+        check = (s.isdigit() and len(s) == 6) or s == ''
+        return check
+    
+    @classmethod
+    def filter_valid_name(cls, s: str) -> bool:
+        if s.strip() == '':
+            return True
+        else:
+            if s[0] == ' ':
+                return False
+            elif ('/' in s) or ('*' in s) or bool(re.search(r'\d', s)):
+                return False
+            else:
+                return True
+            
+    @classmethod
+    def filter_first_not_null(cls, s: str) -> bool:
+        if s.strip() != '':
+            return s[0] != ' '
+        else:
+            return True
+        
+    @classmethod
+    def filter_industry_code(cls, s: str) -> bool:
+        if s.strip() != '':
+            return len(s.strip()) == 2 and  s.strip().isalpha()
+        else:
+            return True
+        
+    @classmethod
+    def convert_8digits_date(cls, s:str):
+        s = s.strip()
+        if s == '':
+            return None
+        else:
+            try:
+                dt = date(int(s[6:]), int(s[:2]), int(s[3:5]))
+            except:
+                return None
+        return dt
+
+
+# Fixed positions of the fields of the header (the part of mfile before the first segment)
+HEADER_FIELDS = {
+    'report_type': (0, 4),
+    'customer_reference_no': (5, 17), 
+    'member_no': (18, 28),
+    'consumer_referral_no': (29, 32),
+    'ecoa_inquiry_type': (34, 35),
+    'output_format_code': (36, 37),
+    'hit_no_hit_designator': (41, 42), 
+    'file_since_date': (43, 53), 
+    'last_activity_date': (54, 64),
+    'this_report_date': (65, 75),
+    'last_name': (80, 105),
+    "first_name": (106, 121),
+    'middle_name_or_initial': (122, 137),
+    'suffixs': (138, 140),
+    'spouses_name': (141, 156),
+    'record_code_ss': (160, 162),
+    'subjects_sin': (162, 171),
+    'subjects_birth_age_date': (172, 182), 
+    'record_code_so': (190, 192), 
+    'total_no_of_inquiries': (202, 205),
+    'warning_message': (208, 209),
+    'alert_indicator_flag': (210, 211), 
+    'segment_counter': (240, 302), 
+    'alert_flag': (312, 314), 
+    'deposit_flag': (315, 316), 
+    'safescan_byte_1': (317, 318),
+    'safescan_is_byte_2': (318, 319)
+}
+
+# BigQuery schema of the header table (fff_segment_0_header)
+HEADER_SCHEMA = [
+    ('id', 'STRING'),
+    ('file_name', 'STRING'),
+    ('file_date', 'DATE'),
+    ('business_partner_id', 'STRING'),
+    ('mfile', 'STRING'),
+    ('report_type', 'STRING'),
+    ('customer_reference_no', 'STRING'),
+    ('member_no', 'STRING'),
+    ('consumer_referral_no', 'STRING'),
+    ('ecoa_inquiry_type', 'STRING'),
+    ('output_format_code', 'STRING'),
+    ('hit_no_hit_designator', 'STRING'),
+    ('file_since_date', 'DATE'),
+    ('last_activity_date', 'DATE'),
+    ('this_report_date', 'DATE'),
+    ('last_name', 'STRING'),
+    ('first_name', 'STRING'),
+    ('middle_name_or_initial', 'STRING'),
+    ('suffixs', 'STRING'),
+    ('spouses_name', 'STRING'),
+    ('record_code_ss', 'STRING'),
+    ('subjects_sin', 'STRING'),
+    ('subjects_birth_age_date', 'DATE'),
+    ('record_code_so', 'STRING'),
+    ('total_no_of_inquiries', 'STRING'),
+    ('warning_message', 'STRING'),
+    ('alert_indicator_flag', 'STRING'),
+    ('segment_counter', 'STRING'),
+    ('alert_flag', 'STRING'),
+    ('deposit_flag', 'STRING'),
+    ('safescan_byte_1', 'STRING'),
+    ('safescan_is_byte_2', 'STRING'),
+]
+
+# BigQuery schema of the quarantine table (fff_quarantine): reports whose parsing raised in a segment, with the
+# segment code and the column being checked or converted when it did
+QUARANTINE_SCHEMA = [
+    ('bus_ptnr', 'STRING'),
+    ('file_date', 'DATE'),
+    ('segment', 'STRING'),
+    ('segment_code', 'STRING'),
+    ('column', 'STRING'),
+    ('error_type', 'STRING'),
+    ('error_message', 'STRING'),
+]
+
+# Columns appended to a segment's raw columns in its rejected table (fff_rejected_<table>): the records dropped by the
+# checks, with the bitmask of the checks that rejected them (bit i = i-th check of the layout) and their names
+REJECTED_SCHEMA = [
+    ('failed_checks', 'INT64'),
+    ('failed_check_names', 'STRING'),
+]
+
+# The header segment_counter holds 31 two-digit counts, one per segment type, in the order of the segment
+# numbers used in the table names (1 = CA, 2 = FA, ..., 31 = BS). Positions 10 and 11 are not used by any segment we parse.
+SEGMENT_COUNTER_CODES = [
+    'CA', 'FA', 'F2', 'AK', 'FN', 'DT', 'ES', 'EF', 'E2', None, None, 'OI', 'BP', 'CO', 'FM', 'LI',
+    'FO', 'NR', 'MI', 'TL', 'FC', 'GN', 'TC', 'NT', 'CS', 'FB', 'FI', 'LO', 'IQ', 'CD', 'BS'
+]
+
+
+##################################################################################################################################### 
+# The layout of every segment table:                                                                                                #
+#     table:      suffix of the destination table (fff_segment_<table>)                                                             #
+#     attr:       attribute of FFFParser holding the parsed table                                                                   #
+#     codes:      (segment code, search pattern, shift from the match to the code, segment description)                             #
+#     fields:     column -> expression on `segment` (the mfile from the segment code onwards)                                       #
+#     checks:     (check name, column, function) evaluated on the raw strings; a record is kept if all checks pass,                 #
+#                 except for the checks listed together in `either`, where one of them is enough                                    #
+#     converters: (column, source column, function, dtype) applied in order to the kept records                                     #
+#     schema:     (column, BigQuery type) of the destination table                                                                  #
+# FO (foreclosure), NR (non-responsibility), TL (tax lien), FC (financial counselor), NT (non-member trade check) and               #
+# FB (foreign bureau) are discontinued and not parsed.                                                                              #
+#####################################################################################################################################
+SEGMENT_LAYOUTS = {
+    'address': {
+        'table': '1_2_3_address',
+        'attr': 'addr',
+        'codes': [
+            ('CA', ' CA ', 1, 'current address'),
+            ('FA', ' FA ', 1, 'former address'),
+            ('F2', ' F2 ', 1, 'former address'),
+        ],
+        'fields': {
+            'street_number': 'segment[3:13]',
+            'street_name_direction_apartment': 'segment[14:40]',
+            'city': 'segment[80:100]',
+            'province': 'segment[101:103]',
+            'postal_code': 'segment[104:110]',
+            'residence_since': 'segment[114:118] + segment[111:113]',
+            'indicator_code': 'segment[118:119]',
+        },
+        'checks': [
+            ('check1', 'city', lambda x: FilterAndConverter.calc_length_with_strip(x) <= 4),
+            ('check2', 'province', lambda x: FilterAndConverter.calc_length_with_strip(x) == 2),
+            ('check3', 'postal_code', lambda x: FilterAndConverter.calc_length_with_strip(x) == 6),
+            ('check4', 'residence_since', FilterAndConverter.filter_6digits_date),
+        ],
+        'converters': [],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('street_number', 'STRING'),
+            ('street_name_direction_apartment', 'STRING'),
+            ('city', 'STRING'),
+            ('province', 'STRING'),
+            ('postal_code', 'STRING'),
+            ('residence_since', 'STRING'),
+            ('indicator_code', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'name': {
+        'table': '4_5_name',
+        'attr': 'names',
+        'codes': [
+            ('AK', ' AK ', 1, 'also known as'),
+            ('FN', 'FN ', 0, 'also known as'),
+        ],
+        'fields': {
+            'last_name': 'segment[3:28]',
+            'first_name': 'segment[29:44]',
+            'middle_name_initial': 'segment[45:60]',
+            'suffix': 'segment[61:63]',
+            'spouse_name': 'segment[80:95]',
+            'legal_name_change': 'segment[96:97]',
+        },
+        'checks': [
+            ('check1', 'last_name', FilterAndConverter.filter_valid_name),
+            ('check2', 'first_name', FilterAndConverter.filter_valid_name),
+            ('check3', 'middle_name_initial', FilterAndConverter.filter_valid_name),
+            ('check4', 'spouse_name', FilterAndConverter.filter_valid_name),
+            ('check5', 'suffix', lambda x: x in ['SR', 'JR', '1 ', '2 ', '3 ', '4 ', 'XX', '  '] or x == ''),
+            ('check6', 'legal_name_change', lambda x: x == 'L' or x == ' '),
+        ],
+        'converters': [],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('last_name', 'STRING'),
+            ('first_name', 'STRING'),
+            ('middle_name_initial', 'STRING'),
+            ('suffix', 'STRING'),
+            ('spouse_name', 'STRING'),
+            ('legal_name_change', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'death': {
+        'table': '6_death',
+        'attr': 'death',
+        'codes': [
+            ('DT', 'DT ', 0, 'death'),
+        ],
+        'fields': {
+            'subject_death_date': 'segment[6:10] + segment[3:5]',
+        },
+        'checks': [
+            ('check1', 'subject_death_date', FilterAndConverter.filter_6digits_date),
+            ('check2', 'subject_death_date', lambda x: len(x.strip()) > 0),
+        ],
+        'converters': [],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('subject_death_date', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'employment': {
+        'table': '7_8_9_employment',
+        'attr': 'empl',
+        'codes': [
+            ('ES', 'ES ', 0, 'current employment situation'),
+            ('EF', ' EF ', 1, 'former employment situation'),
+            ('E2', ' E2 ', 1, 'former employment situation'),
+        ],
+        'fields': {
+            'occupation': 'segment[3:37]',
+            'employer': 'segment[38:72]',
+            'city_of_employment': 'segment[80:88]',
+            'province_of_employment': 'segment[89:91]',
+            'date_employed': 'segment[95:99] + segment[92:94]',
+            'date_verified': 'segment[103:107] + segment[100:102]',
+            'verification_status': 'segment[108:109]',
+            'monthly_salary': 'segment[110:118]',
+            'monthly_salary_indicator': "''",  # filled in by the converters
+            'date_left': 'segment[122:126] + segment[119:121]',
+        },
+        'checks': [
+            ('check1', 'date_employed', FilterAndConverter.filter_6digits_date),
+            ('check2', 'date_verified', FilterAndConverter.filter_6digits_date),
+            ('check3', 'date_left', FilterAndConverter.filter_6digits_date),
+            ('check4', 'city_of_employment', lambda x: x.strip().isalpha() if x.strip() else True),
+            ('check5', 'province_of_employment', lambda x: x.strip().isalpha() if x.strip() else True),
+            ('check6', 'monthly_salary', lambda x: '$' in x if x.strip() else False),
+        ],
+        'converters': [
+            ('monthly_salary_indicator', 'monthly_salary', lambda x: 'NV' if x[-2:] == 'NV' else '', None),
+            ('monthly_salary', 'monthly_salary', lambda x: x[:-2] if x[-2:] == 'NV' else x, None),
+            ('monthly_salary', 'monthly_salary', FilterAndConverter.convert_amount_from_str, 'Int64'),
+        ],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('occupation', 'STRING'),
+            ('employer', 'STRING'),
+            ('city_of_employment', 'STRING'),
+            ('province_of_employment', 'STRING'),
+            ('date_employed', 'STRING'),
+            ('date_verified', 'STRING'),
+            ('verification_status', 'STRING'),
+            ('monthly_salary', 'NUMERIC'),
+            ('monthly_salary_indicator', 'STRING'),
+            ('date_left', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'other_income': {
+        'table': '12_other_income',
+        'attr': 'oinc',
+        'codes': [
+            ('OI', ' OI ', 1, 'other income'),
+        ],
+        'fields': {
+            'date_reported': 'segment[6:10] + segment[3:5]',
+            'income_amount': 'segment[11:17]',
+            'income_source': 'segment[18:58]',
+            'date_verified': 'segment[62:66] + segment[59:61]',
+            'verification_status': 'segment[67:68]',
+        },
+        'checks': [
+            ('check1', 'date_reported', FilterAndConverter.filter_6digits_date),
+            ('check2', 'date_verified', FilterAndConverter.filter_6digits_date),
+        ],
+        'converters': [
+            ('income_amount', 'income_amount', FilterAndConverter.convert_amount_from_str, 'Int64'),
+        ],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('date_reported', 'STRING'),
+            ('income_amount', 'NUMERIC'),
+            ('income_source', 'STRING'),
+            ('date_verified', 'STRING'),
+            ('verification_status', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'bankruptcy': {
+        'table': '13_bankruptcy',
+        'attr': 'bkpt',
+        'codes': [
+            ('BP', 'BP ', 0, 'bankruptcy'),
+        ],
+        'fields': {
+            'foreign_bureau_code': 'segment[3:4]',
+            'date_filed': 'segment[8:12] + segment[5:7]',
+            'name_court': 'segment[13:33]',
+            'court_number': 'segment[52:62]',
+            'type_bankruptcy': 'segment[63:64]',
+            'how_filed': 'segment[65:66]',
+            'deposition_codes': 'segment[67:68]',
+            'amount_liability': 'segment[69:75]',
+            'asset_amount': 'segment[80:86]',
+            'date_settled': 'segment[90:94] + segment[87:89]',
+            'narrative_code_1': 'segment[95:97]',
+            'narrative_code_2': 'segment[98:100]',
+            'case_number': 'segment[101:143]',
+        },
+        'checks': [
+            ('check1', 'how_filed', lambda x: x in ['S', 'J', ' ']),
+            ('check2', 'type_bankruptcy', lambda x: x in ['B', 'I', ' ']),
+            ('check3', 'case_number', FilterAndConverter.filter_first_not_null),
+            ('check4', 'date_filed', FilterAndConverter.filter_6digits_date),
+            ('check5', 'date_settled', FilterAndConverter.filter_6digits_date),
+            ('check6', 'narrative_code_1', FilterAndConverter.filter_industry_code),
+            ('check7', 'narrative_code_2', FilterAndConverter.filter_industry_code),
+        ],
+        'converters': [
+            ('amount_liability', 'amount_liability', FilterAndConverter.convert_amount_from_str, 'Int64'),
+            ('asset_amount', 'asset_amount', FilterAndConverter.convert_amount_from_str, 'Int64'),
+        ],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('foreign_bureau_code', 'STRING'),
+            ('date_filed', 'STRING'),
+            ('name_court', 'STRING'),
+            ('court_number', 'STRING'),
+            ('type_bankruptcy', 'STRING'),
+            ('how_filed', 'STRING'),
+            ('deposition_codes', 'STRING'),
+            ('amount_liability', 'NUMERIC'),
+            ('asset_amount', 'NUMERIC'),
+            ('date_settled', 'STRING'),
+            ('narrative_code_1', 'STRING'),
+            ('narrative_code_2', 'STRING'),
+            ('case_number', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'collection': {
+        'table': '14_collection',
+        'attr': 'colt',
+        'codes': [
+            ('CO', ' CO ', 1, 'collection'),
+        ],
+        'fields': {
+            'foreign_bureau_code': 'segment[3:4]',
+            'date_reported': 'segment[8:12] + segment[5:7]',
+            'name_member': 'segment[13:33]',
+            'member_number': 'segment[52:62]',
+            'amount': 'segment[63:69]',
+            'balance': 'segment[70:76]',
+            'type': 'segment[77:78]',
+            'narrative_code_1': 'segment[80:82]',
+            'narrative_code_2': 'segment[83:85]',
+            'industry_code': 'segment[86:88]',
+            'reason_code': 'segment[89:90]',
+            'date_paid': 'segment[94:98] + segment[91:93]',
+            'date_last_payment': 'segment[102:106] + segment[99:101]',
+            'creditors_account_number_and_name': 'segment[107:157]',
+            'ledger_number': 'segment[160:177]',
+        },
+        'checks': [
+            ('check1', 'type', lambda x: x in ['P', 'U', ' ']),
+            ('check2', 'date_reported', FilterAndConverter.filter_6digits_date),
+            ('check3', 'date_paid', FilterAndConverter.filter_6digits_date),
+            ('check4', 'date_last_payment', FilterAndConverter.filter_6digits_date),
+            ('check5', 'member_number', FilterAndConverter.filter_member_number),
+            ('check6', 'creditors_account_number_and_name', FilterAndConverter.filter_first_not_null),
+            ('check7', 'narrative_code_1', FilterAndConverter.filter_industry_code),
+            ('check8', 'narrative_code_2', FilterAndConverter.filter_industry_code),
+        ],
+        'converters': [
+            ('amount', 'amount', FilterAndConverter.convert_amount_from_str, 'Int64'),
+            ('balance', 'balance', FilterAndConverter.convert_amount_from_str, 'Int64'),
+        ],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('foreign_bureau_code', 'STRING'),
+            ('date_reported', 'STRING'),
+            ('name_member', 'STRING'),
+            ('member_number', 'STRING'),
+            ('amount', 'NUMERIC'),
+            ('balance', 'NUMERIC'),
+            ('type', 'STRING'),
+            ('narrative_code_1', 'STRING'),
+            ('narrative_code_2', 'STRING'),
+            ('industry_code', 'STRING'),
+            ('reason_code', 'STRING'),
+            ('date_paid', 'STRING'),
+            ('date_last_payment', 'STRING'),
+            ('creditors_account_number_and_name', 'STRING'),
+            ('ledger_number', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'secured_loan': {
+        'table': '15_secured_loan',
+        'attr': 'selo',
+        'codes': [
+            ('FM', 'FM ', 0, 'secured loan'),
+        ],
+        'fields': {
+            'foreign_bureau_code': 'segment[3:4]',
+            'date_filed': 'segment[8:12] + segment[5:7]',
+            'name_court': 'segment[13:33]',
+            'court_number': 'segment[52:62]',
+            'industry_code': 'segment[63:65]',
+            'maturity_date': 'segment[69:73] + segment[66:68]',
+            'narrative_code_1': 'segment[73:76]',
+            'narrative_code_2': 'segment[77:79]',
+            'creditors_name_address_amount': 'segment[80:140].lstrip()',
+        },
+        'checks': [
+            ('check1', 'industry_code', FilterAndConverter.filter_industry_code),
+            ('check2', 'date_filed', FilterAndConverter.filter_6digits_date),
+            ('check3', 'maturity_date', FilterAndConverter.filter_6digits_date),
+            ('check4', 'narrative_code_1', FilterAndConverter.filter_industry_code),
+            ('check5', 'narrative_code_2', FilterAndConverter.filter_industry_code),
+            ('check6', 'creditors_name_address_amount', lambda x: x[0].isdigit() if x.strip() != '' else True),
+        ],
+        'converters': [],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('foreign_bureau_code', 'STRING'),
+            ('date_filed', 'STRING'),
+            ('name_court', 'STRING'),
+            ('court_number', 'STRING'),
+            ('industry_code', 'STRING'),
+            ('maturity_date', 'STRING'),
+            ('narrative_code_1', 'STRING'),
+            ('narrative_code_2', 'STRING'),
+            ('creditors_name_address_amount', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'legal_item': {
+        'table': '16_legal_item',
+        'attr': 'leit',
+        'codes': [
+            ('LI', 'LI ', 0, 'legal item'),
+        ],
+        'fields': {
+            'foreign_bureau_code': 'segment[3:4]',
+            'date_filed': 'segment[8:12] + segment[5:7]',
+            'name_court': 'segment[13:33]',
+            'court_number': 'segment[52:62]',
+            'amount': 'segment[63:69]',
+            'type_code': 'segment[70:71]',
+            'date_satisfied': 'segment[75:79] + segment[72:74]',
+            'status_code': 'segment[80:81]',
+            'date_verified': 'segment[82:89]',
+            'narrative_code_1': 'segment[90:92]',
+            'narrative_code_2': 'segment[93:95]',
+            'defendant': 'segment[96:136]',
+            'case_number': 'segment[137:159]',
+            'case_number_continued': 'segment[160:180]',
+            'plaintiff': 'segment[181:221]',
+            'laywer_name_address': 'segment[240:300]',
+        },
+        'checks': [
+            ('check1', 'type_code', lambda x: x in ['A', 'J', 'F']),
+            ('check2', 'status_code', lambda x: x in ['D', 'S', 'T']),
+            ('check3', 'amount', lambda x: '\\' not in x),
+            ('check4', 'name_court', lambda x: x[0] != ' '),
+            ('check5', 'date_filed', FilterAndConverter.filter_6digits_date),
+            ('check6', 'date_satisfied', FilterAndConverter.filter_6digits_date),
+            ('check7', 'narrative_code_1', FilterAndConverter.filter_industry_code),
+            ('check8', 'narrative_code_2', FilterAndConverter.filter_industry_code),
+        ],
+        'converters': [
+            ('amount', 'amount', FilterAndConverter.convert_amount_from_str, 'Int64'),
+        ],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('foreign_bureau_code', 'STRING'),
+            ('date_filed', 'STRING'),
+            ('name_court', 'STRING'),
+            ('court_number', 'STRING'),
+            ('amount', 'INT64'),
+            ('type_code', 'STRING'),
+            ('date_satisfied', 'STRING'),
+            ('status_code', 'STRING'),
+            ('date_verified', 'STRING'),
+            ('narrative_code_1', 'STRING'),
+            ('narrative_code_2', 'STRING'),
+            ('defendant', 'STRING'),
+            ('case_number', 'STRING'),
+            ('case_number_continued', 'STRING'),
+            ('plaintiff', 'STRING'),
+            ('laywer_name_address', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+        'either': [('check1', 'check2')],
+    },
+    'marital_item': {
+        'table': '19_marital_item',
+        'attr': 'mari',
+        'codes': [
+            ('MI', ' MI ', 1, 'marital item'),
+        ],
+        'fields': {
+            'foreign_bureau_code': 'segment[3:4]',
+            'date_reported': 'segment[8:12] + segment[5:7]',
+            'name_court': 'segment[13:33]',
+            'telephone_area_code': 'segment[34:37]',
+            'telephone_number': 'segment[38:46]',
+            'extension': 'segment[47:51]',
+            'member_number': 'segment[52:62]',
+            'action_code': 'segment[63:64]',
+            'date_verified': 'segment[68:72] + segment[65:67]',
+            'amount': 'segment[80:122]',
+            'additional_details': 'segment[160:200]',
+        },
+        'checks': [
+            ('check1', 'date_reported', FilterAndConverter.filter_6digits_date),
+            ('check2', 'date_verified', FilterAndConverter.filter_6digits_date),
+            ('check3', 'member_number', FilterAndConverter.filter_member_number),
+            ('check4', 'action_code', lambda x: x in ['S', ' ']),
+        ],
+        'converters': [],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('foreign_bureau_code', 'STRING'),
+            ('date_reported', 'STRING'),
+            ('name_court', 'STRING'),
+            ('telephone_area_code', 'STRING'),
+            ('telephone_number', 'STRING'),
+            ('extension', 'STRING'),
+            ('member_number', 'STRING'),
+            ('action_code', 'STRING'),
+            ('date_verified', 'STRING'),
+            ('amount', 'STRING'),
+            ('additional_details', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'garnishment': {
+        'table': '22_garnishment',
+        'attr': 'garn',
+        'codes': [
+            ('GN', ' GN ', 1, 'garnishment'),
+        ],
+        'fields': {
+            'foreign_bureau_code': 'segment[3:4]',
+            'date_reported': 'segment[8:12] + segment[5:7]',
+            'name_court': 'segment[13:33]',
+            'court_number': 'segment[46:56]',
+            'amount': 'segment[57:63]',
+            'date_satisfied': 'segment[67:71] + segment[64:66]',
+            'date_checked': 'segment[75:79] + segment[72:74]',
+            'narrative_code_1': 'segment[80:82]',
+            'narrative_code_2': 'segment[83:85]',
+            'case_number': 'segment[86:128]',
+            'plaintiff': 'segment[129:159]',
+            'plaintiff_continued': 'segment[160:172]',
+            'garnishee': 'segment[173:213]',
+            'defendant': 'segment[214:280]',
+        },
+        'checks': [
+            ('check1', 'date_reported', FilterAndConverter.filter_6digits_date),
+            ('check2', 'date_checked', FilterAndConverter.filter_6digits_date),
+            ('check3', 'date_satisfied', FilterAndConverter.filter_6digits_date),
+        ],
+        'converters': [
+            ('amount', 'amount', FilterAndConverter.convert_amount_from_str, 'Int64'),
+        ],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('foreign_bureau_code', 'STRING'),
+            ('date_reported', 'STRING'),
+            ('name_court', 'STRING'),
+            ('court_number', 'STRING'),
+            ('amount', 'NUMERIC'),
+            ('date_satisfied', 'STRING'),
+            ('date_checked', 'STRING'),
+            ('narrative_code_1', 'STRING'),
+            ('narrative_code_2', 'STRING'),
+            ('case_number', 'STRING'),
+            ('plaintiff', 'STRING'),
+            ('plaintiff_continued', 'STRING'),
+            ('garnishee', 'STRING'),
+            ('defendant', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'trade_check': {
+        'table': '23_trade_check_for_check',
+        'attr': 'tdck',
+        'codes': [
+            ('TC', 'TC ', 0, 'trade check'),
+        ],
+        'fields': {
+            'foreign_bureau_code': 'segment[3:4]',
+            'account_designator_code': 'segment[5:6]',
+            'autodata_indicator': 'segment[6:7]',
+            'name_member': 'segment[8:28]',
+            'telephone_area_code': 'segment[29:32]',
+            'telephone_number': 'segment[33:41]',
+            'extension': 'segment[42:46]',
+            'member_number': 'segment[47:57]',
+            'date_reported': 'segment[61:65] + segment[58:60]',
+            'date_opened': 'segment[69:73] + segment[66:68]',
+            'high_credit': 'segment[74:79]',
+            'terms': 'segment[80:84]',
+            'balance': 'segment[85:90]',
+            'past_due': 'segment[91:96]',
+            'type_code': 'segment[97:98]',
+            'rate_code': 'segment[98:99]',
+            'day_counter_30': 'segment[100:102]',
+            'day_counter_60': 'segment[103:105]',
+            'day_counter_90': 'segment[106:108]',
+            'months_reviewed': 'segment[109:111]',
+            'date_last_activity': 'segment[115:119] + segment[112:114]',
+            'account_number': 'segment[120:135]',
+            'previous_high_rate_1': 'segment[161:162]',
+            'previous_high_date_1': 'segment[166:170] + segment[163:165]',
+            'previous_high_rate_2': 'segment[172:173]',
+            'previous_high_date_2': 'segment[177:181] + segment[174:176]',
+            'previous_high_rate_3': 'segment[183:184]',
+            'previous_high_date_3': 'segment[188:192] + segment[185:187]',
+            'narrative_code_1': 'segment[196:198]',
+            'narrative_code_2': 'segment[199:201]',
+        },
+        'checks': [
+            ('check1', 'autodata_indicator', lambda x: x == '*'),
+            ('check2', 'account_designator_code', lambda x: x in ['I', 'J', 'U']),
+            ('check3', 'date_reported', FilterAndConverter.filter_6digits_date),
+            ('check4', 'date_opened', FilterAndConverter.filter_6digits_date),
+            ('check5', 'date_last_activity', FilterAndConverter.filter_6digits_date),
+            ('check6', 'previous_high_date_1', FilterAndConverter.filter_6digits_date),
+            ('check7', 'previous_high_date_2', FilterAndConverter.filter_6digits_date),
+            ('check8', 'previous_high_date_3', FilterAndConverter.filter_6digits_date),
+        ],
+        'converters': [
+            ('day_counter_30', 'day_counter_30', FilterAndConverter.convert_int_with_missing, 'Int64'),
+            ('day_counter_60', 'day_counter_60', FilterAndConverter.convert_int_with_missing, 'Int64'),
+            ('day_counter_90', 'day_counter_90', FilterAndConverter.convert_int_with_missing, 'Int64'),
+            ('months_reviewed', 'months_reviewed', FilterAndConverter.convert_int_with_missing, 'Int64'),
+            ('previous_high_rate_1', 'previous_high_rate_1', FilterAndConverter.convert_float_with_missing, None),
+            ('previous_high_rate_2', 'previous_high_rate_2', FilterAndConverter.convert_float_with_missing, None),
+            ('previous_high_rate_3', 'previous_high_rate_3', FilterAndConverter.convert_float_with_missing, None),
+            ('high_credit', 'high_credit', FilterAndConverter.convert_amount_from_str, 'Int64'),
+            ('terms', 'terms', FilterAndConverter.convert_amount_from_str, 'Int64'),
+            ('balance', 'balance', FilterAndConverter.convert_amount_from_str, 'Int64'),
+            ('past_due', 'past_due', FilterAndConverter.convert_amount_from_str, 'Int64'),
+        ],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('foreign_bureau_code', 'STRING'),
+            ('account_designator_code', 'STRING'),
+            ('autodata_indicator', 'STRING'),
+            ('name_member', 'STRING'),
+            ('telephone_area_code', 'STRING'),
+            ('telephone_number', 'STRING'),
+            ('extension', 'STRING'),
+            ('member_number', 'STRING'),
+            ('date_reported', 'STRING'),
+            ('date_opened', 'STRING'),
+            ('high_credit', 'NUMERIC'),
+            ('terms', 'NUMERIC'),
+            ('balance', 'NUMERIC'),
+            ('past_due', 'NUMERIC'),
+            ('type_code', 'STRING'),
+            ('rate_code', 'STRING'),
+            ('day_counter_30', 'INT64'),
+            ('day_counter_60', 'INT64'),
+            ('day_counter_90', 'INT64'),
+            ('months_reviewed', 'INT64'),
+            ('date_last_activity', 'STRING'),
+            ('account_number', 'STRING'),
+            ('previous_high_rate_1', 'FLOAT'),
+            ('previous_high_date_1', 'STRING'),
+            ('previous_high_rate_2', 'FLOAT'),
+            ('previous_high_date_2', 'STRING'),
+            ('previous_high_rate_3', 'FLOAT'),
+            ('previous_high_date_3', 'STRING'),
+            ('narrative_code_1', 'STRING'),
+            ('narrative_code_2', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+        'either': [('check1', 'check2')],
+    },
+    'chequing_saving': {
+        'table': '25_chequing_saving',
+        'attr': 'chsv',
+        'codes': [
+            ('CS', ' CS ', 1, 'chequing and saving'),
+        ],
+        'fields': {
+            'foreign_bureau_code': 'segment[3:4]',
+            'date_reported': 'segment[8:12] + segment[5:7]',
+            'name_member': 'segment[13:33]',
+            'telephone_area_code': 'segment[34:37]',
+            'telephone_number': 'segment[38:46]',
+            'extension': 'segment[47:51]',
+            'member_number': 'segment[52:62]',
+            'date_opened': 'segment[66:70] + segment[63:65]',
+            'amount': 'segment[80:95]',
+            'type_account': 'segment[96:97]',
+            'narrative_code_1': 'segment[98:100]',
+            'status_code': 'segment[101:102]',
+            'nsf_information': 'segment[103:118]',
+            'account_number': 'segment[119:134]',
+        },
+        'checks': [
+            ('check1', 'date_reported', FilterAndConverter.filter_6digits_date),
+            ('check2', 'date_opened', FilterAndConverter.filter_6digits_date),
+            ('check3', 'member_number', FilterAndConverter.filter_member_number),
+            ('check4', 'type_account', lambda x: x in 'ABCDEFGHIJKLMNOPQSTUVWXY '),
+            ('check5', 'status_code', lambda x: x in 'ABCDQTUXZ '),
+            ('check6', 'narrative_code_1', FilterAndConverter.filter_industry_code),
+        ],
+        'converters': [],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('foreign_bureau_code', 'STRING'),
+            ('date_reported', 'STRING'),
+            ('name_member', 'STRING'),
+            ('telephone_area_code', 'STRING'),
+            ('telephone_number', 'STRING'),
+            ('extension', 'STRING'),
+            ('member_number', 'STRING'),
+            ('date_opened', 'STRING'),
+            ('amount', 'STRING'),
+            ('type_account', 'STRING'),
+            ('narrative_code_1', 'STRING'),
+            ('status_code', 'STRING'),
+            ('nsf_information', 'STRING'),
+            ('account_number', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'foreign_bureau': {
+        'table': '27_foreign_bureau',
+        'attr': 'frbr',
+        'codes': [
+            ('FI', ' FI ', 1, 'foreign bureau inquries'),
+        ],
+        'fields': {
+            'date_inquiry': 'segment[3:13]',
+            'city_narrative': 'segment[14:32]',
+            'province_narrative': 'segment[33:53]',
+        },
+        'checks': [],
+        'converters': [
+            ('date_inquiry', 'date_inquiry', FilterAndConverter.convert_8digits_date, None),
+        ],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('date_inquiry', 'DATE'),
+            ('city_narrative', 'STRING'),
+            ('province_narrative', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'locate_special_service': {
+        'table': '28_locate_special_service',
+        'attr': 'lssv',
+        'codes': [
+            ('LO', ' LO ', 1, 'local or special service'),
+        ],
+        'fields': {
+            'date_reported': 'segment[3:10]',
+            'name_member': 'segment[11:31]',
+            'telephone_area_code': 'segment[32:35]',
+            'telephone_number': 'segment[36:44]',
+            'extension': 'segment[45:49]',
+            'member_number': 'segment[50:60]',
+            'type_code': 'segment[61:62]',
+        },
+        'checks': [
+            ('check1', 'date_reported', FilterAndConverter.filter_6digits_date),
+            ('check2', 'member_number', FilterAndConverter.filter_member_number),
+        ],
+        'converters': [],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('date_reported', 'STRING'),
+            ('name_member', 'STRING'),
+            ('telephone_area_code', 'STRING'),
+            ('telephone_number', 'STRING'),
+            ('extension', 'STRING'),
+            ('member_number', 'STRING'),
+            ('type_code', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'inquries': {
+        'table': '29_inquries',
+        'attr': 'inqr',
+        'codes': [
+            ('IQ', ' IQ ', 1, 'inquries'),
+        ],
+        'fields': {
+            'date_inquiry': 'segment[3:13]',
+            'name_member': 'segment[14:34]',
+            'telephone_area_code': 'segment[35:38]',
+            'telephone_number': 'segment[39:47]',
+            'extension': 'segment[48:52]',
+            'member_number': 'segment[53:63]',
+        },
+        'checks': [
+            ('check1', 'member_number', FilterAndConverter.filter_member_number),
+        ],
+        'converters': [
+            ('date_inquiry', 'date_inquiry', FilterAndConverter.convert_8digits_date, None),
+        ],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('date_inquiry', 'DATE'),
+            ('name_member', 'STRING'),
+            ('telephone_area_code', 'STRING'),
+            ('telephone_number', 'STRING'),
+            ('extension', 'STRING'),
+            ('member_number', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'consumer_declaration': {
+        'table': '30_consumer_declaration',
+        'attr': 'csdc',
+        'codes': [
+            ('CD', ' CD ', 1, 'consumer declaration'),
+        ],
+        'fields': {
+            'date_reported': 'segment[6:10] + segment[3:5]',
+            'date_purged': 'segment[14:18] + segment[11:13]',
+            'declaration': 'segment[19:79]',
+            'declaration_continued_1': 'segment[80:158]',
+            'declaration_continued_2': 'segment[160:238]',
+            'declaration_continued_3': 'segment[240:318]',
+            'declaration_continued_4': 'segment[320:398]',
+            'declaration_continued_end': 'segment[400:428]',
+        },
+        'checks': [
+            ('check1', 'date_reported', FilterAndConverter.filter_6digits_date),
+            ('check2', 'date_purged', FilterAndConverter.filter_6digits_date),
+        ],
+        'converters': [],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('date_reported', 'STRING'),
+            ('date_purged', 'STRING'),
+            ('declaration', 'STRING'),
+            ('declaration_continued_1', 'STRING'),
+            ('declaration_continued_2', 'STRING'),
+            ('declaration_continued_3', 'STRING'),
+            ('declaration_continued_4', 'STRING'),
+            ('declaration_continued_end', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+    'bureau_score': {
+        'table': '31_bureau_score',
+        'attr': 'busc',
+        'codes': [
+            ('BS', ' BS ', 1, 'bureau score'),
+        ],
+        'fields': {
+            'product_score': 'segment[3:8]',
+            'first_reason_code': 'segment[9:11]',
+            'second_reason_code': 'segment[12:14]',
+            'third_reason_code': 'segment[15:17]',
+            'fourth_reason_code': 'segment[18:20]',
+            'reject_message_code': 'segment[21:22]',
+            'reserved': 'segment[26:28]',
+            'product_identifier': 'segment[77:79]',
+        },
+        'checks': [
+            ('check1', 'product_score', lambda x: x.strip().isdigit() if x[0] not in ['+', '-'] else x.strip()[1:].isdigit()),
+        ],
+        'converters': [
+            ('product_score', 'product_score', FilterAndConverter.convert_int_with_missing, 'Int64'),
+        ],
+        'schema': [
+            ('bus_ptnr', 'STRING'),
+            ('file_date', 'DATE'),
+            ('product_score', 'INT64'),
+            ('first_reason_code', 'STRING'),
+            ('second_reason_code', 'STRING'),
+            ('third_reason_code', 'STRING'),
+            ('fourth_reason_code', 'STRING'),
+            ('reject_message_code', 'STRING'),
+            ('reserved', 'STRING'),
+            ('product_identifier', 'STRING'),
+            ('segment_code', 'STRING'),
+            ('segment_description', 'STRING'),
+            ('order_in_segment', 'INT64'),
+        ],
+    },
+}
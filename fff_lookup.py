@@ -0,0 +1,33 @@
+from typing import Optional, Union
+from fff_cache import RawCache
+from fff_engine import parse_report
+
+
+# Investigate one consumer without querying a month: the reports of a business_partner_id (or a single report id)
+# are located through the index of the raw cache (see RawCache.find), read from the memory-mapped fetch files and
+# parsed one by one with the per-report parser. Only the months already fetched with a raw_cache_dir are covered.
+# Returns one dict per report, by file_date: its id, business_partner_id, file_name, file_date and
+# `records` = {segment: [record dicts]}, as parse_report.
+def lookup(raw_cache: Union[RawCache, str], business_partner_id: Optional[str] = None, start=None, end=None,
+           id: Optional[str] = None, which_tables: Optional[list] = None, use_segment_counter: bool = True) -> list:
+    opened = isinstance(raw_cache, str)
+    if opened:
+        raw_cache = RawCache(raw_cache)
+    try:
+        rows = raw_cache.find(business_partner_id=business_partner_id, id=id, start=start, end=end)
+    finally:
+        # a cache opened here is closed here; one passed in stays open for the caller
+        if opened:
+            raw_cache.close()
+    output = []
+    for row in rows:
+        records = parse_report(row.get('file_raw_content'), row.get('id'), row.get('file_date'), which_tables=which_tables,
+                               use_segment_counter=use_segment_counter)
+        output.append({
+            'id': row.get('id'),
+            'business_partner_id': row.get('business_partner_id'),
+            'file_name': row.get('file_name'),
+            'file_date': row.get('file_date'),
+            'records': records,
+        })
+    return output
@@ -0,0 +1,51 @@
+from typing import Optional
+
+
+# the source table of the raw hard pulls
+FFF_NAME = 'xxx'
+
+
+# The fetch query of one run, kept free of heavy imports so the command line (dry runs included) can build it
+# without loading pandas or the BigQuery client.
+# A single month is limited to its first 1000 reports, and debug_mode to the first 200 of any run.
+# shards = [(column, index, count), ...] keeps only the rows whose column hashes into bucket `index` out of `count`, for
+# every entry (FARM_FINGERPRINT is deterministic, so the buckets are the same on every run and every machine). A limit
+# is applied once, to the ordered rows of the whole run, before the split, so the shards together hold the rows of the
+# unsharded run rather than up to `limit` rows each.
+# ordered=False drops the global ORDER BY, which otherwise forces a sort of the whole result into a single stream.
+def build_fetch_query(fff_name: str, begin_year: int, begin_month: int, end_year: Optional[int] = None,
+                      end_month: Optional[int] = None, debug_mode: bool = False, shards: Optional[list] = None,
+                      ordered: bool = True) -> str:
+    if end_year is not None and end_month is not None:
+        last_year, last_month, limit = end_year, end_month, None
+    else:
+        last_year, last_month, limit = begin_year, begin_month, 1000
+    if debug_mode:
+        limit = 200 if limit is None else min(limit, 200)
+    shard_filter = ' AND\n            '.join(
+        f'MOD(ABS(FARM_FINGERPRINT(CAST({column} AS STRING))), {count}) = {index}' for column, index, count in (shards or [])
+    )
+    order_by = '\n            ORDER BY business_partner_id, file_date'
+    fetch_query = f"""
+            SELECT * FROM `{fff_name}`
+            WHERE file_date >= DATE(SAFE_CAST({begin_year} AS INT64), SAFE_CAST({begin_month} AS INT64), 1) AND
+            file_date <= LAST_DAY(DATE(SAFE_CAST({last_year} AS INT64), SAFE_CAST({last_month} AS INT64), 1))"""
+    if shard_filter == '':
+        if ordered:
+            fetch_query += order_by
+        if limit is not None:
+            fetch_query += f'\n            LIMIT {limit}'
+    elif limit is None:
+        fetch_query += f' AND\n            {shard_filter}'
+        if ordered:
+            fetch_query += order_by
+    else:
+        # the limited rows are picked in order whatever `ordered`, so every shard splits the same rows
+        fetch_query = f"""
+            SELECT * FROM ({fetch_query}{order_by}
+            LIMIT {limit}
+            )
+            WHERE {shard_filter}"""
+        if ordered:
+            fetch_query += order_by
+    return fetch_query + '\n        '
@@ -0,0 +1,244 @@
+import datetime
+import decimal
+from functools import lru_cache
+from typing import Optional
+import pandas as pd
+from google.cloud import bigquery
+from google.cloud.bigquery import SchemaField
+from fff_layouts import HEADER_SCHEMA, QUARANTINE_SCHEMA, REJECTED_SCHEMA, SEGMENT_LAYOUTS
+
+
+# raised before a push when a table does not match its schema (and when a schema declares a field twice)
+class SchemaMismatchError(ValueError):
+    pass
+
+
+# The destination of every table pushed by the parser: table suffix, schema and a ready-made load config.
+# Built once per process (see get_registry) and shared by all FFFParser instances, so a long backfill does not
+# rebuild SchemaField lists and LoadJobConfigs for every month and table. The client copies the job config
+# on each load, so one instance can serve every load of its table.
+# not_null lists the columns checked for nulls before a push on top of the REQUIRED fields; it stays local, so the
+# load schema (and the mode of the existing tables) is unchanged.
+# partition_field/partition_type and clustering are the layout a destination table is created with when it does not
+# exist yet (see definition and BigQuerySink); existing tables are left as they are.
+class TableSpec:
+    def __init__(self, name: str, table: str, schema: list, not_null: tuple = (), partition_field: Optional[str] = None,
+                 partition_type: str = 'MONTH', clustering: tuple = ()):
+        self.name = name
+        self.table = table
+        self.partition_field = partition_field
+        self.partition_type = partition_type
+        self.clustering = tuple(clustering)
+        self.schema = [field if isinstance(field, SchemaField) else SchemaField(*field) for field in schema]
+        names = [field.name for field in self.schema]
+        duplicated = sorted(set(n for n in names if names.count(n) > 1))
+        if len(duplicated) > 0:
+            raise SchemaMismatchError(f'{table}: duplicated fields {duplicated} in the schema')
+        self.not_null = tuple(not_null)
+        self.job_config = bigquery.LoadJobConfig(
+            schema=self.schema,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+        )
+        # for Arrow tables, loaded as Parquet with load_table_from_file
+        self.file_job_config = bigquery.LoadJobConfig(
+            schema=self.schema,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+            source_format=bigquery.SourceFormat.PARQUET
+        )
+
+    def table_id(self, bq_prefix: str) -> str:
+        return f'{bq_prefix}.{self.table}'
+
+    # the table to create at table_id: schema, time partitioning on partition_field, clustering
+    def definition(self, table_id: str) -> bigquery.Table:
+        table = bigquery.Table(table_id, schema=self.schema)
+        if self.partition_field is not None:
+            table.time_partitioning = bigquery.TimePartitioning(type_=self.partition_type, field=self.partition_field)
+        if len(self.clustering) > 0:
+            table.clustering_fields = list(self.clustering)
+        return table
+
+    # Check a table (DataFrame or Arrow table) against the schema before it is pushed: column names and order, dtypes
+    # and nullability. It only looks at the dtypes and, for object columns, at the first non-null value, so it fails in
+    # milliseconds instead of after the upload round trip of a load job. All the problems are reported at once.
+    def validate(self, table):
+        if not isinstance(table, pd.DataFrame):
+            return self._validate_arrow(table)
+        problems = []
+        names = [field.name for field in self.schema]
+        columns = list(table.columns)
+        problems += _column_problems(columns, names)
+        for field in self.schema:
+            if field.name not in columns:
+                continue
+            column = table[field.name]
+            if not _conforms(column, field):
+                found = f'object of {_first_type(column)}' if pd.api.types.is_object_dtype(column.dtype) else str(column.dtype)
+                problems.append(f'{field.name}: {found} does not fit {field.mode} {field.field_type}')
+            if (field.mode == 'REQUIRED' or field.name in self.not_null) and column.isna().any():
+                problems.append(f'{field.name}: {int(column.isna().sum())} nulls in a non-nullable column')
+        if len(problems) > 0:
+            raise SchemaMismatchError(f'{self.table}: ' + '; '.join(problems))
+
+    def _validate_arrow(self, table):
+        problems = _column_problems(table.column_names, [field.name for field in self.schema])
+        for field in self.schema:
+            if field.name not in table.column_names:
+                continue
+            column = table[field.name]
+            if not _conforms_arrow(column.type, field):
+                problems.append(f'{field.name}: {column.type} does not fit {field.mode} {field.field_type}')
+            if (field.mode == 'REQUIRED' or field.name in self.not_null) and column.null_count > 0:
+                problems.append(f'{field.name}: {column.null_count} nulls in a non-nullable column')
+        if len(problems) > 0:
+            raise SchemaMismatchError(f'{self.table}: ' + '; '.join(problems))
+
+
+# Every table is partitioned by month of file_date (a monthly run touches one partition, and a long history stays far
+# below the partition limit of a table) and clustered by the consumer/report keys: the header by business_partner_id
+# and id, the segment tables by bus_ptnr (the report id the header joins on).
+HEADER_LAYOUT = {'partition_field': 'file_date', 'partition_type': 'MONTH', 'clustering': ('business_partner_id', 'id')}
+SEGMENT_LAYOUT = {'partition_field': 'file_date', 'partition_type': 'MONTH', 'clustering': ('bus_ptnr',)}
+
+
+class SchemaRegistry:
+    def __init__(self):
+        self.tables = {
+            'header': TableSpec('header', 'fff_segment_0_header', HEADER_SCHEMA, not_null=('id', 'file_date'), **HEADER_LAYOUT),
+            'quarantine': TableSpec('quarantine', 'fff_quarantine', QUARANTINE_SCHEMA, not_null=('bus_ptnr', 'file_date'),
+                                    **SEGMENT_LAYOUT),
+        }
+        for seg, layout in SEGMENT_LAYOUTS.items():
+            self.tables[seg] = TableSpec(seg, f"fff_segment_{layout['table']}", layout['schema'], not_null=('bus_ptnr', 'file_date'),
+                                         **SEGMENT_LAYOUT)
+            self.tables[f'{seg}_rejected'] = TableSpec(f'{seg}_rejected', f"fff_rejected_{layout['table']}", _rejected_fields(layout),
+                                                       not_null=('bus_ptnr', 'file_date', 'failed_checks'), **SEGMENT_LAYOUT)
+        self._nested = {}
+
+    # the nested table (fff_reports): one row per report, the header columns followed by one REPEATED RECORD per
+    # segment holding the segment columns except bus_ptnr/file_date
+    def nested_spec(self, seg_names: list) -> TableSpec:
+        key = ('nested',) + tuple(seg_names)
+        if key not in self._nested:
+            schema = list(HEADER_SCHEMA)
+            for seg in seg_names:
+                fields = [SchemaField(column, field_type) for column, field_type in SEGMENT_LAYOUTS[seg]['schema']
+                          if column not in ('bus_ptnr', 'file_date')]
+                schema.append(SchemaField(seg, 'RECORD', mode='REPEATED', fields=fields))
+            self._nested[key] = TableSpec('nested', 'fff_reports', schema, not_null=('id', 'file_date'), **HEADER_LAYOUT)
+        return self._nested[key]
+
+    # the spec of a destination table by its name (fff_segment_..., fff_reports), None if unknown
+    def by_table(self, table: str) -> Optional[TableSpec]:
+        for spec in list(self.tables.values()) + list(self._nested.values()):
+            if spec.table == table:
+                return spec
+        return None
+
+    def __getitem__(self, name: str) -> TableSpec:
+        return self.tables[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.tables
+
+
+# the records rejected by the checks are kept as extracted, so every field is a string
+def _rejected_fields(layout: dict) -> list:
+    return ([('bus_ptnr', 'STRING'), ('file_date', 'DATE')] + [(field, 'STRING') for field in layout['fields']] +
+            [('segment_code', 'STRING'), ('segment_description', 'STRING'), ('order_in_segment', 'INT64')] + REJECTED_SCHEMA)
+
+
+# Python types accepted in an object column for each BigQuery type (the loader converts them), bool excluded from the
+# numbers; columns with a native dtype are checked on the dtype alone
+_OBJECT_TYPES = {
+    'STRING': (str,),
+    'DATE': (datetime.date,),
+    'TIMESTAMP': (datetime.datetime, pd.Timestamp),
+    'INTEGER': (int,), 'INT64': (int,),
+    'FLOAT': (int, float), 'FLOAT64': (int, float),
+    'NUMERIC': (int, float, decimal.Decimal),
+    'BOOLEAN': (bool,), 'BOOL': (bool,),
+    'RECORD': (dict,), 'STRUCT': (dict,),
+}
+
+
+def _column_problems(columns: list, names: list) -> list:
+    problems = []
+    missing = [name for name in names if name not in columns]
+    extra = [column for column in columns if column not in names]
+    if len(missing) > 0:
+        problems.append(f'missing columns {missing}')
+    if len(extra) > 0:
+        problems.append(f'columns not in the schema {extra}')
+    if len(missing) == 0 and len(extra) == 0 and columns != names:
+        first = next(k for k, (column, name) in enumerate(zip(columns, names)) if column != name)
+        problems.append(f'columns out of order from position {first}: {columns[first]!r} where the schema has {names[first]!r}')
+    return problems
+
+
+def _first_type(column: pd.Series) -> str:
+    index = column.first_valid_index()
+    return 'all null' if index is None else type(column[index]).__name__
+
+
+def _conforms(column: pd.Series, field: SchemaField) -> bool:
+    dtype = column.dtype
+    if field.mode == 'REPEATED':
+        accepted = (list, tuple)
+    elif pd.api.types.is_object_dtype(dtype):
+        accepted = _OBJECT_TYPES.get(field.field_type, (object,))
+    elif field.field_type == 'STRING':
+        return pd.api.types.is_string_dtype(dtype)
+    elif field.field_type == 'DATE':
+        # dbdate is the dtype of the DATE columns fetched with the BigQuery client
+        return pd.api.types.is_datetime64_any_dtype(dtype) or str(dtype) == 'dbdate'
+    elif field.field_type == 'TIMESTAMP':
+        return pd.api.types.is_datetime64_any_dtype(dtype)
+    elif field.field_type in ('INTEGER', 'INT64'):
+        return pd.api.types.is_integer_dtype(dtype)
+    elif field.field_type in ('FLOAT', 'FLOAT64', 'NUMERIC'):
+        return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+    elif field.field_type in ('BOOLEAN', 'BOOL'):
+        return pd.api.types.is_bool_dtype(dtype)
+    else:
+        return True
+    index = column.first_valid_index()
+    if index is None:
+        return True
+    value = column[index]
+    if isinstance(value, bool) and bool not in accepted:
+        return False
+    return isinstance(value, accepted)
+
+
+# Arrow types the Parquet load (and the cast to the declared types in fff_sinks.arrow_table) accepts for each type
+def _conforms_arrow(arrow_type, field: SchemaField) -> bool:
+    import pyarrow as pa
+    if pa.types.is_null(arrow_type):
+        return True
+    if field.mode == 'REPEATED':
+        return pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type)
+    checks = {
+        'STRING': lambda t: pa.types.is_string(t) or pa.types.is_large_string(t),
+        'DATE': lambda t: pa.types.is_date(t),
+        'TIMESTAMP': lambda t: pa.types.is_timestamp(t),
+        'INTEGER': pa.types.is_integer, 'INT64': pa.types.is_integer,
+        'FLOAT': lambda t: pa.types.is_floating(t) or pa.types.is_integer(t),
+        'FLOAT64': lambda t: pa.types.is_floating(t) or pa.types.is_integer(t),
+        'NUMERIC': lambda t: pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_decimal(t),
+        'BOOLEAN': pa.types.is_boolean, 'BOOL': pa.types.is_boolean,
+        'RECORD': pa.types.is_struct, 'STRUCT': pa.types.is_struct,
+    }
+    check = checks.get(field.field_type)
+    return True if check is None else check(arrow_type)
+
+
+@lru_cache(maxsize=None)
+def get_registry() -> SchemaRegistry:
+    return SchemaRegistry()
+
+
+# one authenticated client per project and process
+@lru_cache(maxsize=None)
+def get_client(project_id: Optional[str] = None) -> bigquery.Client:
+    return bigquery.Client(project=project_id)
@@ -0,0 +1,144 @@
+import time
+import asyncio
+import numpy as np
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional
+from fff_engine import parse_batch
+
+
+# An in-process asyncio parse service for online scoring.
+# Callers `await service.submit(raw_content)`; pending requests are coalesced into a micro-batch that closes when it
+# holds max_batch_size reports or when the oldest one has waited max_delay_ms, whichever comes first. Each batch is
+# parsed with the batch engine on a worker pool and every caller gets back its own {segment name: [records]}.
+# The default pool has max_workers processes: parsing is pure Python and holds the GIL, so threads would parse one
+# batch at a time. parse_batch and its arguments and results are plain picklable values; a ThreadPoolExecutor can
+# still be passed as executor where the batches are too small to pay for the transfer to another process.
+# The default pool lives from start() to stop(); a submit after stop() starts the service again with a new one.
+class FFFParseService:
+    def __init__(self, which_tables: Optional[list] = None, max_batch_size: int = 64, max_delay_ms: float = 2.0,
+                 max_workers: int = 4, executor: Optional[Executor] = None, use_segment_counter: bool = True):
+        self.which_tables = which_tables
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.use_segment_counter = use_segment_counter
+        self.max_workers = max_workers
+        self._own_executor = executor is None
+        self.executor = executor
+        self.run_stats = {'requests': 0, 'batches': 0, 'full_batches': 0, 'deadline_batches': 0}
+        self._queue = None
+        self._batcher = None
+        self._inflight = set()
+
+    async def start(self):
+        if self._batcher is None:
+            if self._own_executor and self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._run_batcher())
+        return self
+
+    async def stop(self):
+        if self._batcher is not None:
+            await self._queue.put(None)
+            await self._batcher
+            self._batcher = None
+        if len(self._inflight) > 0:
+            await asyncio.gather(*self._inflight)
+        if self._own_executor and self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def submit(self, raw_content: str, id: Optional[str] = None, file_date=None) -> dict:
+        if self._batcher is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((raw_content, id, file_date, future))
+        self.run_stats['requests'] += 1
+        return await future
+
+    async def _run_batcher(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self.run_stats['batches'] += 1
+            if len(batch) == self.max_batch_size:
+                self.run_stats['full_batches'] += 1
+            else:
+                self.run_stats['deadline_batches'] += 1
+            task = asyncio.create_task(self._parse_batch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _parse_batch(self, batch: list):
+        raw_contents = [raw for raw, _, _, _ in batch]
+        ids = [id for _, id, _, _ in batch]
+        dates = [dt for _, _, dt, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, parse_batch, raw_contents, ids, dates, self.which_tables, self.use_segment_counter
+            )
+        except Exception as e:
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+# Local load generator: fires n_requests submits drawn from raw_contents at a fixed arrival rate (requests per second,
+# or all at once when rate is None) and reports the latency percentiles in milliseconds and the batches it caused.
+async def run_load_test(service: FFFParseService, raw_contents: list, n_requests: int = 1000,
+                        rate: Optional[float] = None) -> dict:
+    latencies = [0.0] * n_requests
+
+    async def one_request(k: int):
+        t0 = time.perf_counter()
+        await service.submit(raw_contents[k % len(raw_contents)], id=str(k))
+        latencies[k] = (time.perf_counter() - t0) * 1000
+
+    n_batches = service.run_stats['batches']
+    t_begin = time.perf_counter()
+    tasks = []
+    for k in range(n_requests):
+        tasks.append(asyncio.create_task(one_request(k)))
+        if rate is not None:
+            await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t_begin
+    return {
+        'requests': n_requests,
+        'throughput_per_s': n_requests / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(np.max(latencies)),
+        'batches': service.run_stats['batches'] - n_batches,
+    }
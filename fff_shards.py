@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import datetime
+from typing import Optional
+
+
+# Shard manifests of a run split across machines (FFFParser(shard_index=i, shard_count=n, manifest_dir=...)).
+# Every shard writes <manifest_dir>/<run key>/shard_<i>_of_<n>.json once all its tables are pushed; merge_shards
+# checks that all n manifests are there before appending the shard outputs into the real destinations.
+def run_key(begin_year: int, begin_month: int, end_year: Optional[int] = None, end_month: Optional[int] = None) -> str:
+    if end_year is not None and end_month is not None:
+        return f'fff_{begin_year}{begin_month:02d}_{end_year}{end_month:02d}'
+    return f'fff_{begin_year}{begin_month:02d}'
+
+
+def manifest_path(manifest_dir: str, key: str, shard_index: int, shard_count: int) -> str:
+    return os.path.join(manifest_dir, key, f'shard_{shard_index:03d}_of_{shard_count:03d}.json')
+
+
+# file_dates, filters and segments describe what the run answers for, so the merge can replace it (write_mode='overwrite')
+def write_manifest(manifest_dir: str, key: str, shard_index: int, shard_count: int, tables: dict, run_stats: dict,
+                   file_dates: Optional[tuple] = None, filters: Optional[dict] = None, segments: Optional[list] = None):
+    path = manifest_path(manifest_dir, key, shard_index, shard_count)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    manifest = {
+        'run': key,
+        'shard_index': shard_index,
+        'shard_count': shard_count,
+        'status': 'complete',
+        'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'tables': tables,
+        'run_stats': run_stats,
+        'file_dates': None if file_dates is None else [str(date) for date in file_dates],
+        'filters': filters or {},
+        'segments': segments,
+    }
+    # written aside and renamed, so a half-written manifest never counts as a finished shard
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def read_manifests(manifest_dir: str, key: str, shard_count: int) -> list:
+    manifests, missing = [], []
+    for index in range(shard_count):
+        path = manifest_path(manifest_dir, key, index, shard_count)
+        if not os.path.exists(path):
+            missing.append(index)
+            continue
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get('status') != 'complete' or manifest.get('shard_count') != shard_count:
+            missing.append(index)
+            continue
+        manifests.append(manifest)
+    if len(missing) > 0:
+        raise RuntimeError(f'{key}: shards {missing} of {shard_count} have not finished')
+    return manifests
+
+
+def merge_shards(sink, manifest_dir: str, key: str, shard_count: int, cleanup: bool = False) -> dict:
+    manifests = read_manifests(manifest_dir, key, shard_count)
+    # every table the run answers for is merged, even with no rows in any shard (see BigQuerySink.merge_shards)
+    tables = {table: [] for table in manifests[0].get('filters', {})}
+    totals = {}
+    for manifest in manifests:
+        for table, n_rows in manifest['tables'].items():
+            tables.setdefault(table, [])
+            totals[table] = totals.get(table, 0) + n_rows
+            if n_rows > 0:
+                tables[table].append(manifest['shard_index'])
+    # the nested table is only known to the registry once built for the segments of the run
+    from fff_schemas import get_registry
+    if manifests[0].get('segments') is not None:
+        get_registry().nested_spec(manifests[0]['segments'])
+    file_dates = manifests[0].get('file_dates')
+    if file_dates is not None:
+        file_dates = tuple(datetime.date.fromisoformat(date) for date in file_dates)
+    sink.merge_shards(tables, shard_count, cleanup=cleanup, file_dates=file_dates, filters=manifests[0].get('filters'))
+    for table, n_rows in totals.items():
+        print(f'{table}: {n_rows} rows merged from {shard_count} shards into {sink.describe()}')
+    return totals
@@ -0,0 +1,516 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import datetime
+import threading
+from typing import Optional
+
+
+# Where the parsed tables go. A sink receives every table once parsed, with its TableSpec from the schema registry
+# (fff_schemas.py), and appends it to the destination. FFFParser pushes to BigQuery by default.
+# for_shard(index, count) gives the same sink writing to shard-specific destinations, and merge_shards(tables, count)
+# appends those back into the real destinations once every shard has finished (see fff_shards.py).
+# commit(file_dates, tables) is called once a run has written everything: tables = [(spec, filters), ...] are the
+# tables the run is responsible for, file_dates = (first, last) the file_date range it covers; sinks that append as
+# they go have nothing to do there. touch(spec) tells the sink the run wrote the table of spec even when it had no rows
+# to write. flush() writes out whatever a sink holds back (see BatchingSink).
+def shard_tag(index: int, count: int) -> str:
+    return f'shard_{index:03d}_of_{count:03d}'
+
+
+# Destination tables missing in BigQuery are created first with the partitioning and clustering declared in the
+# registry (TableSpec.definition); create_table(exists_ok=True) leaves existing tables untouched, and each table is
+# only checked once per sink.
+# write_mode='append' loads straight into the destinations. write_mode='overwrite' makes a run idempotent: its loads
+# go to a staging table per destination, and commit replaces the rows of the run's file_date range (the whole monthly
+# partitions, so the delete is free) with the staged rows in one transaction. Running a month again costs the same as
+# the first time, and a run broken halfway leaves the destinations as they were until restart_from_break finishes it.
+# Every load is retried with exponential backoff (max_attempts, backoff_seconds) on transient errors; an attempt whose
+# job did succeed in the end (the response was lost) is not loaded again. With upload_dir, tables larger than
+# chunk_bytes are split into Parquet chunks staged in upload_dir with a manifest and loaded one by one (see _write_chunked).
+class BigQuerySink:
+    def __init__(self, client, bq_prefix: str, shard: Optional[tuple] = None, write_mode: str = 'append',
+                 upload_dir: Optional[str] = None, chunk_bytes: int = 256 * 1024 ** 2, max_attempts: int = 5,
+                 backoff_seconds: float = 2.0):
+        if write_mode not in ('append', 'overwrite'):
+            raise ValueError(f"write_mode must be 'append' or 'overwrite', got {write_mode!r}")
+        self.client = client
+        self.bq_prefix = bq_prefix
+        self.shard = shard
+        self.write_mode = write_mode
+        self.upload_dir = upload_dir
+        self.chunk_bytes = chunk_bytes
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self._created = set()
+        self._lock = threading.Lock()
+        # staging tables of this sink, {destination: staging}; the token keeps concurrent runs apart
+        self._staging = {}
+        self._token = uuid.uuid4().hex[:12]
+        # tables already swapped by a commit that then failed, skipped when it is called again
+        self._committed = set()
+
+    def _ensure_table(self, table_id: str, spec):
+        if table_id in self._created:
+            return
+        with self._lock:
+            if table_id not in self._created:
+                self.client.create_table(spec.definition(table_id), exists_ok=True)
+                self._created.add(table_id)
+
+    def _table_id(self, table: str, shard: Optional[tuple] = None) -> str:
+        table_id = f'{self.bq_prefix}.{table}'
+        return table_id if shard is None else f'{table_id}__{shard_tag(*shard)}'
+
+    # the staging table of a destination, created on the first write of the run; it expires after a day, so the
+    # staging tables of a crashed run do not stay around
+    def _staging_table(self, table_id: str, spec) -> str:
+        with self._lock:
+            if table_id not in self._staging:
+                staging = f'{table_id}__staging_{self._token}'
+                definition = spec.definition(staging)
+                definition.expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)
+                self.client.create_table(definition, exists_ok=True)
+                self._staging[table_id] = staging
+            return self._staging[table_id]
+
+    # DataFrames go through load_table_from_dataframe; Arrow tables (engine='arrow') are written to Parquet in memory
+    # with the declared types and loaded with load_table_from_file, with no DataFrame in between
+    def write(self, table, spec):
+        table_id = self._table_id(spec.table, self.shard)
+        if self.write_mode == 'overwrite':
+            table_id = self._staging_table(table_id, spec)
+        else:
+            self._ensure_table(table_id, spec)
+        if self.upload_dir is not None:
+            table = arrow_table(table, spec)
+            if table.nbytes > self.chunk_bytes:
+                self._write_chunked(table, spec, table_id)
+                return
+        job_id = f'fff_load_{uuid.uuid4().hex}'
+        if is_arrow(table):
+            import io
+            import pyarrow.parquet as pq
+            buffer = io.BytesIO()
+            pq.write_table(arrow_table(table, spec), buffer)
+
+            def load(attempt_id):
+                buffer.seek(0)
+                return self.client.load_table_from_file(buffer, table_id, job_config=spec.file_job_config, job_id=attempt_id)
+        else:
+            def load(attempt_id):
+                return self.client.load_table_from_dataframe(table, table_id, job_config=spec.job_config, job_id=attempt_id)
+        self._load(load, table_id, job_id)
+
+    # Chunked upload of a large table: the table is written as Parquet chunks of about chunk_bytes under
+    # <upload_dir>/<key>/, with a manifest.json of the chunks and their status, then each chunk is loaded and marked
+    # confirmed in the manifest. The key hashes the destination table (never the staging table of overwrite mode, whose
+    # name changes with every sink), the file_date range and the chunk contents, so writing the same table to the same
+    # destination again, after a crash or from restart_from_break, finds the manifest and skips the confirmed chunks.
+    # The job ids derive from the upload id of the manifest: a chunk loaded just before a crash, not yet marked, is
+    # recognised by its job and not loaded twice. Confirmed chunks went to the table the manifest names: when that is
+    # the staging table of an earlier sink, which is never swapped, the chunk files are reused but all loaded again.
+    # The directory is removed once every chunk is confirmed, so a later write of the same table is a new upload.
+    def _write_chunked(self, table, spec, table_id: str):
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+        incoming = os.path.join(self.upload_dir, f'_incoming_{uuid.uuid4().hex}')
+        os.makedirs(incoming)
+        rows_per_chunk = max(1, table.num_rows * self.chunk_bytes // max(table.nbytes, 1))
+        digest = hashlib.blake2b(self._table_id(spec.table, self.shard).encode('utf-8'), digest_size=16)
+        if 'file_date' in table.column_names:
+            file_dates = pc.min_max(table['file_date'])
+            digest.update(f'{file_dates["min"]}:{file_dates["max"]}'.encode('utf-8'))
+        chunks = []
+        for n, start in enumerate(range(0, table.num_rows, rows_per_chunk)):
+            name = f'chunk_{n:05d}.parquet'
+            pq.write_table(table.slice(start, rows_per_chunk), os.path.join(incoming, name))
+            with open(os.path.join(incoming, name), 'rb') as f:
+                chunk_digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+            digest.update(chunk_digest.encode('utf-8'))
+            chunks.append({'file': name, 'rows': min(rows_per_chunk, table.num_rows - start), 'digest': chunk_digest,
+                           'status': 'pending'})
+        key = digest.hexdigest()
+        upload = os.path.join(self.upload_dir, key)
+        manifest_path = os.path.join(upload, 'manifest.json')
+        if os.path.exists(manifest_path):
+            shutil.rmtree(incoming)
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest['table_id'] != table_id:
+                manifest = {'table_id': table_id, 'upload_id': uuid.uuid4().hex,
+                            'chunks': [dict(chunk, status='pending') for chunk in manifest['chunks']]}
+                _write_json(manifest_path, manifest)
+            n_confirmed = sum(chunk['status'] == 'confirmed' for chunk in manifest['chunks'])
+            print(f'{spec.table}: resuming the upload of {len(chunks)} chunks, {n_confirmed} already confirmed')
+        else:
+            shutil.rmtree(upload, ignore_errors=True)
+            os.replace(incoming, upload)
+            manifest = {'table_id': table_id, 'upload_id': uuid.uuid4().hex, 'chunks': chunks}
+            _write_json(manifest_path, manifest)
+        for n, chunk in enumerate(manifest['chunks']):
+            if chunk['status'] == 'confirmed':
+                continue
+            path = os.path.join(upload, chunk['file'])
+
+            def load(attempt_id):
+                with open(path, 'rb') as f:
+                    return self.client.load_table_from_file(f, table_id, job_config=spec.file_job_config, job_id=attempt_id)
+            self._load(load, f'{spec.table}[{n + 1}/{len(manifest["chunks"])}]', f'fff_upload_{manifest["upload_id"]}_{n:05d}')
+            chunk['status'] = 'confirmed'
+            _write_json(manifest_path, manifest)
+        shutil.rmtree(upload)
+
+    # load(job_id) starts the load job; attempt k uses the job id <job_id>_<k>. An attempt whose job already exists
+    # (a retry, or a process that crashed) counts as done if that job succeeded.
+    def _load(self, load, name: str, job_id: str):
+        from google.api_core import exceptions
+        delay = self.backoff_seconds
+        for attempt in range(self.max_attempts):
+            if attempt > 0 and self._succeeded(f'{job_id}_{attempt - 1}'):
+                return
+            try:
+                load(f'{job_id}_{attempt}').result()
+                return
+            except exceptions.Conflict:
+                if self._succeeded(f'{job_id}_{attempt}'):
+                    return
+            except Exception as e:
+                if not is_transient(e) or attempt == self.max_attempts - 1:
+                    raise
+                print(f'{name}: load failed ({type(e).__name__}: {e}), retrying in {delay:.0f}s')
+                time.sleep(delay)
+                delay *= 2
+        raise RuntimeError(f'{name}: {self.max_attempts} load attempts failed')
+
+    def _succeeded(self, job_id: str) -> bool:
+        try:
+            self.client.get_job(job_id).result()
+            return True
+        except Exception:
+            return False
+
+    # overwrite mode: an empty table written by the run still gets its staging table, so its old rows are replaced by none
+    def touch(self, spec):
+        if self.write_mode == 'overwrite':
+            self._staging_table(self._table_id(spec.table, self.shard), spec)
+
+    # overwrite mode: every table of the run is replaced within file_dates (and the filters, e.g. the segments of the
+    # run in the shared quarantine table), the tables the run left empty included (see touch). A table the run did not
+    # write, i.e. without a staging table of this sink, is never swapped: its rows are kept.
+    def commit(self, file_dates: tuple, tables: list):
+        if self.write_mode != 'overwrite':
+            return
+        for spec, filters in tables:
+            table_id = self._table_id(spec.table, self.shard)
+            if table_id in self._committed:
+                continue
+            staging = self._staging.get(table_id)
+            if staging is None:
+                print(f'{table_id}: not written by this run, its rows are kept')
+                continue
+            self._ensure_table(table_id, spec)
+            self._swap(table_id, staging, file_dates, filters, [field.name for field in spec.schema])
+            self._committed.add(table_id)
+            self.client.delete_table(staging, not_found_ok=True)
+            del self._staging[table_id]
+        self._committed = set()
+
+    # one multi-statement transaction, so readers see either the old rows or the new ones
+    def _swap(self, table_id: str, staging: Optional[str], file_dates: tuple, filters: dict, columns: Optional[list] = None):
+        from google.cloud import bigquery
+        params = [bigquery.ScalarQueryParameter('first_date', 'DATE', file_dates[0]),
+                  bigquery.ScalarQueryParameter('last_date', 'DATE', file_dates[1])]
+        where = 'file_date BETWEEN @first_date AND @last_date'
+        for k, (column, values) in enumerate(filters.items()):
+            params.append(bigquery.ArrayQueryParameter(f'filter_{k}', 'STRING', [str(value) for value in values]))
+            where += f' AND {column} IN UNNEST(@filter_{k})'
+        script = f'BEGIN TRANSACTION;\nDELETE FROM `{table_id}` WHERE {where};\n'
+        if staging is not None:
+            selected = '*' if columns is None else ', '.join(columns)
+            into = '' if columns is None else f' ({selected})'
+            script += f'INSERT INTO `{table_id}`{into} SELECT {selected} FROM `{staging}`;\n'
+        script += 'COMMIT TRANSACTION;'
+        self.client.query(script, job_config=bigquery.QueryJobConfig(query_parameters=params)).result()
+
+    def for_shard(self, index: int, count: int):
+        return BigQuerySink(self.client, self.bq_prefix, shard=(index, count), write_mode=self.write_mode,
+                            upload_dir=self.upload_dir, chunk_bytes=self.chunk_bytes, max_attempts=self.max_attempts,
+                            backoff_seconds=self.backoff_seconds)
+
+    # tables = {table: [shard indexes holding rows]}; the shard tables are appended with one copy job per table, into
+    # the destination created first with its declared layout (a table the registry does not know, e.g. a nested table
+    # with other segments, is created by the copy itself with the layout of the shard tables).
+    # In overwrite mode the shard tables are copied into a staging table instead, swapped in for file_dates and
+    # filters ({table: filters}) as in commit.
+    def merge_shards(self, tables: dict, count: int, cleanup: bool = False, file_dates: Optional[tuple] = None,
+                     filters: Optional[dict] = None):
+        from google.cloud import bigquery
+        from fff_schemas import get_registry
+        if self.write_mode == 'overwrite' and file_dates is None:
+            raise ValueError('merging shards in overwrite mode needs the file_date range of the run')
+        disposition = bigquery.WriteDisposition.WRITE_TRUNCATE if self.write_mode == 'overwrite' else bigquery.WriteDisposition.WRITE_APPEND
+        copy_config = bigquery.CopyJobConfig(write_disposition=disposition)
+        for table, indexes in tables.items():
+            sources = [self._table_id(table, (index, count)) for index in indexes]
+            spec = get_registry().by_table(table)
+            if spec is not None and (len(sources) > 0 or self.write_mode == 'overwrite'):
+                self._ensure_table(self._table_id(table), spec)
+            if self.write_mode == 'overwrite':
+                staging = f'{self._table_id(table)}__staging_{self._token}' if len(sources) > 0 else None
+                if staging is not None:
+                    self.client.copy_table(sources, staging, job_config=copy_config).result()
+                columns = None if spec is None else [field.name for field in spec.schema]
+                self._swap(self._table_id(table), staging, file_dates, (filters or {}).get(table, {}), columns)
+                if staging is not None:
+                    self.client.delete_table(staging, not_found_ok=True)
+            elif len(sources) > 0:
+                self.client.copy_table(sources, self._table_id(table), job_config=copy_config).result()
+            if cleanup:
+                for source in sources:
+                    self.client.delete_table(source, not_found_ok=True)
+
+    def flush(self):
+        pass
+
+    def describe(self) -> str:
+        mode = ', overwrite' if self.write_mode == 'overwrite' else ''
+        if self.shard is not None:
+            return f'BigQuery @ {self.bq_prefix} ({shard_tag(*self.shard)}{mode})'
+        return f'BigQuery @ {self.bq_prefix}' + (' (overwrite)' if mode else '')
+
+
+# Local sink: every write becomes one Parquet file under <out_dir>/<table>/, so a destination table is a directory
+# of parts that any Parquet reader (or a later load job) takes as a whole. Shards write under
+# <out_dir>/_shards/<shard tag>/<table>/.
+class ParquetSink:
+    def __init__(self, out_dir: str, shard: Optional[tuple] = None):
+        self.out_dir = out_dir
+        self.shard = shard
+        self._n_parts = 0
+        self._lock = threading.Lock()
+
+    def _table_dir(self, table: str, shard: Optional[tuple] = None) -> str:
+        if shard is None:
+            return os.path.join(self.out_dir, table)
+        return os.path.join(self.out_dir, '_shards', shard_tag(*shard), table)
+
+    def for_shard(self, index: int, count: int):
+        return ParquetSink(self.out_dir, shard=(index, count))
+
+    # the parts of every shard are concatenated into one part per table
+    def merge_shards(self, tables: dict, count: int, cleanup: bool = False, file_dates: Optional[tuple] = None,
+                     filters: Optional[dict] = None):
+        import shutil
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        for table, indexes in tables.items():
+            paths = []
+            for index in indexes:
+                shard_dir = self._table_dir(table, (index, count))
+                paths += [os.path.join(shard_dir, name) for name in sorted(os.listdir(shard_dir)) if name.endswith('.parquet')]
+            if len(paths) > 0:
+                merged = pa.concat_tables([pq.read_table(path) for path in paths], promote_options='default')
+                table_dir = self._table_dir(table)
+                os.makedirs(table_dir, exist_ok=True)
+                pq.write_table(merged, os.path.join(table_dir, f'part-{time.strftime("%Y%m%d%H%M%S")}-merged-{count:03d}-shards.parquet'))
+        if cleanup:
+            for index in range(count):
+                shutil.rmtree(os.path.join(self.out_dir, '_shards', shard_tag(index, count)), ignore_errors=True)
+            if os.path.isdir(os.path.join(self.out_dir, '_shards')) and len(os.listdir(os.path.join(self.out_dir, '_shards'))) == 0:
+                os.rmdir(os.path.join(self.out_dir, '_shards'))
+
+    def write(self, table, spec):
+        table_dir = self._table_dir(spec.table, self.shard)
+        os.makedirs(table_dir, exist_ok=True)
+        with self._lock:
+            self._n_parts += 1
+            n_part = self._n_parts
+        path = os.path.join(table_dir, f'part-{time.strftime("%Y%m%d%H%M%S")}-{os.getpid()}-{n_part:05d}.parquet')
+        import pyarrow.parquet as pq
+        pq.write_table(arrow_table(table, spec), path)
+
+    def touch(self, spec):
+        pass
+
+    # every write is already a part of its own
+    def commit(self, file_dates: tuple, tables: list):
+        pass
+
+    def flush(self):
+        pass
+
+    def describe(self) -> str:
+        if self.shard is not None:
+            return f'Parquet @ {self.out_dir} ({shard_tag(*self.shard)})'
+        return f'Parquet @ {self.out_dir}'
+
+
+# Batching sink for backfills: wraps another sink and holds the tables back, as Arrow tables with the declared types,
+# across runs (months) until max_rows or max_bytes are reached in one of them; each table then goes out as one write,
+# i.e. one Parquet load job per table into BigQuery instead of one per table and month.
+# A run is only flushed once committed, never halfway, so the commits of the wrapped sink (write_mode='overwrite')
+# cover exactly the rows written before them: the committed runs are held as one pending batch over a file_date range,
+# the writes of the run in progress aside. A run that does not follow on from the pending batch (a gap in the months, or
+# other tables) is a checkpoint, and so is flush(): the pending batch is written and committed first.
+# backfill flushes at the end, and shard runs before writing their manifest.
+class BatchingSink:
+    def __init__(self, sink, max_rows: int = 5_000_000, max_bytes: int = 1024 ** 3):
+        self.sink = sink
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self._open = {}
+        self._pending = {}
+        self._pending_dates = None
+        self._pending_tables = []
+        self._lock = threading.Lock()
+
+    def write(self, table, spec):
+        table = arrow_table(table, spec)
+        with self._lock:
+            self._open.setdefault(spec.table, (spec, []))[1].append(table)
+
+    def touch(self, spec):
+        with self._lock:
+            self._open.setdefault(spec.table, (spec, []))
+
+    def commit(self, file_dates: tuple, tables: list):
+        with self._lock:
+            if self._pending_dates is not None and not self._follows(file_dates, tables):
+                self._flush_pending()
+            if self._pending_dates is None:
+                self._pending_dates, self._pending_tables = file_dates, list(tables)
+            elif file_dates == self._pending_dates:
+                self._pending_tables = _merge_tables(self._pending_tables, tables)
+            else:
+                self._pending_dates = (self._pending_dates[0], file_dates[1])
+            for name, (spec, parts) in self._open.items():
+                self._pending.setdefault(name, (spec, []))[1].extend(parts)
+            self._open = {}
+            if any(sum(part.num_rows for part in parts) >= self.max_rows or sum(part.nbytes for part in parts) >= self.max_bytes
+                   for _, parts in self._pending.values()):
+                self._flush_pending()
+
+    # the same range again (another table of the month) or the next days with the same tables
+    def _follows(self, file_dates: tuple, tables: list) -> bool:
+        if file_dates == self._pending_dates:
+            return True
+        same_tables = [(spec.table, filters) for spec, filters in tables] == [(spec.table, filters) for spec, filters in self._pending_tables]
+        return same_tables and file_dates[0] == self._pending_dates[1] + datetime.timedelta(days=1)
+
+    def _flush_pending(self):
+        import pyarrow as pa
+        for name, (spec, parts) in self._pending.items():
+            if len(parts) > 0:
+                self.sink.write(pa.concat_tables(parts), spec)
+                print(f'{name}: {sum(part.num_rows for part in parts)} rows of {self._describe_dates()} written to {self.sink.describe()}')
+            else:
+                self.sink.touch(spec)
+        if self._pending_dates is not None:
+            self.sink.commit(self._pending_dates, self._pending_tables)
+        self._pending, self._pending_dates, self._pending_tables = {}, None, []
+
+    def _describe_dates(self) -> str:
+        return f'{self._pending_dates[0]} to {self._pending_dates[1]}' if self._pending_dates is not None else 'uncommitted runs'
+
+    # checkpoint: everything committed so far is written out; writes of a run not committed yet are kept for its commit
+    def flush(self):
+        with self._lock:
+            self._flush_pending()
+        self.sink.flush()
+
+    def for_shard(self, index: int, count: int):
+        return BatchingSink(self.sink.for_shard(index, count), max_rows=self.max_rows, max_bytes=self.max_bytes)
+
+    def merge_shards(self, tables: dict, count: int, cleanup: bool = False, file_dates: Optional[tuple] = None,
+                     filters: Optional[dict] = None):
+        self.sink.merge_shards(tables, count, cleanup=cleanup, file_dates=file_dates, filters=filters)
+
+    def describe(self) -> str:
+        return f'{self.sink.describe()}, batched'
+
+
+# the tables of two commits over the same range, the filter values of a table in both put together
+def _merge_tables(tables: list, more: list) -> list:
+    merged = {spec.table: (spec, {column: list(values) for column, values in filters.items()}) for spec, filters in tables}
+    for spec, filters in more:
+        if spec.table not in merged:
+            merged[spec.table] = (spec, {column: list(values) for column, values in filters.items()})
+            continue
+        for column, values in filters.items():
+            known = merged[spec.table][1].setdefault(column, [])
+            known.extend(value for value in values if value not in known)
+    return list(merged.values())
+
+
+# only server errors (5xx), rate limits, dropped connections and timeouts are worth another attempt; anything else,
+# a rejected load as much as a bug, is raised at once
+def is_transient(e: Exception) -> bool:
+    import requests
+    from google.api_core import exceptions
+    from google.auth.exceptions import TransportError
+    if isinstance(e, (exceptions.TooManyRequests, exceptions.ServerError, ConnectionError, TimeoutError, TransportError,
+                      requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(e, exceptions.Forbidden):
+        return 'rateLimitExceeded' in str(e)
+    return False
+
+
+# written aside and renamed, so a crash never leaves half a manifest
+def _write_json(path: str, content: dict):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(content, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def is_arrow(table) -> bool:
+    return type(table).__module__.startswith('pyarrow')
+
+
+# A DataFrame or an Arrow table as an Arrow table with the types of the registry schema, so all the parts of a table
+# agree even when a column is all null in one of them
+def arrow_table(table, spec):
+    import pyarrow as pa
+    declared = {field.name: arrow_field(field) for field in spec.schema}
+    columns = table.column_names if is_arrow(table) else list(table.columns)
+    arrays, fields = [], []
+    for name in columns:
+        field = declared.get(name)
+        if is_arrow(table):
+            array = table[name] if field is None else table[name].cast(field.type)
+        elif field is None:
+            array = pa.Array.from_pandas(table[name])
+        elif pa.types.is_list(field.type):
+            array = pa.array(table[name].tolist(), type=field.type)
+        else:
+            array = pa.Array.from_pandas(table[name]).cast(field.type)
+        arrays.append(array)
+        fields.append(pa.field(name, array.type))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+_ARROW_TYPES = {
+    'STRING': 'string', 'DATE': 'date32', 'INTEGER': 'int64', 'INT64': 'int64', 'FLOAT': 'float64',
+    'FLOAT64': 'float64', 'BOOLEAN': 'bool', 'BOOL': 'bool', 'TIMESTAMP': 'timestamp_us', 'NUMERIC': 'numeric',
+}
+
+
+# BigQuery SchemaField -> Arrow field (RECORD -> struct, REPEATED -> list)
+def arrow_field(field):
+    import pyarrow as pa
+    if field.field_type in ('RECORD', 'STRUCT'):
+        arrow_type = pa.struct([arrow_field(sub) for sub in field.fields])
+    elif _ARROW_TYPES[field.field_type] == 'timestamp_us':
+        arrow_type = pa.timestamp('us')
+    elif _ARROW_TYPES[field.field_type] == 'numeric':
+        arrow_type = pa.decimal128(38, 9)
+    else:
+        arrow_type = getattr(pa, _ARROW_TYPES[field.field_type])()
+    if field.mode == 'REPEATED':
+        arrow_type = pa.list_(arrow_type)
+    return pa.field(field.name, arrow_type)
+
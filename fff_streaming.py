@@ -0,0 +1,250 @@
+import time
+import threading
+import itertools
+from typing import Optional
+from fff_sinks import arrow_field, arrow_table, is_transient
+
+
+# Streaming sink over the BigQuery Storage Write API, for the per-report and micro-batch flows where a load job takes
+# far too long to make the rows visible. It has the interface of the batch sinks (write, commit, flush, for_shard,
+# merge_shards, describe), so FFFParser and backfill take it as they are.
+# Every table is appended as Arrow record batches to one write stream per destination table, each append at an explicit
+# offset: a retried append lands at the same offset, and one already written is recognised by the API instead of
+# being written twice, so every row is written exactly once within its stream.
+# Across streams nothing is deduplicated: the rows are only ever appended (commit ignores file_dates, there is no
+# overwrite), so running a month again appends it again, and restart_from_break sends the table that broke again,
+# its batches appended before the break included.
+# stream_type='committed': the rows are visible as soon as appended (seconds after the parse).
+# stream_type='pending': the rows of a run stay invisible until commit (or flush) finalizes its streams and commits
+# them atomically per table, so a run that breaks halfway leaves nothing behind; run it again from the start (a new
+# sink) rather than restarting it, so the rows of the broken run are never committed.
+# The transport is StorageWriteClient for BigQuery, or LocalWriteClient, a local stand-in with the same offset
+# semantics for tests and dry runs.
+class StorageWriteSink:
+    def __init__(self, write_client, bq_prefix: str, stream_type: str = 'committed', max_batch_bytes: int = 8 * 1024 ** 2,
+                 max_attempts: int = 5, backoff_seconds: float = 0.5):
+        if stream_type not in ('committed', 'pending'):
+            raise ValueError(f"stream_type must be 'committed' or 'pending', got {stream_type!r}")
+        self.write_client = write_client
+        self.bq_prefix = bq_prefix
+        self.stream_type = stream_type
+        # an append request is limited to 10MB
+        self.max_batch_bytes = max_batch_bytes
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        # {table_id: [stream name, next offset, lock]}
+        self._streams = {}
+        self._created = set()
+        self._lock = threading.Lock()
+
+    def _table_id(self, table: str) -> str:
+        return f'{self.bq_prefix}.{table}'
+
+    def _stream(self, table_id: str, spec) -> list:
+        with self._lock:
+            if table_id not in self._created:
+                self.write_client.ensure_table(table_id, spec)
+                self._created.add(table_id)
+            if table_id not in self._streams:
+                name = self.write_client.create_stream(table_id, pending=self.stream_type == 'pending')
+                self._streams[table_id] = [name, 0, threading.Lock()]
+            return self._streams[table_id]
+
+    def write(self, table, spec):
+        table = arrow_table(table, spec)
+        if table.num_rows == 0:
+            return
+        stream = self._stream(self._table_id(spec.table), spec)
+        rows_per_batch = max(1, table.num_rows * self.max_batch_bytes // max(table.nbytes, 1))
+        # the appends of one stream are serialized, the offsets are those of the stream
+        with stream[2]:
+            for batch in table.to_batches(max_chunksize=rows_per_batch):
+                self._append(stream[0], batch, stream[1])
+                stream[1] += batch.num_rows
+
+    def touch(self, spec):
+        pass
+
+    def _append(self, name: str, batch, offset: int):
+        delay = self.backoff_seconds
+        for attempt in range(self.max_attempts):
+            try:
+                self.write_client.append(name, batch, offset)
+                return
+            except Exception as e:
+                if not is_transient(e) or attempt == self.max_attempts - 1:
+                    raise
+                print(f'{name}: append at offset {offset} failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s')
+                time.sleep(delay)
+                delay *= 2
+
+    # the streams of the run are finalized, and in pending mode committed, one atomic commit per table; the next
+    # write opens new streams. file_dates and tables are not used: nothing is replaced, the rows are appended
+    def commit(self, file_dates: Optional[tuple] = None, tables: Optional[list] = None):
+        with self._lock:
+            streams, self._streams = self._streams, {}
+        for table_id, (name, n_rows, lock) in streams.items():
+            with lock:
+                self.write_client.finalize(name)
+                if self.stream_type == 'pending':
+                    self.write_client.commit(table_id, [name])
+                    print(f'{table_id}: {n_rows} rows committed from a pending stream')
+
+    def flush(self):
+        self.commit()
+
+    # the shards stream straight into the real destinations (streams are independent), so there is nothing to merge
+    def for_shard(self, index: int, count: int):
+        return StorageWriteSink(self.write_client, self.bq_prefix, stream_type=self.stream_type,
+                                max_batch_bytes=self.max_batch_bytes, max_attempts=self.max_attempts,
+                                backoff_seconds=self.backoff_seconds)
+
+    def merge_shards(self, tables: dict, count: int, cleanup: bool = False, file_dates: Optional[tuple] = None,
+                     filters: Optional[dict] = None):
+        pass
+
+    def describe(self) -> str:
+        return f'{self.write_client.describe()} @ {self.bq_prefix} ({self.stream_type} streams)'
+
+
+# The records of one segment, as parse_report and FFFParseService return them, as an Arrow table of the segment's
+# schema, ready for StorageWriteSink.write; pd.NA and NaN become nulls
+def records_table(records: list, spec):
+    import pandas as pd
+    import pyarrow as pa
+    arrays, fields = [], []
+    for field in spec.schema:
+        arrow = arrow_field(field)
+        values = [record.get(field.name) for record in records]
+        values = [None if value is pd.NA or (isinstance(value, float) and value != value) else value for value in values]
+        arrays.append(pa.array(values, type=arrow.type))
+        fields.append(arrow)
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+# Transport over google-cloud-bigquery-storage (an optional dependency, imported when first used): one AppendRowsStream connection per write
+# stream, the Arrow schema sent with the first request. The missing tables are created with the registry layout
+# through the BigQuery client.
+class StorageWriteClient:
+    def __init__(self, client, write_client=None):
+        try:
+            from google.cloud import bigquery_storage_v1
+        except ImportError as e:
+            raise ImportError('StorageWriteClient needs google-cloud-bigquery-storage: pip install google-cloud-bigquery-storage') from e
+        self.client = client
+        self.write_client = write_client if write_client is not None else bigquery_storage_v1.BigQueryWriteClient()
+        self._connections = {}
+
+    def ensure_table(self, table_id: str, spec):
+        self.client.create_table(spec.definition(table_id), exists_ok=True)
+
+    def create_stream(self, table_id: str, pending: bool) -> str:
+        from google.cloud.bigquery_storage_v1 import types
+        project, dataset, table = table_id.split('.')
+        stream_type = types.WriteStream.Type.PENDING if pending else types.WriteStream.Type.COMMITTED
+        stream = self.write_client.create_write_stream(parent=self.write_client.table_path(project, dataset, table),
+                                                       write_stream=types.WriteStream(type_=stream_type))
+        return stream.name
+
+    # an append at an offset already written (a retry whose first try went through) is not written again
+    def append(self, name: str, batch, offset: int):
+        from google.api_core import exceptions
+        from google.cloud.bigquery_storage_v1 import types, writer
+        if name not in self._connections:
+            template = types.AppendRowsRequest(
+                write_stream=name,
+                arrow_rows=types.AppendRowsRequest.ArrowData(
+                    writer_schema=types.ArrowSchema(serialized_schema=batch.schema.serialize().to_pybytes())
+                )
+            )
+            self._connections[name] = writer.AppendRowsStream(self.write_client, template)
+        request = types.AppendRowsRequest(
+            offset=offset,
+            arrow_rows=types.AppendRowsRequest.ArrowData(
+                rows=types.ArrowRecordBatch(serialized_record_batch=batch.serialize().to_pybytes(), row_count=batch.num_rows)
+            )
+        )
+        try:
+            self._connections[name].send(request).result()
+        except exceptions.AlreadyExists:
+            pass
+        except Exception:
+            # the connection may be broken, the retry opens a new one
+            self._connections.pop(name).close()
+            raise
+
+    def finalize(self, name: str):
+        connection = self._connections.pop(name, None)
+        if connection is not None:
+            connection.close()
+        self.write_client.finalize_write_stream(name=name)
+
+    def commit(self, table_id: str, names: list):
+        from google.cloud.bigquery_storage_v1 import types
+        project, dataset, table = table_id.split('.')
+        response = self.write_client.batch_commit_write_streams(
+            types.BatchCommitWriteStreamsRequest(parent=self.write_client.table_path(project, dataset, table), write_streams=names)
+        )
+        if len(response.stream_errors) > 0:
+            raise RuntimeError(f'{table_id}: commit failed: {[error.error_message for error in response.stream_errors]}')
+
+    def describe(self) -> str:
+        return 'BigQuery Storage Write API'
+
+
+# Local stand-in for StorageWriteClient, in memory: committed streams are readable as soon as appended, pending ones
+# once committed, an append at an offset already written is ignored and one beyond the end of the stream raises, as the
+# API does. tables[table_id] reads a destination back as an Arrow table; created keeps the created tables' definitions.
+class LocalWriteClient:
+    def __init__(self):
+        self.created = {}
+        self._streams = {}
+        self._committed = {}
+        self._names = itertools.count()
+        self._lock = threading.Lock()
+
+    def ensure_table(self, table_id: str, spec):
+        with self._lock:
+            self.created.setdefault(table_id, spec.definition(table_id))
+
+    def create_stream(self, table_id: str, pending: bool) -> str:
+        with self._lock:
+            name = f'{table_id}/streams/{next(self._names)}'
+            self._streams[name] = {'table_id': table_id, 'pending': pending, 'batches': [], 'rows': 0, 'finalized': False}
+            if not pending:
+                self._committed.setdefault(table_id, []).append(name)
+            return name
+
+    def append(self, name: str, batch, offset: int):
+        with self._lock:
+            stream = self._streams[name]
+            if stream['finalized']:
+                raise ValueError(f'{name} is finalized')
+            if offset < stream['rows']:
+                return
+            if offset > stream['rows']:
+                raise ValueError(f'{name}: offset {offset} is beyond the end of the stream ({stream["rows"]} rows)')
+            stream['batches'].append(batch)
+            stream['rows'] += batch.num_rows
+
+    def finalize(self, name: str):
+        with self._lock:
+            self._streams[name]['finalized'] = True
+
+    def commit(self, table_id: str, names: list):
+        with self._lock:
+            for name in names:
+                if not self._streams[name]['finalized']:
+                    raise ValueError(f'{name} is not finalized')
+            self._committed.setdefault(table_id, []).extend(names)
+
+    @property
+    def tables(self) -> dict:
+        import pyarrow as pa
+        with self._lock:
+            return {table_id: pa.Table.from_batches([batch for name in names for batch in self._streams[name]['batches']])
+                    for table_id, names in self._committed.items()
+                    if any(len(self._streams[name]['batches']) > 0 for name in names)}
+
+    def describe(self) -> str:
+        return 'local Storage Write stand-in'
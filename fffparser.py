@@ -0,0 +1,294 @@
+import sys
+import time
+import argparse
+
+
+#####################################################################################################################################
+# Command line entry point:                                                                                                         #
+#     python -m fffparser run --begin 2024-01 --end 2024-03 --tables address trade_check --sink parquet --out-dir ./fff_out         #
+# Heavy modules (pandas, numpy, google.cloud.bigquery) are only imported once a run really starts: --help returns immediately and   #
+# --dry-run only loads the layouts, never the BigQuery client.                                                                      #
+#####################################################################################################################################
+
+
+def _parse_month(text: str) -> tuple:
+    try:
+        year, month = text.split('-')
+        year, month = int(year), int(month)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected YYYY-MM, got {text!r}')
+    if not 1 <= month <= 12:
+        raise argparse.ArgumentTypeError(f'month out of range in {text!r}')
+    return year, month
+
+
+def _month_range(begin: tuple, end: tuple) -> list:
+    months = []
+    year, month = begin
+    while (year, month) <= end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(prog='fffparser', description='Parse the Equifax hard pull (FFF) data into tables.')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='parse a range of months, one month at a time')
+    run.add_argument('--begin', type=_parse_month, required=True, help='first month, YYYY-MM')
+    run.add_argument('--end', type=_parse_month, default=None, help='last month, YYYY-MM (default: --begin)')
+    run.add_argument('--tables', nargs='+', default=None, help='segment tables to parse (default: all)')
+    run.add_argument('--no-header', action='store_true', help='do not push the header table')
+    run.add_argument('--nested', action='store_true', help='one row per report, segments as repeated records')
+    run.add_argument('--engine', choices=['pandas', 'arrow'], default='pandas',
+                     help='arrow: segment tables built and loaded as Arrow tables, without pandas')
+    run.add_argument('--no-rejected', action='store_true', help='only count the records rejected by the checks, do not push them')
+    run.add_argument('--sink', choices=['bigquery', 'parquet', 'storage-write'], default='bigquery',
+                     help='where the tables go (storage-write: streamed through the BigQuery Storage Write API)')
+    run.add_argument('--stream-type', choices=['committed', 'pending'], default='committed',
+                     help='storage-write streams: rows visible at once, or committed at the end of each month')
+    run.add_argument('--overwrite', action='store_true', help='replace the months in the bigquery tables instead of appending')
+    run.add_argument('--upload-dir', default=None, help='stage large bigquery loads there as resumable parquet chunks')
+    run.add_argument('--batch-rows', type=int, default=None, help='hold the tables back across months up to this many rows, one load per table')
+    run.add_argument('--batch-mb', type=int, default=None, help='hold the tables back across months up to this many MB, one load per table')
+    run.add_argument('--out-dir', default='fff_output', help='output directory of the parquet sink')
+    run.add_argument('--project', default=None, help='BigQuery project id')
+    run.add_argument('--dataset', default=None, help='BigQuery dataset id')
+    run.add_argument('--chunk-size', type=int, default=None, help='stream the data this many reports at a time')
+    run.add_argument('--streams', type=int, default=1, help='read each month as this many parallel hash shards')
+    run.add_argument('--shard-index', type=int, default=None, help='run only this hash bucket of id (with --shard-count)')
+    run.add_argument('--shard-count', type=int, default=None, help='number of id hash buckets the run is split into')
+    run.add_argument('--manifest-dir', default=None, help='where shard manifests go (default: --out-dir of parquet)')
+    run.add_argument('--prefetch-depth', type=int, default=1, help='months downloaded ahead of the one parsing')
+    run.add_argument('--cache-dir', default=None, help='directory of the on-disk parse cache')
+    run.add_argument('--raw-cache-dir', default=None, help='directory of the on-disk cache of fetched months')
+    run.add_argument('--debug', action='store_true', help='debug mode: small fetch, nothing pushed')
+    run.add_argument('--dry-run', action='store_true', help='print the plan and the fetch queries, then exit')
+
+    queue = commands.add_parser('queue', help='durable month x segment job queue (SQLite) for several workers')
+    queue.add_argument('action', choices=['init', 'work', 'status', 'reset'])
+    queue.add_argument('--db', default='fff_jobs.sqlite', help='path of the job queue database')
+    queue.add_argument('--begin', type=_parse_month, default=None, help='first month to enqueue, YYYY-MM (init)')
+    queue.add_argument('--end', type=_parse_month, default=None, help='last month to enqueue, YYYY-MM (init)')
+    queue.add_argument('--tables', nargs='+', default=None, help='segment tables (default: all)')
+    queue.add_argument('--no-header', action='store_true', help='do not enqueue/push the header table')
+    queue.add_argument('--sink', choices=['bigquery', 'parquet'], default='bigquery', help='where the tables go (work)')
+    queue.add_argument('--overwrite', action='store_true', help='replace the months in the bigquery tables instead of appending')
+    queue.add_argument('--out-dir', default='fff_output', help='output directory of the parquet sink')
+    queue.add_argument('--project', default=None, help='BigQuery project id')
+    queue.add_argument('--dataset', default=None, help='BigQuery dataset id')
+    queue.add_argument('--cache-dir', default=None, help='directory of the on-disk parse cache')
+    queue.add_argument('--raw-cache-dir', default=None, help='directory of the on-disk cache of fetched months')
+    queue.add_argument('--max-tasks', type=int, default=None, help='stop the worker after this many tasks')
+    queue.add_argument('--debug', action='store_true', help='debug mode: small fetch, nothing pushed')
+
+    merge = commands.add_parser('merge', help='check that every shard of the months finished and merge their outputs')
+    merge.add_argument('--begin', type=_parse_month, required=True, help='first month, YYYY-MM')
+    merge.add_argument('--end', type=_parse_month, default=None, help='last month, YYYY-MM (default: --begin)')
+    merge.add_argument('--shard-count', type=int, required=True, help='number of shards the months were run with')
+    merge.add_argument('--sink', choices=['bigquery', 'parquet'], default='bigquery', help='where the shards were written')
+    merge.add_argument('--out-dir', default='fff_output', help='output directory of the parquet sink')
+    merge.add_argument('--project', default=None, help='BigQuery project id')
+    merge.add_argument('--dataset', default=None, help='BigQuery dataset id')
+    merge.add_argument('--manifest-dir', default=None, help='where the shard manifests are (default: --out-dir)')
+    merge.add_argument('--cleanup', action='store_true', help='delete the shard outputs once merged')
+    merge.add_argument('--overwrite', action='store_true', help='replace the months in the bigquery tables instead of appending')
+
+    cache = commands.add_parser('cache', help='list, invalidate or look up the cached fetched months (--raw-cache-dir)')
+    cache.add_argument('action', choices=['list', 'invalidate', 'clear', 'lookup'])
+    cache.add_argument('--raw-cache-dir', required=True, help='directory of the on-disk cache of fetched months')
+    cache.add_argument('--begin', type=_parse_month, default=None, help='first month to invalidate, YYYY-MM')
+    cache.add_argument('--end', type=_parse_month, default=None, help='last month to invalidate, YYYY-MM (default: --begin)')
+    cache.add_argument('--business-partner-id', default=None, help='consumer to look up')
+    cache.add_argument('--id', default=None, help='report id to look up')
+    cache.add_argument('--from', dest='from_date', default=None, help='first file_date to look up, YYYY-MM-DD')
+    cache.add_argument('--to', dest='to_date', default=None, help='last file_date to look up, YYYY-MM-DD')
+    cache.add_argument('--tables', nargs='+', default=None, help='segment tables to parse in the looked up reports (default: all)')
+    return arg_parser
+
+
+def run(args: argparse.Namespace) -> int:
+    end = args.end if args.end is not None else args.begin
+    months = _month_range(args.begin, end)
+    if len(months) == 0:
+        print(f'--end {end} is before --begin {args.begin}', file=sys.stderr)
+        return 2
+    if args.overwrite and args.sink == 'storage-write':
+        print('--overwrite does not apply to --sink storage-write: streamed rows are only ever appended', file=sys.stderr)
+        return 2
+
+    from fff_layouts import SEGMENT_LAYOUTS
+    tables = args.tables if args.tables is not None else list(SEGMENT_LAYOUTS.keys())
+    unknown = [seg for seg in tables if seg not in SEGMENT_LAYOUTS]
+    if len(unknown) > 0:
+        print(f'unknown tables: {", ".join(unknown)} (choose from {", ".join(SEGMENT_LAYOUTS.keys())})', file=sys.stderr)
+        return 2
+
+    if args.dry_run:
+        from fff_query import FFF_NAME, build_fetch_query
+        print(f'months: {", ".join(f"{y}-{m:02d}" for y, m in months)}')
+        if args.nested:
+            print(f'tables: fff_reports (header + {", ".join(tables)} nested)')
+        else:
+            print(f'tables: {", ".join(tables)}' + ('' if args.no_header else ', header'))
+        print(f'sink:   {args.sink}' + (f' ({args.out_dir})' if args.sink == 'parquet' else f' ({args.project}.{args.dataset})'))
+        shards = None if args.shard_index is None else [('id', args.shard_index, args.shard_count)]
+        for year, month in months:
+            print(build_fetch_query(FFF_NAME, year, month, debug_mode=args.debug, shards=shards))
+        return 0
+
+    from parser_with_filters import backfill
+    parser_kwargs = {
+        'which_tables': tables,
+        'push_header': not args.no_header,
+        'debug_mode': args.debug,
+        'project_id': args.project,
+        'dataset_id': args.dataset,
+        'cache_dir': args.cache_dir,
+        'raw_cache_dir': args.raw_cache_dir,
+        'chunk_size': args.chunk_size,
+        'nested_output': args.nested,
+        'push_rejected': not args.no_rejected,
+        'engine': args.engine,
+        'fetch_streams': args.streams,
+        'shard_index': args.shard_index,
+        'shard_count': args.shard_count,
+        'manifest_dir': args.manifest_dir,
+        'write_mode': 'overwrite' if args.overwrite else 'append',
+        'upload_dir': args.upload_dir,
+    }
+    if args.sink == 'parquet':
+        from fff_sinks import ParquetSink
+        parser_kwargs['sink'] = ParquetSink(args.out_dir)
+    elif args.sink == 'storage-write':
+        from fff_schemas import get_client
+        from fff_streaming import StorageWriteClient, StorageWriteSink
+        parser_kwargs['sink'] = StorageWriteSink(StorageWriteClient(get_client(args.project)), f'{args.project}.{args.dataset}',
+                                                 stream_type=args.stream_type)
+    if args.batch_rows is not None or args.batch_mb is not None:
+        from fff_schemas import get_client
+        from fff_sinks import BatchingSink, BigQuerySink
+        sink = parser_kwargs.pop('sink', None)
+        if sink is None:
+            sink = BigQuerySink(get_client(args.project), f'{args.project}.{args.dataset}', write_mode=parser_kwargs['write_mode'],
+                                upload_dir=parser_kwargs['upload_dir'])
+        batch = {}
+        if args.batch_rows is not None:
+            batch['max_rows'] = args.batch_rows
+        if args.batch_mb is not None:
+            batch['max_bytes'] = args.batch_mb * 1024 ** 2
+        parser_kwargs['sink'] = BatchingSink(sink, **batch)
+    backfill(months, prefetch_depth=args.prefetch_depth, **parser_kwargs)
+    return 0
+
+
+def merge(args: argparse.Namespace) -> int:
+    end = args.end if args.end is not None else args.begin
+    from fff_shards import merge_shards, run_key
+    if args.sink == 'parquet':
+        from fff_sinks import ParquetSink
+        sink = ParquetSink(args.out_dir)
+        manifest_dir = args.manifest_dir if args.manifest_dir is not None else args.out_dir
+    else:
+        if args.manifest_dir is None:
+            print('--manifest-dir is required with the bigquery sink', file=sys.stderr)
+            return 2
+        from fff_schemas import get_client
+        from fff_sinks import BigQuerySink
+        sink = BigQuerySink(get_client(args.project), f'{args.project}.{args.dataset}',
+                            write_mode='overwrite' if args.overwrite else 'append')
+        manifest_dir = args.manifest_dir
+    for year, month in _month_range(args.begin, end):
+        merge_shards(sink, manifest_dir, run_key(year, month), args.shard_count, cleanup=args.cleanup)
+    return 0
+
+
+def queue(args: argparse.Namespace) -> int:
+    from fff_jobs import JobQueue, run_worker
+    if args.action == 'init':
+        if args.begin is None:
+            print('--begin is required to enqueue months', file=sys.stderr)
+            return 2
+        from fff_layouts import SEGMENT_LAYOUTS
+        tables = args.tables if args.tables is not None else list(SEGMENT_LAYOUTS.keys())
+        months = _month_range(args.begin, args.end if args.end is not None else args.begin)
+        n_new = JobQueue(args.db).enqueue(months, tables, push_header=not args.no_header)
+        print(f'{n_new} tasks enqueued in {args.db}')
+    elif args.action == 'work':
+        parser_kwargs = {
+            'which_tables': args.tables,
+            'push_header': not args.no_header,
+            'debug_mode': args.debug,
+            'project_id': args.project,
+            'dataset_id': args.dataset,
+            'cache_dir': args.cache_dir,
+            'raw_cache_dir': args.raw_cache_dir,
+            'write_mode': 'overwrite' if args.overwrite else 'append',
+        }
+        if args.sink == 'parquet':
+            from fff_sinks import ParquetSink
+            parser_kwargs['sink'] = ParquetSink(args.out_dir)
+        n_done = run_worker(args.db, max_tasks=args.max_tasks, **parser_kwargs)
+        print(f'{n_done} tasks processed')
+    elif args.action == 'reset':
+        print(f'{JobQueue(args.db).reset()} running tasks put back to pending')
+    else:
+        jobs = JobQueue(args.db)
+        print(jobs.status())
+        for task in jobs.throughput():
+            print(f'{task["month"]} {task["segment"]:<24} {task["seconds"]:8.2f}s {task["n_rows"]:>9} rows '
+                  f'{task["rows_per_s"]:>10.0f} rows/s {task["reports_per_s"]:>10.0f} reports/s  ({task["worker"]})')
+        for month, seg, attempts, error in jobs.failures():
+            print(f'{month} {seg} failed after {attempts} attempts: {error}')
+    return 0
+
+
+def cache(args: argparse.Namespace) -> int:
+    from fff_cache import RawCache
+    raw_cache = RawCache(args.raw_cache_dir)
+    if args.action == 'invalidate':
+        if args.begin is None:
+            print('--begin is required to invalidate months', file=sys.stderr)
+            return 2
+        end = args.end if args.end is not None else args.begin
+        n_dropped = raw_cache.invalidate(args.begin[0] * 100 + args.begin[1], end[0] * 100 + end[1])
+        print(f'{n_dropped} cached fetches dropped')
+    elif args.action == 'clear':
+        print(f'{raw_cache.clear()} cached fetches dropped')
+    elif args.action == 'lookup':
+        if args.business_partner_id is None and args.id is None:
+            print('--business-partner-id or --id is required to look up', file=sys.stderr)
+            return 2
+        import json
+        from fff_lookup import lookup
+        reports = lookup(raw_cache, business_partner_id=args.business_partner_id, id=args.id, start=args.from_date,
+                         end=args.to_date, which_tables=args.tables)
+        for report in reports:
+            print(json.dumps(report, default=str))
+        print(f'{len(reports)} reports found', file=sys.stderr)
+    else:
+        for entry in raw_cache.entries():
+            months = str(entry['begin_month']) if entry['begin_month'] == entry['end_month'] else f'{entry["begin_month"]}-{entry["end_month"]}'
+            print(f'{months:<13} {entry["key"]} {entry["n_rows"]:>9} rows {entry["nbytes"] / 1024 ** 2:>10.1f} MB  '
+                  f'last used {time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"]))}')
+        print(f'total {raw_cache.total_bytes() / 1024 ** 2:.1f} MB of {raw_cache.max_bytes / 1024 ** 2:.0f} MB')
+    raw_cache.close()
+    return 0
+
+
+def main(argv: list = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    if args.command == 'run':
+        return run(args)
+    if args.command == 'merge':
+        return merge(args)
+    if args.command == 'queue':
+        return queue(args)
+    if args.command == 'cache':
+        return cache(args)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,7 +3,6 @@ import time
 import warnings
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from google.cloud import bigquery
 from typing import Optional, Tuple # , Literal  # py3.7, no Literal in typing but in typing extension
 # from google.auth.exceptions import RefreshError 
@@ -215,7 +214,22 @@ class FFFParser:
             output.append(idx)
             output.append(len(idx))
         return output
-     
+
+    def _attach_match_flags(self, table: pd.DataFrame, seg: str, idx_cols: list):
+        # number of records of each report, straight from the segment index lists
+        self.data[f'{seg}_nrecords'] = sum(self.data[col].apply(len) for col in idx_cols)
+        if len(table) == 0:
+            return
+        # match_flag = segment code + bus_ptnr + file date (YYYYMMDD) + the row number in the table (zero-padded to 10),
+        # built column-wise once the extraction is done instead of record by record
+        dt_str = table.file_date.astype(str)
+        row_no = pd.Series(table.index, index=table.index).astype(str).str.zfill(10)
+        table['match_flag'] = (table.segment_code + table.bus_ptnr.astype(str) +
+                               dt_str.str[:4] + dt_str.str[5:7] + dt_str.str[8:] + row_no)
+        # the per-report flag list ('flag1, flag2, ...') comes from one groupby instead of a .loc write per report
+        flags = table.groupby('bus_ptnr', sort=False)['match_flag'].agg(', '.join)
+        self.data[f'{seg}_flag'] = self.data['id'].map(flags).fillna(self.data[f'{seg}_flag'])
+
     # parsing header    
     def _parse_header(self):
         self.data['mfile'] = self.data['file_raw_content'].apply(lambda x: x[x.index('FULL'):])
@@ -236,15 +250,11 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             ca_index, ca_records, fa_index, fa_records, f2_index, f2_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_CA', 'idx_FA', 'idx_F2'])
-            self.data.loc[ncol, 'address_nrecords'] = ca_records + fa_records + f2_records
             if ca_records + fa_records + f2_records > 0:
-                flag = ''
                 if ca_records != 0:
                     count_ca = 1
                     for i in ca_index:
                         segment = mfile[i:]
-                        fg = f'CA{bp}{dt_str}{str(count).zfill(10)}'
-                        self.addr.loc[count, 'match_flag'] = fg
                         self.addr.loc[count, 'bus_ptnr'] = bp
                         self.addr.loc[count, 'file_date'] = dt
                         self.addr.loc[count, 'street_number'] = segment[3:13]
@@ -259,13 +269,10 @@ class FFFParser:
                         self.addr.loc[count, 'order_in_segment'] = count_ca
                         count += 1
                         count_ca += 1
-                        flag += f'{fg}, '
                 if fa_records != 0:
                     count_fa = 1
                     for i in fa_index:
                         segment = mfile[i:]
-                        fg = f'FA{bp}{dt_str}{str(count).zfill(10)}'
-                        self.addr.loc[count, 'match_flag'] = fg
                         self.addr.loc[count, 'bus_ptnr'] = bp
                         self.addr.loc[count, 'file_date'] = dt
                         self.addr.loc[count, 'street_number'] = segment[3:13]
@@ -280,13 +287,10 @@ class FFFParser:
                         self.addr.loc[count, 'order_in_segment'] = count_fa
                         count += 1
                         count_fa += 1
-                        flag += f'{fg}, '
                 if f2_records != 0:
                     count_f2 = 1
                     for i in f2_index:
                         segment = mfile[i:]
-                        fg = f'F2{bp}{dt_str}{str(count).zfill(10)}'
-                        self.addr.loc[count, 'match_flag'] = fg
                         self.addr.loc[count, 'bus_ptnr'] = bp
                         self.addr.loc[count, 'file_date'] = dt
                         self.addr.loc[count, 'street_number'] = segment[3:13]
@@ -301,8 +305,7 @@ class FFFParser:
                         self.addr.loc[count, 'order_in_segment'] = count_f2
                         count += 1
                         count_f2 += 1
-                        flag += f'{fg}, '
-                self.data.loc[ncol, 'address_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.addr, seg='address', idx_cols=['idx_CA', 'idx_FA', 'idx_F2'])
         self.column_taboo += ['idx_CA', 'idx_FA', 'idx_F2']
         self.addr['check1'] = self.addr.city.apply(lambda x: x.rstrip()).apply(lambda x: x.lstrip()).apply(len)
         self.addr['check2'] = self.addr.province.apply(lambda x: x.rstrip()).apply(lambda x: x.lstrip()).apply(len)
@@ -323,15 +326,11 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             ak_index, ak_records, fn_index, fn_records= self._parse_seg_index(ncol=ncol, seg_list = ['idx_AK', 'idx_FN'])
-            self.data.loc[ncol, 'name_nrecords'] = ak_records + fn_records
             if ak_records + fn_records > 0:
-                flag = ''
                 if ak_records != 0:
                     count_ak = 1
                     for i in ak_index:
                         segment = mfile[i:]
-                        fg = f'AK{bp}{dt_str}{str(count).zfill(10)}'
-                        self.names.loc[count, 'match_flag'] = fg
                         self.names.loc[count, 'bus_ptnr'] = bp
                         self.names.loc[count, 'file_date'] = dt
                         self.names.loc[count, 'last_name'] = segment[3:28]
@@ -345,13 +344,10 @@ class FFFParser:
                         self.names.loc[count, 'order_in_segment'] = count_ak
                         count += 1
                         count_ak += 1
-                        flag += f'{fg}, '
                 if fn_records != 0:
                     count_fn = 1
                     for i in fn_index:
                         segment = mfile[i:]
-                        fg = f'FN{bp}{dt_str}{str(count).zfill(10)}'
-                        self.names.loc[count, 'match_flag'] = fg
                         self.names.loc[count, 'bus_ptnr'] = bp
                         self.names.loc[count, 'file_date'] = dt
                         self.names.loc[count, 'last_name'] = segment[3:28]
@@ -365,8 +361,7 @@ class FFFParser:
                         self.names.loc[count, 'order_in_segment'] = count_fn
                         count += 1
                         count_fn += 1
-                        flag += f'{fg}, '
-                self.data.loc[ncol, 'name_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.names, seg='name', idx_cols=['idx_AK', 'idx_FN'])
         self.column_taboo += ['idx_AK', 'idx_FN']
         self._push_seg_table(table=self.names, table_len=count, seg_name='name')      
              
@@ -380,14 +375,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             dt_index, dt_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_DT'])
-            self.data.loc[ncol, 'death_nrecords'] = dt_records
             if dt_records != 0:
                 count_dt = 1
-                flag = ''
                 for i in dt_index:
                     segment = mfile[i:]
-                    fg = f'DT{bp}{dt_str}{str(count).zfill(10)}'
-                    self.death.loc[count, 'match_flag'] = fg
                     self.death.loc[count, 'bus_ptnr'] = bp
                     self.death.loc[count, 'file_date'] = dt
                     self.death.loc[count, 'subject_death_date'] = segment[3:10]
@@ -396,8 +387,7 @@ class FFFParser:
                     self.death.loc[count, 'order_in_segment'] = count_dt
                     count += 1
                     count_dt += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'death_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.death, seg='death', idx_cols=['idx_DT'])
         self.column_taboo.append('idx_DT')
         self.death['check1'] = self.death.subject_death_date.apply(lambda x: x[:2].isdigit() and x[3:].isdigit())
         self.death = self.death.loc[self.death.check1]
@@ -418,15 +408,11 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             es_index, es_records, ef_index, ef_records, e2_index, e2_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_ES', 'idx_EF', 'idx_E2'])
-            self.data.loc[ncol, 'employment_nrecords'] = es_records + ef_records + e2_records
             if es_records + ef_records + e2_records > 0:
-                flag = ''
                 if es_records != 0:
                     count_es = 1
                     for i in es_index:
                         segment = mfile[i:]
-                        fg = f'ES{bp}{dt_str}{str(count).zfill(10)}'
-                        self.empl.loc[count, 'match_flag'] = fg
                         self.empl.loc[count, 'bus_ptnr'] = bp
                         self.empl.loc[count, 'file_date'] = dt
                         self.empl.loc[count, 'occupation'] = segment[3:37]
@@ -443,13 +429,10 @@ class FFFParser:
                         self.empl.loc[count, 'order_in_segment'] = count_es
                         count += 1
                         count_es += 1
-                        flag += f'{fg}, '
                 if ef_records != 0:
                     count_ef = 1
                     for i in ef_index:
                         segment = mfile[i:]
-                        fg = f'EF{bp}{dt_str}{str(count).zfill(10)}'
-                        self.empl.loc[count, 'match_flag'] = fg
                         self.empl.loc[count, 'bus_ptnr'] = bp
                         self.empl.loc[count, 'file_date'] = dt
                         self.empl.loc[count, 'occupation'] = segment[3:37]
@@ -466,13 +449,10 @@ class FFFParser:
                         self.empl.loc[count, 'order_in_segment'] = count_ef
                         count += 1
                         count_ef += 1
-                        flag += f'{fg}, '
                 if e2_records != 0:
                     count_e2 = 1
                     for i in e2_index:
                         segment = mfile[i:]
-                        fg = f'E2{bp}{dt_str}{str(count).zfill(10)}'
-                        self.empl.loc[count, 'match_flag'] = fg
                         self.empl.loc[count, 'bus_ptnr'] = bp
                         self.empl.loc[count, 'file_date'] = dt
                         self.empl.loc[count, 'occupation'] = segment[3:37]
@@ -489,8 +469,7 @@ class FFFParser:
                         self.empl.loc[count, 'order_in_segment'] = count_e2
                         count += 1
                         count_e2 += 1
-                        flag += f'{fg}, '
-                self.data.loc[ncol, 'employment_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.empl, seg='employment', idx_cols=['idx_ES', 'idx_EF', 'idx_E2'])
         self.column_taboo += ['idx_ES', 'idx_EF', 'idx_E2']
         self.empl['check1'] = self.empl.date_employed.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else True)
         self.empl['check2'] = self.empl.date_verified.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else True)
@@ -513,14 +492,10 @@ class FFFParser:
         for ncol in self.data.index:            
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             oi_index, oi_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_OI'])
-            self.data.loc[ncol, 'other_income_nrecords'] = oi_records
             if oi_records != 0:
-                flag = ''
                 count_oi = 1
                 for i in oi_index:
                     segment = mfile[i:]
-                    fg = f'OI{bp}{dt_str}{str(count).zfill(10)}'
-                    self.oinc.loc[count, 'match_flag'] = fg
                     self.oinc.loc[count, 'bus_ptnr'] = bp
                     self.oinc.loc[count, 'file_date'] = dt
                     self.oinc.loc[count, 'date_reported'] = segment[3:10]
@@ -533,8 +508,7 @@ class FFFParser:
                     self.oinc.loc[count, 'order_in_segment'] = count_oi
                     count += 1
                     count_oi += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'other_income_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.oinc, seg='other_income', idx_cols=['idx_OI'])
         self.column_taboo.append('idx_OI')
         self.oinc['check1'] = self.oinc.date_reported.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
         self.oinc['check2'] = self.oinc.date_verified.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
@@ -554,14 +528,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             bp_index, bp_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_BP'])
-            self.data.loc[ncol, 'bankruptcy_nrecords'] = bp_records
             if bp_records != 0:
-                flag = ''
                 count_bp = 1
                 for i in bp_index:
                     segment = mfile[i:]
-                    fg = f'BP{bp}{dt_str}{str(count).zfill(10)}'
-                    self.bkpt.loc[count, 'match_flag'] = fg
                     self.bkpt.loc[count, 'bus_ptnr'] = bp
                     self.bkpt.loc[count, 'file_date'] = dt
                     self.bkpt.loc[count, 'foreign_bureau_code'] = segment[3:4]
@@ -582,8 +552,7 @@ class FFFParser:
                     self.bkpt.loc[count, 'order_in_segment'] = count_bp
                     count += 1
                     count_bp += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'bankruptcy_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.bkpt, seg='bankruptcy', idx_cols=['idx_BP'])
         self.column_taboo.append('idx_BP')
         self.bkpt['check1'] = self.bkpt.how_filed.apply(lambda x: x in ['S', 'J', ' '])
         self.bkpt['check2'] = self.bkpt.type_bankruptcy.apply(lambda x: x in ['B', 'I', ' '])
@@ -604,14 +573,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             co_index, co_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_CO'])
-            self.data.loc[ncol, 'collection_nrecords'] = co_records
             if co_records != 0:
-                flag = ''
                 count_co = 1
                 for i in co_index:
                     segment = mfile[i:]
-                    fg = f'CO{bp}{dt_str}{str(count).zfill(10)}'
-                    self.colt.loc[count, 'match_flag'] = fg
                     self.colt.loc[count, 'bus_ptnr'] = bp
                     self.colt.loc[count, 'file_date'] = dt
                     self.colt.loc[count, 'foreign_bureau_code'] = segment[3:4]
@@ -634,8 +599,7 @@ class FFFParser:
                     self.colt.loc[count, 'order_in_segment'] = count_co
                     count += 1
                     count_co += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'collection_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.colt, seg='collection', idx_cols=['idx_CO'])
         self.column_taboo.append('idx_CO')
         self.colt['check1'] = self.colt.type.apply(lambda x: x in ['P', 'U', ' '])
         self.colt['check2'] = self.colt.date_reported.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else True)
@@ -658,14 +622,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             fm_index, fm_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_FM'])
-            self.data.loc[ncol, 'secured_loan_nrecords'] = fm_records
             if fm_records != 0:
-                flag = ''
                 count_fm = 1
                 for i in fm_index:
                     segment = mfile[i:]
-                    fg = f'FM{bp}{dt_str}{str(count).zfill(10)}'
-                    self.selo.loc[count, 'match_flag'] = fg
                     self.selo.loc[count, 'bus_ptnr'] = bp
                     self.selo.loc[count, 'file_date'] = dt
                     self.selo.loc[count, 'foreign_bureau_code'] = segment[3:4]
@@ -682,8 +642,7 @@ class FFFParser:
                     self.selo.loc[count, 'order_in_segment'] = count_fm
                     count += 1
                     count_fm += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'secured_loan_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.selo, seg='secured_loan', idx_cols=['idx_FM'])
         self.column_taboo.append('idx_FM')
         self.selo['check1'] = self.selo.industry_code.apply(lambda x: len(x.strip()) == 2)
         self.selo['check2'] = self.selo.date_filed.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else True)
@@ -705,14 +664,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             li_index, li_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_LI'])
-            self.data.loc[ncol, 'legal_item_nrecords'] = li_records
             if li_records != 0:
-                flag = ''
                 count_li = 1
                 for i in li_index:
                     segment = mfile[i:]
-                    fg = f'LI{bp}{dt_str}{str(count).zfill(10)}'
-                    self.leit.loc[count, 'match_flag'] = fg
                     self.leit.loc[count, 'bus_ptnr'] = bp
                     self.leit.loc[count, 'file_date'] = dt
                     self.leit.loc[count, 'foreign_bureau_code'] = segment[3:4]
@@ -736,8 +691,7 @@ class FFFParser:
                     self.leit.loc[count, 'order_in_segment'] = count_li
                     count += 1
                     count_li += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'legal_item_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.leit, seg='legal_item', idx_cols=['idx_LI'])
         self.column_taboo.append('idx_LI')
         self.leit['check1'] = self.leit.type_code.apply(lambda x: x in ['A', 'J', 'F'])
         self.leit['check2'] = self.leit.status_code.apply(lambda x: x in ['D', 'S', 'T'])
@@ -758,14 +712,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             fo_index, fo_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_FO'])
-            self.data.loc[ncol, 'foreclosure_nrecords'] = fo_records
             if fo_records != 0:
-                flag = ''
                 count_fo = 1
                 for i in fo_index:
                     segment = mfile[i:]
-                    fg = f'FO{bp}{dt_str}{str(count).zfill(10)}'
-                    self.focl.loc[count, 'match_flag'] = fg
                     self.focl.loc[count, 'bus_ptnr'] = bp
                     self.focl.loc[count, 'file_date'] = dt
                     self.focl.loc[count, 'foreign_bureau_code'] = segment[3:4]
@@ -779,8 +729,7 @@ class FFFParser:
                     self.focl.loc[count, 'order_in_segment'] = count_fo
                     count += 1
                     count_fo += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'foreclosure_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.focl, seg='foreclosure', idx_cols=['idx_FO'])
         self.column_taboo.append('idx_FO')
         self.focl['check1'] = self.focl.date_reported.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
         self.focl['check2'] = self.focl.date_checked.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
@@ -799,14 +748,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             nr_index, nr_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_NR'])
-            self.data.loc[ncol, 'non_responsibility_records'] = nr_records
             if nr_records != 0:
-                flag = ''
                 count_nr = 1
                 for i in nr_index:
                     segment = mfile[i:]
-                    fg = f'NR{bp}{dt_str}{str(count).zfill(10)}'
-                    self.nres.loc[count, 'match_flag'] = fg
                     self.nres.loc[count, 'bus_ptnr'] = bp
                     self.nres.loc[count, 'file_date'] = dt
                     self.nres.loc[count, 'foreign_bureau_code'] = segment[3:4]
@@ -819,8 +764,9 @@ class FFFParser:
                     self.nres.loc[count, 'order_in_segment'] = count_nr
                     count += 1
                     count_nr += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'non_responsibility_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.nres, seg='non_responsibility', idx_cols=['idx_NR'])
+        # the header table has always carried this count as non_responsibility_records (a float, as the per-report writes made it)
+        self.data['non_responsibility_records'] = self.data['non_responsibility_nrecords'].astype(float)
         self.column_taboo.append('idx_NR')
         self.nres['check1'] = self.nres.date_reported.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
         self.nres['check2'] = self.nres.person_filling.apply(lambda x: x in ['S', 'W', 'B'])
@@ -840,14 +786,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             mi_index, mi_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_MI'])
-            self.data.loc[ncol, 'marital_item_records'] = mi_records
             if mi_records != 0:
-                flag = ''
                 count_mi = 1
                 for i in mi_index:
                     segment = mfile[i:]
-                    fg = f'MI{bp}{dt_str}{str(count).zfill(10)}'
-                    self.mari.loc[count, 'match_flag'] = fg
                     self.mari.loc[count, 'bus_ptnr'] = bp
                     self.mari.loc[count, 'file_date'] = dt
                     self.mari.loc[count, 'foreign_bureau_code'] = segment[3:4]
@@ -866,8 +808,9 @@ class FFFParser:
                     self.mari.loc[count, 'order_in_segment'] = count_mi
                     count += 1
                     count_mi += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'marital_item_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.mari, seg='marital_item', idx_cols=['idx_MI'])
+        # the header table has always carried this count as marital_item_records (a float, as the per-report writes made it)
+        self.data['marital_item_records'] = self.data['marital_item_nrecords'].astype(float)
         self.column_taboo.append('idx_MI')
         self.mari['check1'] = self.mari.date_reported.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
         self.mari['check2'] = self.mari.date_verified.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
@@ -887,14 +830,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             tl_index, tl_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_TL'])
-            self.data.loc[ncol, 'tax_lien_nrecords'] = tl_records
             if tl_records != 0:
-                flag = ''
                 count_tl = 1
                 for i in tl_index:
                     segment = mfile[i:]
-                    fg = f'TL{bp}{dt_str}{str(count).zfill(10)}'
-                    self.tali.loc[count, 'match_flag'] = fg
                     self.tali.loc[count, 'bus_ptnr'] = bp
                     self.tali.loc[count, 'file_date'] = dt
                     self.tali.loc[count, 'foreign_bureau_code'] = segment[3:4]
@@ -913,8 +852,7 @@ class FFFParser:
                     self.tali.loc[count, 'order_in_segment'] = count_tl
                     count += 1
                     count_tl += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'tax_lien_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.tali, seg='tax_lien', idx_cols=['idx_TL'])
         self.column_taboo.append('idx_TL')
         self.tali['check1'] = self.tali.date_filed.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
         self.tali['check2'] = self.tali.date_verified.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
@@ -935,14 +873,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             fc_index, fc_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_FC'])
-            self.data.loc[ncol, 'financial_counselor_nrecords'] = fc_records
             if fc_records != 0:
-                flag = ''
                 count_fc = 1
                 for i in fc_index:
                     segment = mfile[i:]
-                    fg = f'FC{bp}{dt_str}{str(count).zfill(10)}'
-                    self.ficl.loc[count, 'match_flag'] = fg
                     self.ficl.loc[count, 'bus_ptnr'] = bp
                     self.ficl.loc[count, 'file_date'] = dt
                     self.ficl.loc[count, 'foreign_bureau_code'] = segment[3:4]
@@ -959,8 +893,7 @@ class FFFParser:
                     self.ficl.loc[count, 'order_in_segment'] = count_fc
                     count += 1
                     count_fc += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'financial_counselor_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.ficl, seg='financial_counselor', idx_cols=['idx_FC'])
         self.column_taboo.append('idx_FC')
         self.ficl['check1'] = self.ficl.date_reported.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
         self.ficl['check2'] = self.ficl.date_checked.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
@@ -983,14 +916,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             gn_index, gn_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_GN'])
-            self.data.loc[ncol, 'garnishment_nrecords'] = gn_records
             if gn_records != 0:
-                flag = ''
                 count_gn = 1
                 for i in gn_index:
                     segment = mfile[i:]
-                    fg = f'GN{bp}{dt_str}{str(count).zfill(10)}'
-                    self.garn.loc[count, 'match_flag'] = fg
                     self.garn.loc[count, 'bus_ptnr'] = bp
                     self.garn.loc[count, 'file_date'] = dt
                     self.garn.loc[count, 'foreign_bureau_code'] = segment[3:4]
@@ -1012,8 +941,7 @@ class FFFParser:
                     self.garn.loc[count, 'order_in_segment'] = count_gn
                     count += 1
                     count_gn += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'garnishment_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.garn, seg='garnishment', idx_cols=['idx_GN'])
         self.column_taboo.append('idx_GN')
         self.garn['check1'] = self.garn.date_reported.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else True)
         self.garn['check2'] = self.garn.date_checked.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else True)
@@ -1036,14 +964,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             tc_index, tc_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_TC'])
-            self.data.loc[ncol, 'trade_check_nrecords'] = tc_records
             if tc_records != 0:
-                flag = ''
                 count_tc = 1
                 for i in tc_index:
                     segment = mfile[i:]
-                    fg = f'TC{bp}{dt_str}{str(count).zfill(10)}'
-                    self.tdck.loc[count, 'match_flag'] = fg
                     self.tdck.loc[count, 'bus_ptnr'] = bp
                     self.tdck.loc[count, 'file_date'] = dt
                     self.tdck.loc[count, 'foreign_bureau_code'] = segment[3:4]
@@ -1081,8 +1005,7 @@ class FFFParser:
                     self.tdck.loc[count, 'order_in_segment'] = count_tc
                     count += 1
                     count_tc += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'trade_check_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.tdck, seg='trade_check', idx_cols=['idx_TC'])
         self.column_taboo.append('idx_TC')
         self.tdck['check1'] = self.tdck.autodata_indicator.apply(lambda x: x == '*')
         self.tdck['check2'] = self.tdck.account_designator_code.apply(lambda x: x in ['I', 'J', 'U'])
@@ -1102,14 +1025,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             nt_index, nt_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_NT'])
-            self.data.loc[ncol, 'nonmember_trade_check_nrecords'] = nt_records
             if nt_records != 0:
-                flag = ''
                 count_nt = 1
                 for i in nt_index:
                     segment = mfile[i:]
-                    fg = f'NT{bp}{dt_str}{str(count).zfill(10)}'
-                    self.ntdck.loc[count, 'match_flag'] = fg
                     self.ntdck.loc[count, 'bus_ptnr'] = bp
                     self.ntdck.loc[count, 'file_date'] = dt
                     self.ntdck.loc[count, 'date_reported'] = segment[3:10]
@@ -1128,8 +1047,7 @@ class FFFParser:
                     self.ntdck.loc[count, 'order_in_segment'] = count_nt
                     count += 1
                     count_nt += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'nonmember_trade_check_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.ntdck, seg='nonmember_trade_check', idx_cols=['idx_NT'])
         self.column_taboo.append('idx_NT')
         self.ntdck['check1'] = self.ntdck.date_reported.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
         self.ntdck['check2'] = self.ntdck.date_opened.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if x.strip() else False)
@@ -1149,14 +1067,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             cs_index, cs_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_CS'])
-            self.data.loc[ncol, 'chequing_saving_nrecords'] = cs_records
             if cs_records != 0:
-                flag = ''
                 count_cs = 1
                 for i in cs_index:
                     segment = mfile[i:]
-                    fg = f'CS{bp}{dt_str}{str(count).zfill(10)}'
-                    self.chsv.loc[count, 'match_flag'] = fg
                     self.chsv.loc[count, 'bus_ptnr'] = bp
                     self.chsv.loc[count, 'file_date'] = dt
                     self.chsv.loc[count, 'foreign_bureau_code'] = segment[5:12]
@@ -1178,8 +1092,7 @@ class FFFParser:
                     self.chsv.loc[count, 'order_in_segment'] = count_cs
                     count += 1
                     count_cs += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'chequing_saving_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.chsv, seg='chequing_saving', idx_cols=['idx_CS'])
         self.column_taboo.append('idx_CS')
         self.chsv['check1'] = self.chsv.telephone_area_code.apply(lambda x: x.strip().isdigit() or x.strip() == '')
         self.chsv['check2'] = self.chsv.member_number.apply(lambda x: ((x.strip()[:3].isdigit() and x.strip()[3:5].isalpha() and x.strip()[5:].isdigit()) or x.strip() == '') or x.strip() == '')
@@ -1201,15 +1114,11 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             fb_index, fb_records, fi_index, fi_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_FB', 'idx_FI'])
-            self.data.loc[ncol, 'foreign_bureau_nrecords'] = fb_records + fi_records
             if fb_records + fi_records > 0:
-                flag = ''
                 if fb_records != 0:
                     count_fb = 1
                     for i in fb_index:
                         segment = mfile[i:]
-                        fg = f'FB{bp}{dt_str}{str(count).zfill(10)}'
-                        self.frbr.loc[count, 'match_flag'] = fg
                         self.frbr.loc[count, 'bus_ptnr'] = bp
                         self.frbr.loc[count, 'file_date'] = dt
                         self.frbr.loc[count, 'date_reported_or_inquries'] = segment[3:10]
@@ -1221,13 +1130,10 @@ class FFFParser:
                         self.frbr.loc[count, 'order_in_segment'] = count_fb
                         count += 1
                         count_fb += 1
-                        flag += f'{fg}, '
                 if fi_records != 0:
                     count_fi = 1
                     for i in fi_index:
                         segment = mfile[i:]
-                        fg = f'FI{bp}{dt_str}{str(count).zfill(10)}'
-                        self.frbr.loc[count, 'match_flag'] = fg
                         self.frbr.loc[count, 'bus_ptnr'] = bp
                         self.frbr.loc[count, 'file_date'] = dt
                         self.frbr.loc[count, 'date_reported_or_inquries'] = segment[3:13]
@@ -1239,8 +1145,7 @@ class FFFParser:
                         self.frbr.loc[count, 'order_in_segment'] = count_fi
                         count += 1
                         count_fi += 1
-                        flag += f'{fg}, '
-                self.data.loc[ncol, 'foreign_bureau_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.frbr, seg='foreign_bureau', idx_cols=['idx_FB', 'idx_FI'])
         self.column_taboo += ['idx_FB', 'idx_FI']
         self.frbr['check1'] = self.frbr.date_reported_or_inquries.apply(lambda x: 
             (x[:2].isdigit() and x[3:].isdigit()) if len(x.strip()) == 7 else (x[:2].isdigit() and x[3:5].isdigit() and x[6:].isdigit())
@@ -1260,14 +1165,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             lo_index, lo_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_LO'])
-            self.data.loc[ncol, 'local_special_service_nrecords'] = lo_records
             if lo_records != 0:
-                flag = ''
                 count_lo = 1
                 for i in lo_index:
                     segment = mfile[i:]
-                    fg = f'LO{bp}{dt_str}{str(count).zfill(10)}'
-                    self.lssv.loc[count, 'match_flag'] = fg
                     self.lssv.loc[count, 'bus_ptnr'] = bp
                     self.lssv.loc[count, 'file_date'] = dt
                     self.lssv.loc[count, 'date_reported'] = segment[3:10]
@@ -1282,8 +1183,7 @@ class FFFParser:
                     self.lssv.loc[count, 'order_in_segment'] = count_lo
                     count += 1
                     count_lo += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'local_special_service_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.lssv, seg='local_special_service', idx_cols=['idx_LO'])
         self.column_taboo.append('idx_LO')
         self.lssv['check1'] = self.lssv.date_reported.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if len(x.strip()) == 7 else True)
         self.lssv['check2'] = self.lssv.member_number.apply(lambda x: (x.strip()[:3].isdigit() and x.strip()[3:5].isalpha() and x.strip()[5:].isdigit()) or x.strip() == '')
@@ -1302,14 +1202,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             iq_index, iq_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_IQ'])
-            self.data.loc[ncol, 'inquries_nrecords'] = iq_records
             if iq_records != 0:
-                flag = ''
                 count_iq = 1
                 for i in iq_index:
                     segment = mfile[i:]
-                    fg = f'IQ{bp}{dt_str}{str(count).zfill(10)}'
-                    self.inqr.loc[count, 'match_flag'] = fg
                     self.inqr.loc[count, 'bus_ptnr'] = bp
                     self.inqr.loc[count, 'file_date'] = dt
                     self.inqr.loc[count, 'date_inquiry'] = segment[3:13]
@@ -1323,8 +1219,7 @@ class FFFParser:
                     self.inqr.loc[count, 'order_in_segment'] = count_iq
                     count += 1
                     count_iq += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'inquries_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.inqr, seg='inquries', idx_cols=['idx_IQ'])
         self.column_taboo.append('idx_IQ')
         self.inqr['check1'] = self.inqr.date_inquiry.apply(lambda x: (x[:2].isdigit() and x[3:5].isdigit() and x[6:].isdigit()) if len(x.strip()) == 10 else True)
         self.inqr['check2'] = self.inqr.member_number.apply(lambda x: (x.strip()[:3].isdigit() and x.strip()[3:5].isalpha() and x.strip()[5:].isdigit()) or x.strip() == '')
@@ -1344,14 +1239,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             cd_index, cd_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_CD'])
-            self.data.loc[ncol, 'consumer_declaration_nrecords'] = cd_records
             if cd_index != 0:
-                flag = ''
                 count_cd = 1
                 for i in cd_index:
                     segment = mfile[i:]
-                    fg = f'CD{bp}{dt_str}{str(count).zfill(10)}'
-                    self.csdc.loc[count, 'match_flag'] = fg
                     self.csdc.loc[count, 'bus_ptnr'] = bp
                     self.csdc.loc[count, 'file_date'] = dt
                     self.csdc.loc[count, 'date_reported'] = segment[3:10]
@@ -1367,8 +1258,7 @@ class FFFParser:
                     self.csdc.loc[count, 'order_in_segment'] = count_cd
                     count += 1
                     count_cd += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'consumer_declaration_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.csdc, seg='consumer_declaration', idx_cols=['idx_CD'])
         self.column_taboo.append('idx_CD')
         self.csdc['check1'] = self.csdc.date_reported.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if len(x.strip()) == 7 else False)
         self.csdc['check2'] = self.csdc.date_purged.apply(lambda x: x[:2].isdigit() and x[3:].isdigit() if len(x.strip()) == 7 else False)
@@ -1388,14 +1278,10 @@ class FFFParser:
         for ncol in self.data.index:
             bp, dt, dt_str, mfile = self._parse_entry_details(ncol=ncol)
             bs_index, bs_records = self._parse_seg_index(ncol=ncol, seg_list = ['idx_BS'])
-            self.data.loc[ncol, 'bureau_score_nrecords'] = bs_records
             if bs_records != 0:
-                flag = ''
                 count_bs = 1
                 for i in bs_index:
                     segment = mfile[i:]
-                    fg = f'BS{bp}{dt_str}{str(count).zfill(10)}'
-                    self.busc.loc[count, 'match_flag'] = fg
                     self.busc.loc[count, 'bus_ptnr'] = bp
                     self.busc.loc[count, 'file_date'] = dt
                     self.busc.loc[count, 'product_score'] = segment[3:8]
@@ -1411,8 +1297,7 @@ class FFFParser:
                     self.busc.loc[count, 'order_in_segment'] = count_bs
                     count += 1
                     count_bs += 1
-                    flag += f'{fg}, '
-                self.data.loc[ncol, 'bureau_score_flag'] = flag[:-2]
+        self._attach_match_flags(table=self.busc, seg='bureau_score', idx_cols=['idx_BS'])
         self.column_taboo.append('idx_BS')
         self.busc['check1'] = self.busc.product_score.apply(lambda x: x.strip().isdigit() if x[0] not in ['+', '-'] else x.strip()[1:].isdigit())
         self.busc = self.busc.loc[self.busc.check1]
@@ -0,0 +1,148 @@
+import sys
+import random
+import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+# Synthetic FFF reports: a header (with its segment counter) and fixed-width segments at the layout positions of
+# fff_layouts.py, enough for the address, name, employment, collection, trade_check, inquries and bureau_score tables
+COUNTER_ORDER = ['CA', 'FA', 'F2', 'AK', 'FN', 'DT', 'ES', 'EF', 'E2', '', '', 'OI', 'BP', 'CO', 'FM', 'LI', 'FO', 'NR',
+                 'MI', 'TL', 'FC', 'GN', 'TC', 'NT', 'CS', 'FB', 'FI', 'LO', 'IQ', 'CD', 'BS']
+
+
+def _put(buffer: list, start: int, text: str):
+    buffer[start:start + len(text)] = list(text)
+
+
+def _segment(code: str, fields: dict, width: int = 480) -> str:
+    buffer = [' '] * width
+    _put(buffer, 0, code)
+    for start, text in fields.items():
+        _put(buffer, start, text)
+    return ' ' + ''.join(buffer)
+
+
+def _header(counts: dict, rnd: random.Random) -> str:
+    buffer = [' '] * 400
+    _put(buffer, 0, 'FULL')
+    _put(buffer, 5, 'REF%09d' % rnd.randint(0, 10 ** 9))
+    _put(buffer, 43, '01/02/2010')
+    _put(buffer, 54, '03/04/2020')
+    _put(buffer, 65, '05/06/2024')
+    _put(buffer, 80, 'SMITH')
+    _put(buffer, 106, 'JOHN')
+    _put(buffer, 172, '07/08/1980')
+    _put(buffer, 240, ''.join('%02d' % counts.get(code, 0) for code in COUNTER_ORDER))
+    return ''.join(buffer)
+
+
+def make_report(rnd: random.Random, employment: bool = True) -> str:
+    segments, counts = [], {}
+
+    def add(code, fields):
+        segments.append(_segment(code, fields))
+        counts[code] = counts.get(code, 0) + 1
+
+    add('CA', {3: '123', 14: 'MAIN ST', 80: 'TORO', 101: 'ON', 104: 'M1M1M1', 111: '05', 114: '2019', 118: 'X'})
+    for _ in range(rnd.randint(0, 2)):
+        add('FA', {3: '9', 14: 'OLD RD', 80: 'OTT', 101: 'ON', 104: 'K1K1K1', 111: '01', 114: '2015'})
+    add('AK', {3: 'SMITH', 29: 'JON', 61: 'JR', 96: 'L'})
+    if employment:
+        add('ES', {3: 'ENGINEER', 38: 'ACME', 80: 'TORONTO', 89: 'ON', 92: '01', 95: '2018', 100: '02', 103: '2019',
+                   108: 'V', 110: '$5K', 119: '  ', 122: '    '})
+    for _ in range(rnd.randint(0, 2)):
+        add('CO', {3: 'A', 5: '01', 8: '2020', 13: 'COLLECTOR', 52: '123AB45678', 63: '$1200', 70: '$300', 77: 'P',
+                   80: 'AB', 83: 'CD', 86: 'FN', 89: 'X', 107: '1ACCT'})
+    for _ in range(rnd.randint(1, 5)):
+        add('TC', {3: 'A', 5: 'I', 6: '*', 8: 'BANK', 29: '416', 33: '555-1234', 47: '123AB45678', 58: '01', 61: '2022',
+                   66: '03', 69: '2010', 74: '5K', 80: '200', 85: '1200', 91: '0', 97: 'R', 98: '1', 100: '00',
+                   103: '00', 106: '00', 109: '12', 112: '04', 115: '2024', 120: 'ACC123', 161: '2', 163: '05',
+                   166: '2023'})
+    for _ in range(rnd.randint(1, 4)):
+        add('IQ', {3: '01/15/2024', 14: 'LENDER', 35: '416', 39: '555-0000', 53: '123AB45678'})
+    add('BS', {3: '00712', 9: '01', 12: '02', 15: '03', 18: '04', 77: '90'})
+    return _header(counts, rnd) + ''.join(segments)
+
+
+# the fetched frame of one month, as FFF_NAME returns it
+def make_frame(n: int = 20, seed: int = 0, employment: bool = True) -> pd.DataFrame:
+    rnd = random.Random(seed)
+    return pd.DataFrame([{'id': f'ID{k:06d}', 'file_name': f'f{k}.txt', 'file_date': datetime.date(2024, 1, 1 + k % 28),
+                          'business_partner_id': f'BP{k % (n // 2 + 1):05d}',
+                          'file_raw_content': 'XXXX' + make_report(rnd, employment=employment)} for k in range(n)])
+
+
+class _Job:
+    def __init__(self, frame: pd.DataFrame = None):
+        self.frame = frame
+        self.page_size = None
+
+    def result(self, page_size: int = None, **kwargs):
+        self.page_size = page_size
+        return self
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self.frame
+
+    def to_dataframe_iterable(self):
+        for start in range(0, len(self.frame), self.page_size):
+            yield self.frame.iloc[start:start + self.page_size].reset_index(drop=True)
+
+
+# Stand-in for bigquery.Client recording what a run does: the fetch queries return `frame`, the created tables are
+# kept in `created` (table id -> bigquery.Table), the loaded rows in `loaded` (table id -> row counts) and `frames`
+# (table id -> loaded DataFrames), and every other query (the overwrite swaps) in `scripts`
+class RecordingClient:
+    def __init__(self, frame: pd.DataFrame = None):
+        self.frame = frame if frame is not None else make_frame()
+        self.created = {}
+        self.loaded = {}
+        self.frames = {}
+        self.scripts = []
+
+    def query(self, query: str, job_config=None, **kwargs):
+        if query.lstrip().startswith('SELECT'):
+            return _Job(self.frame)
+        self.scripts.append(query)
+        return _Job()
+
+    def create_table(self, table, exists_ok: bool = False, **kwargs):
+        table_id = str(table.reference)
+        if table_id in self.created and not exists_ok:
+            raise ValueError(f'{table_id} already exists')
+        return self.created.setdefault(table_id, table)
+
+    def load_table_from_dataframe(self, frame, table_id: str, job_config=None, **kwargs):
+        self.loaded.setdefault(table_id, []).append(len(frame))
+        self.frames.setdefault(table_id, []).append(frame.copy())
+        return _Job()
+
+    def load_table_from_file(self, file, table_id: str, job_config=None, **kwargs):
+        import pyarrow.parquet as pq
+        frame = pq.read_table(file).to_pandas()
+        self.loaded.setdefault(table_id, []).append(len(frame))
+        self.frames.setdefault(table_id, []).append(frame)
+        return _Job()
+
+    def copy_table(self, sources, destination, job_config=None, **kwargs):
+        return _Job()
+
+    def delete_table(self, table, not_found_ok: bool = False):
+        pass
+
+    def get_job(self, job_id: str):
+        from google.api_core.exceptions import NotFound
+        raise NotFound(f'job {job_id} not found')
+
+
+@pytest.fixture
+def client(monkeypatch) -> RecordingClient:
+    import parser_with_filters
+    client = RecordingClient()
+    monkeypatch.setattr(parser_with_filters, 'get_client', lambda project_id=None: client)
+    return client
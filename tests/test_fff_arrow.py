@@ -0,0 +1,22 @@
+import pyarrow as pa
+
+import fff_arrow
+from conftest import make_frame
+from fff_engine import compile_segment
+from parser_with_filters import FFFParser
+
+
+def test_convert_empty_segment():
+    compiled = compile_segment('employment')
+    table, _ = fff_arrow.extract_segment_arrow(compiled, [], [], [], index={code: [] for code, *_ in compiled.codes})
+    table = fff_arrow.convert_segment_arrow(compiled, fff_arrow.validate_segment_arrow(compiled, table, [], []), [])
+    assert table.num_rows == 0
+    assert table.schema.field('monthly_salary').type == pa.int64()
+
+
+def test_arrow_engine_chunk_without_segment_records(client):
+    client.frame = make_frame(employment=False)
+    parser = FFFParser(2024, 1, which_tables=['address', 'employment'], project_id='p', dataset_id='d', engine='arrow')
+    parser.push_tables_to_google_bigquery()
+    assert parser.error_log_info['left_pushed'] == []
+    assert sum(client.loaded['p.d.fff_segment_1_2_3_address']) > 0
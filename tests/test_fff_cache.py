@@ -0,0 +1,96 @@
+import pandas as pd
+
+import fff_lookup
+from conftest import make_frame
+from fff_cache import ParseCache, RawCache
+from fff_engine import CompiledSegment, compile_segment, parse_report
+from fff_layouts import SEGMENT_LAYOUTS
+from parser_with_filters import FFFParser
+
+
+def test_layout_change_gives_another_version():
+    layout = dict(SEGMENT_LAYOUTS['employment'])
+    assert CompiledSegment('employment', layout).version == compile_segment('employment').version
+    column, source, _, dtype = layout['converters'][0]
+    layout['converters'] = [(column, source, lambda value: value.strip(), dtype)] + layout['converters'][1:]
+    assert CompiledSegment('employment', layout).version != compile_segment('employment').version
+
+
+def test_records_of_another_version_are_not_reused(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    cache.put_many({'h1': [{'occupation': 'ENGINEER'}]}, 'employment', 'v1')
+    assert cache.get_many(['h1'], 'employment', 'v1') == {'h1': [{'occupation': 'ENGINEER'}]}
+    assert cache.get_many(['h1'], 'employment', 'v2') == {}
+    cache.clear('employment')
+    assert cache.get_many(['h1'], 'employment', 'v1') == {}
+    cache.close()
+
+
+def test_writer_keeps_a_column_all_null_on_the_first_page(tmp_path):
+    cache = RawCache(str(tmp_path))
+    frame = make_frame(6)
+    frame['file_name'] = pd.Series([None, None, None, 'f3.txt', None, 'f5.txt'], dtype=object)
+    writer = cache.writer('SELECT 1', 202401, 202401)
+    writer.write(frame.iloc[:3].reset_index(drop=True))
+    writer.write(frame.iloc[3:].reset_index(drop=True))
+    writer.commit()
+    cached = cache.get('SELECT 1')
+    assert cached.num_rows == 6
+    assert cached['file_name'].to_pylist() == [None, None, None, 'f3.txt', None, 'f5.txt']
+    assert cached['file_date'].to_pylist() == frame['file_date'].tolist()
+    cache.close()
+
+
+def test_cache_hit_pushes_the_same_tables_without_querying(client, tmp_path, monkeypatch):
+    queries = []
+    query = client.query
+    monkeypatch.setattr(client, 'query', lambda sql, **kwargs: queries.append(sql) or query(sql, **kwargs))
+    client.frame = make_frame(12)
+    client.frame.loc[3, 'file_raw_content'] = 'no report here'
+    runs = []
+    for _ in range(2):
+        client.frames.clear()
+        FFFParser(2024, 1, which_tables=['employment'], project_id='p', dataset_id='d',
+                  raw_cache_dir=str(tmp_path)).push_tables_to_google_bigquery()
+        runs.append({table_id: frames[0] for table_id, frames in client.frames.items()})
+    assert sum(sql.lstrip().startswith('SELECT') for sql in queries) == 1
+    assert runs[0].keys() == runs[1].keys()
+    for table_id, frame in runs[0].items():
+        assert frame.astype(str).equals(runs[1][table_id].astype(str))
+    assert len(runs[1]['p.d.fff_segment_0_header']) == 11
+
+
+def test_lookup_closes_the_cache_it_opened(tmp_path, monkeypatch):
+    cache = RawCache(str(tmp_path))
+    cache.put('SELECT 1', make_frame(4), 202401, 202401)
+    cache.close()
+    closed = []
+    monkeypatch.setattr(RawCache, 'close', lambda self: closed.append(self) or self.conn.close())
+    reports = fff_lookup.lookup(str(tmp_path), id='ID000002', which_tables=['employment'])
+    assert [report['id'] for report in reports] == ['ID000002'] and len(reports[0]['records']['employment']) > 0
+    assert len(closed) == 1
+
+
+def test_lookup_finds_a_consumer_across_cached_fetches(client, tmp_path):
+    import datetime
+    january, february = make_frame(6, seed=1), make_frame(6, seed=2)
+    february['id'] = february['id'].str.replace('ID', 'FB')
+    february['file_date'] = [datetime.date(2024, 2, 3)] * 6
+    # January is cached twice, as a month and in a two-month range
+    for frame, months in [(january, (2024, 1)), (february, (2024, 2)), (january, (2024, 1, 2024, 2))]:
+        client.frame = frame
+        FFFParser(*months, which_tables=['inquries'], project_id='p', dataset_id='d',
+                  raw_cache_dir=str(tmp_path)).push_tables_to_google_bigquery()
+    cache = RawCache(str(tmp_path))
+    assert len(cache.entries()) == 3
+    reports = fff_lookup.lookup(cache, business_partner_id='BP00001', which_tables=['inquries'])
+    assert [(report['id'], str(report['file_date'])) for report in reports] == \
+        [('ID000001', '2024-01-02'), ('ID000005', '2024-01-06'), ('FB000001', '2024-02-03'), ('FB000005', '2024-02-03')]
+    for report in reports:
+        frame = january if report['id'].startswith('ID') else february
+        raw = frame.loc[frame['id'] == report['id'], 'file_raw_content'].iloc[0]
+        assert report['records'] == parse_report(raw, report['id'], report['file_date'], which_tables=['inquries'])
+    february_only = fff_lookup.lookup(cache, business_partner_id='BP00001', start='2024-02-01', which_tables=['inquries'])
+    assert [report['id'] for report in february_only] == ['FB000001', 'FB000005']
+    assert fff_lookup.lookup(cache, id='ID000003')[0]['business_partner_id'] == 'BP00003'
+    cache.close()
@@ -0,0 +1,110 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import COUNTER_ORDER, make_frame
+from fff_engine import (HEADER_FIELDS, ParsePlan, compile_segment, decode_segment_counter, extract_segment,
+                        parse_report)
+from parser_with_filters import FFFParser
+
+GOLDEN = Path(__file__).parent / 'golden'
+TABLES = ['address', 'name', 'employment', 'collection', 'trade_check', 'inquries', 'bureau_score']
+
+
+# tests/golden holds the tables the hand-written _parse_* methods (before the layout engine) pushed for
+# make_frame(30, seed=7), as strings with missing values written empty; the baseline trade_check also pushed its check1/check2 columns, left out there
+@pytest.mark.parametrize('path', sorted(GOLDEN.glob('*.csv')), ids=lambda path: path.stem)
+def test_engine_matches_the_hand_written_parser(client, path):
+    client.frame = make_frame(30, seed=7)
+    FFFParser(2024, 1, which_tables=TABLES, project_id='p', dataset_id='d', push_rejected=False).push_tables_to_google_bigquery()
+    expected = pd.read_csv(path, dtype=str, keep_default_na=False)
+    parsed = pd.concat(client.frames[f'p.d.{path.stem}'], ignore_index=True).drop(columns=['mfile'], errors='ignore')
+    assert list(parsed.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(parsed.astype(str).fillna(''), expected)
+
+
+# the report of make_frame with the segment_counter entry of `code` replaced by `count`
+def _with_declared(code: str, count: int):
+    frame = make_frame(1)
+    raw = frame.at[0, 'file_raw_content']
+    start = raw.index('FULL') + 240 + 2 * COUNTER_ORDER.index(code)
+    frame.at[0, 'file_raw_content'] = raw[:start] + '%02d' % count + raw[start + 2:]
+    mfiles = [raw[raw.index('FULL'):] for raw in frame['file_raw_content']]
+    return mfiles, frame['id'].tolist(), frame['file_date'].tolist()
+
+
+def _extract(seg: str, mfiles: list, ids: list, dates: list):
+    plan = ParsePlan([seg], header_fields=['segment_counter'])
+    declared = decode_segment_counter(pd.Series([mfile[240:302] for mfile in mfiles]))
+    index = plan.tokenize(mfiles, declared=declared, seg=seg)
+    return extract_segment(plan.segments[seg], mfiles, ids, dates, index=index, declared=declared)
+
+
+def test_records_under_a_code_declared_zero_are_kept_and_reported():
+    mfiles, ids, dates = _with_declared('IQ', 0)
+    n_found = mfiles[0].count(' IQ ')
+    assert n_found > 0
+    table, mismatches = _extract('inquries', mfiles, ids, dates)
+    assert len(table) == n_found
+    assert mismatches == [(0, 'IQ', 0, n_found)]
+
+
+def test_fewer_records_than_declared_are_reported():
+    mfiles, ids, dates = _with_declared('IQ', 9)
+    table, mismatches = _extract('inquries', mfiles, ids, dates)
+    n_found = mfiles[0].count(' IQ ')
+    assert len(table) == n_found and table['order_in_segment'].tolist() == list(range(1, n_found + 1))
+    assert mismatches == [(0, 'IQ', 9, n_found)]
+
+
+def test_matching_counts_give_no_mismatch():
+    mfiles, ids, dates = _with_declared('IQ', make_frame(1).at[0, 'file_raw_content'].count(' IQ '))
+    table, mismatches = _extract('inquries', mfiles, ids, dates)
+    assert mismatches == [] and np.all(table['segment_code'] == 'IQ')
+
+
+def test_plan_holds_only_the_requested_tables(client):
+    plan = ParsePlan(['inquries', 'address'])
+    assert list(plan.segments) == ['inquries', 'address']
+    assert list(plan.codes) == ['IQ', 'CA', 'FA', 'F2']
+    assert plan.segments['address'].check_names == compile_segment('address').check_names
+    parser = FFFParser(2024, 1, which_tables=['inquries'], push_header=False, project_id='p', dataset_id='d')
+    assert list(parser.plan.codes) == ['IQ'] and list(parser.header_cols_dict) == ['segment_counter']
+    assert list(FFFParser(2024, 1, which_tables=['inquries'], project_id='p', dataset_id='d').header_cols_dict) == list(HEADER_FIELDS)
+
+
+def test_tokenize_skips_reports_declaring_no_records():
+    mfiles, _, _ = _with_declared('FA', 0)
+    mfiles = [mfile.replace(' FA ', ' XX ') for mfile in mfiles] + mfiles
+    declared = decode_segment_counter(pd.Series([mfile[240:302] for mfile in mfiles]))
+    plan = ParsePlan(['address'])
+    pattern, shift, pos = plan.codes['FA']
+    searched = []
+    plan.codes['FA'] = (type('Pattern', (), {'finditer': lambda self, text: searched.append(text) or pattern.finditer(text)})(),
+                        shift, pos)
+    index = plan.tokenize(mfiles, declared=declared)
+    # the first report declares no FA and holds none, the second declares none but holds some: both are searched
+    # together once, and only the second one on its own
+    assert searched == ['\n'.join(mfiles), mfiles[1]]
+    assert index['FA'][0] == [] and len(index['FA'][1]) == mfiles[1].count(' FA ') > 0
+    assert index['CA'] == [[mfile.index(' CA ') + 1] for mfile in mfiles]
+
+
+def test_parse_report_gives_the_records_of_the_batch_parser(client):
+    client.frame = make_frame(6, seed=2)
+    FFFParser(2024, 1, which_tables=['inquries', 'trade_check'], project_id='p', dataset_id='d',
+              push_rejected=False).push_tables_to_google_bigquery()
+    for seg, table in [('inquries', 'fff_segment_29_inquries'), ('trade_check', 'fff_segment_23_trade_check_for_check')]:
+        pushed = pd.concat(client.frames[f'p.d.{table}'], ignore_index=True)
+        for _, row in client.frame.iterrows():
+            records = parse_report(row['file_raw_content'], row['id'], row['file_date'], which_tables=[seg])[seg]
+            assert len(records) > 0
+            expected = pushed.loc[pushed['bus_ptnr'] == row['id'], list(records[0])].reset_index(drop=True)
+            pd.testing.assert_frame_equal(pd.DataFrame(records).astype(str), expected.astype(str), check_dtype=False)
+
+
+def test_parse_report_without_a_full_report_is_empty():
+    assert parse_report(None, 'ID1', None, which_tables=['inquries', 'name']) == {'inquries': [], 'name': []}
+    assert parse_report('no report', 'ID1', None, which_tables=['inquries']) == {'inquries': []}
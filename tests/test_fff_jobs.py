@@ -0,0 +1,47 @@
+from fff_jobs import JobQueue, run_worker
+from fff_schemas import get_registry
+
+
+def test_worker_runs_tasks_outside_its_own_tables(client, tmp_path):
+    db_path = str(tmp_path / 'queue.sqlite')
+    queue = JobQueue(db_path)
+    queue.enqueue([(2024, 1)], ['address', 'inquries'], push_header=True)
+    queue.close()
+    assert run_worker(db_path, worker='w1', which_tables=['address'], push_header=False, project_id='p', dataset_id='d') == 3
+    queue = JobQueue(db_path)
+    assert queue.status() == {'done': 3}
+    queue.close()
+    for seg in ('address', 'inquries', 'header'):
+        assert sum(client.loaded[f'p.d.{get_registry()[seg].table}']) > 0, seg
+
+
+def test_failed_header_task_is_retried_on_a_fresh_parser(client, tmp_path, monkeypatch):
+    from google.api_core import exceptions
+    header = f'p.d.{get_registry()["header"].table}'
+    load, query = client.load_table_from_dataframe, client.query
+    failed, fetches = [], []
+
+    def load_once_broken(frame, table_id, job_config=None, **kwargs):
+        if table_id == header and len(failed) == 0:
+            failed.append(table_id)
+            raise exceptions.BadRequest('load rejected')
+        return load(frame, table_id, job_config, **kwargs)
+
+    def counted_query(q, job_config=None, **kwargs):
+        if q.lstrip().startswith('SELECT'):
+            fetches.append(q)
+        return query(q, job_config, **kwargs)
+
+    monkeypatch.setattr(client, 'load_table_from_dataframe', load_once_broken)
+    monkeypatch.setattr(client, 'query', counted_query)
+    db_path = str(tmp_path / 'queue.sqlite')
+    queue = JobQueue(db_path)
+    queue.enqueue([(2024, 1)], ['address'], push_header=True)
+    queue.close()
+    assert run_worker(db_path, worker='w1', which_tables=['address'], project_id='p', dataset_id='d') == 3
+    queue = JobQueue(db_path)
+    assert queue.status() == {'done': 2}
+    assert [task['attempts'] for task in queue.throughput()] == [1, 2]
+    queue.close()
+    assert len(fetches) == 2
+    assert client.loaded[header] == [20]
@@ -0,0 +1,31 @@
+from fff_query import build_fetch_query
+
+
+def test_single_month_is_limited_once():
+    query = build_fetch_query('src', 2024, 1)
+    assert query.count('LIMIT') == 1 and 'LIMIT 1000' in query
+    assert query.index('ORDER BY') < query.index('LIMIT')
+
+
+def test_debug_mode_lowers_the_limit_instead_of_adding_one():
+    for query in [build_fetch_query('src', 2024, 1, debug_mode=True), build_fetch_query('src', 2024, 1, 2024, 6, debug_mode=True)]:
+        assert query.count('LIMIT') == 1 and 'LIMIT 200' in query
+    assert 'LIMIT' not in build_fetch_query('src', 2024, 1, 2024, 6)
+
+
+def test_shards_split_the_limited_rows():
+    queries = [build_fetch_query('src', 2024, 1, shards=[('id', index, 3)], ordered=False) for index in range(3)]
+    for index, query in enumerate(queries):
+        assert query.count('LIMIT 1000') == 1
+        limited, split = query.split('LIMIT 1000')
+        assert 'ORDER BY business_partner_id, file_date' in limited and 'FARM_FINGERPRINT' not in limited
+        assert f'MOD(ABS(FARM_FINGERPRINT(CAST(id AS STRING))), 3) = {index}' in split and 'ORDER BY' not in split
+    # the shards differ only by their bucket
+    assert queries[1] == queries[0].replace('3) = 0', '3) = 1')
+
+
+def test_shards_of_a_range_filter_the_rows_directly():
+    query = build_fetch_query('src', 2024, 1, 2024, 3, shards=[('id', 1, 4), ('business_partner_id', 0, 2)])
+    assert 'LIMIT' not in query and query.count('SELECT') == 1
+    assert query.index('= 1 AND') < query.index('ORDER BY')
+    assert 'MOD(ABS(FARM_FINGERPRINT(CAST(business_partner_id AS STRING))), 2) = 0' in query
@@ -0,0 +1,54 @@
+from google.cloud import bigquery
+
+import fff_schemas
+from conftest import RecordingClient
+from fff_schemas import SchemaRegistry, get_client, get_registry
+from fffparser import main
+from parser_with_filters import FFFParser, backfill
+
+
+def _assert_layout(table: bigquery.Table, clustering: list):
+    assert table.time_partitioning.type_ == bigquery.TimePartitioningType.MONTH
+    assert table.time_partitioning.field == 'file_date'
+    assert table.clustering_fields == clustering
+
+
+def test_every_registry_table_is_partitioned_and_clustered(client):
+    assert main(['run', '--begin', '2024-01', '--overwrite', '--project', 'p', '--dataset', 'd']) == 0
+    for name, spec in get_registry().tables.items():
+        table = client.created[f'p.d.{spec.table}']
+        _assert_layout(table, ['business_partner_id', 'id'] if name == 'header' else ['bus_ptnr'])
+
+
+def test_nested_table_is_partitioned_and_clustered(client):
+    assert main(['run', '--begin', '2024-01', '--tables', 'address', 'inquries', '--nested', '--project', 'p', '--dataset', 'd']) == 0
+    _assert_layout(client.created['p.d.fff_reports'], ['business_partner_id', 'id'])
+
+
+def test_parsers_share_one_client_per_project(monkeypatch):
+    created = []
+    monkeypatch.setattr(fff_schemas.bigquery, 'Client', lambda project=None: created.append(project) or RecordingClient())
+    get_client.cache_clear()
+    try:
+        parsers = [FFFParser(2024, month, which_tables=['inquries'], project_id=project, dataset_id='d', fetch_data=False)
+                   for month, project in [(1, 'p'), (2, 'p'), (3, 'q')]]
+        assert created == ['p', 'q']
+        assert parsers[0].client is parsers[1].client is not parsers[2].client
+        assert parsers[0].registry is parsers[2].registry is get_registry()
+    finally:
+        get_client.cache_clear()
+
+
+def test_injected_client_and_registry_load_with_the_prebuilt_configs(monkeypatch):
+    client, registry = RecordingClient(), SchemaRegistry()
+    configs = []
+    load = client.load_table_from_dataframe
+    monkeypatch.setattr(client, 'load_table_from_dataframe',
+                        lambda frame, table_id, job_config=None, **kwargs: configs.append((table_id, job_config))
+                        or load(frame, table_id, job_config=job_config, **kwargs))
+    backfill([(2024, 1), (2024, 2)], which_tables=['inquries'], project_id='p', dataset_id='d', client=client,
+             registry=registry, push_rejected=False)
+    assert [table_id for table_id, _ in configs] == ['p.d.fff_segment_29_inquries', 'p.d.fff_segment_0_header'] * 2
+    for table_id, job_config in configs:
+        assert job_config is registry.by_table(table_id.split('.')[-1]).job_config
+    assert len(client.loaded['p.d.fff_segment_29_inquries']) == 2
@@ -0,0 +1,53 @@
+import asyncio
+
+from conftest import make_frame
+from fff_service import FFFParseService, run_load_test
+
+
+def _raw_contents() -> list:
+    return make_frame(16)['file_raw_content'].tolist()
+
+
+def test_load_test_fills_batches():
+    async def main():
+        async with FFFParseService(which_tables=['address', 'trade_check'], max_batch_size=8, max_delay_ms=50,
+                                   max_workers=2) as service:
+            stats = await run_load_test(service, _raw_contents(), n_requests=32)
+            return stats, dict(service.run_stats)
+
+    stats, run_stats = asyncio.run(main())
+    assert stats['requests'] == run_stats['requests'] == 32
+    assert stats['batches'] == run_stats['batches'] == run_stats['full_batches'] == 4
+    assert 0 < stats['p50_ms'] <= stats['p99_ms'] <= stats['max_ms']
+    assert stats['throughput_per_s'] > 0
+
+
+def test_spaced_requests_close_batches_on_the_deadline():
+    async def main():
+        async with FFFParseService(which_tables=['address'], max_batch_size=64, max_delay_ms=1, max_workers=1) as service:
+            stats = await run_load_test(service, _raw_contents(), n_requests=5, rate=20)
+            run_stats = dict(service.run_stats)
+            return stats, run_stats, await service.submit(_raw_contents()[0], id='ID000000')
+
+    stats, run_stats, result = asyncio.run(main())
+    assert stats['batches'] == run_stats['deadline_batches'] == 5
+    assert run_stats['full_batches'] == 0
+    assert len(result['address']) > 0 and all(record['bus_ptnr'] == 'ID000000' for record in result['address'])
+
+
+def test_submit_after_stop_starts_a_new_pool():
+    async def main():
+        service = FFFParseService(which_tables=['address'], max_batch_size=4, max_delay_ms=50, max_workers=1)
+        first = await run_load_test(service, _raw_contents(), n_requests=8)
+        await service.stop()
+        assert service.executor is None
+        result = await service.submit(_raw_contents()[1], id='ID000001')
+        second = await run_load_test(service, _raw_contents(), n_requests=4)
+        await service.stop()
+        return first, second, result, dict(service.run_stats)
+
+    first, second, result, run_stats = asyncio.run(main())
+    assert len(result['address']) > 0 and all(record['bus_ptnr'] == 'ID000001' for record in result['address'])
+    # each load test reports its own batches, not those of the service's lifetime
+    assert first['batches'] == 2 and second['batches'] == 1
+    assert run_stats['batches'] == 4 and run_stats['requests'] == 13
@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+
+from fff_shards import manifest_path, merge_shards, run_key
+from fff_sinks import ParquetSink
+from parser_with_filters import FFFParser
+
+
+def _fetch_queries(client, monkeypatch) -> list:
+    queries = []
+    query = client.query
+    monkeypatch.setattr(client, 'query', lambda sql, **kwargs: queries.append(sql) or query(sql, **kwargs))
+    return queries
+
+
+def test_shard_fetches_its_id_bucket_of_the_limited_month(client, tmp_path, monkeypatch):
+    queries = _fetch_queries(client, monkeypatch)
+    FFFParser(2024, 1, which_tables=['employment'], sink=ParquetSink(str(tmp_path)), shard_index=2, shard_count=3)
+    [query] = [sql for sql in queries if sql.lstrip().startswith('SELECT')]
+    assert query.count('LIMIT 1000') == 1
+    assert query.split('LIMIT 1000')[1].strip().startswith(')\n            WHERE MOD(ABS(FARM_FINGERPRINT(CAST(id AS STRING))), 3) = 2')
+
+
+def test_fetch_streams_split_a_shard_by_business_partner(client, tmp_path, monkeypatch):
+    queries = _fetch_queries(client, monkeypatch)
+    FFFParser(2024, 1, 2024, 2, which_tables=['employment'], sink=ParquetSink(str(tmp_path)), shard_index=0,
+              shard_count=2, fetch_streams=2).push_tables_to_google_bigquery()
+    fetches = sorted(sql for sql in queries if sql.lstrip().startswith('SELECT'))
+    assert len(fetches) == 2
+    for k, query in enumerate(fetches):
+        assert 'MOD(ABS(FARM_FINGERPRINT(CAST(id AS STRING))), 2) = 0' in query
+        assert f'MOD(ABS(FARM_FINGERPRINT(CAST(business_partner_id AS STRING))), 2) = {k}' in query
+
+
+def test_finished_shard_writes_its_manifest(client, tmp_path):
+    parser = FFFParser(2024, 1, which_tables=['employment'], sink=ParquetSink(str(tmp_path)), shard_index=1, shard_count=2)
+    parser.push_tables_to_google_bigquery()
+    with open(manifest_path(str(tmp_path), run_key(2024, 1), 1, 2)) as f:
+        manifest = json.load(f)
+    assert manifest['status'] == 'complete' and (manifest['shard_index'], manifest['shard_count']) == (1, 2)
+    assert manifest['tables'] == parser.pushed_rows and manifest['tables']['fff_segment_7_8_9_employment'] == 20
+    assert manifest['segments'] == ['employment']
+    assert {'fff_segment_0_header', 'fff_segment_7_8_9_employment'} <= set(manifest['filters'])
+
+
+def test_merge_refuses_an_incomplete_shard_set(client, tmp_path):
+    sink = ParquetSink(str(tmp_path))
+    FFFParser(2024, 1, which_tables=['employment'], sink=sink, shard_index=0, shard_count=2).push_tables_to_google_bigquery()
+    with pytest.raises(RuntimeError, match=r'shards \[1\] of 2 have not finished'):
+        merge_shards(sink, str(tmp_path), run_key(2024, 1), 2)
+    assert not os.path.exists(os.path.join(str(tmp_path), 'fff_segment_7_8_9_employment'))
+    FFFParser(2024, 1, which_tables=['employment'], sink=sink, shard_index=1, shard_count=2).push_tables_to_google_bigquery()
+    # every shard of the stand-in client gets the whole month
+    assert merge_shards(sink, str(tmp_path), run_key(2024, 1), 2)['fff_segment_7_8_9_employment'] == 40
@@ -0,0 +1,85 @@
+import pytest
+from google.api_core import exceptions
+
+from conftest import RecordingClient, make_frame
+from fff_schemas import get_registry
+from fff_sinks import BatchingSink, BigQuerySink, is_transient
+from parser_with_filters import backfill
+
+
+@pytest.mark.parametrize('error, transient', [
+    (exceptions.ServiceUnavailable('backend error'), True),
+    (exceptions.InternalServerError('internal error'), True),
+    (exceptions.TooManyRequests('quota'), True),
+    (exceptions.Forbidden('rateLimitExceeded: too many table updates'), True),
+    (ConnectionResetError('connection reset'), True),
+    (TimeoutError('read timed out'), True),
+    (exceptions.BadRequest('invalid schema'), False),
+    (exceptions.Forbidden('access denied'), False),
+    (KeyError('file_date'), False),
+    (RuntimeError('bug'), False),
+])
+def test_is_transient(error, transient):
+    assert is_transient(error) == transient
+
+
+class _BrokenClient(RecordingClient):
+    def __init__(self, fail_at: int):
+        super().__init__()
+        self.fail_at = fail_at
+
+    def load_table_from_file(self, file, table_id: str, job_config=None, **kwargs):
+        if sum(len(loads) for loads in self.loaded.values()) == self.fail_at:
+            raise exceptions.BadRequest('load rejected')
+        return super().load_table_from_file(file, table_id, job_config, **kwargs)
+
+
+def _chunked_write(client, upload_dir, write_mode: str):
+    import pyarrow as pa
+    spec = get_registry()['header']
+    frame = make_frame(60)
+    table = pa.table({'id': frame['id'], 'file_date': frame['file_date'], 'business_partner_id': frame['business_partner_id']})
+    sink = BigQuerySink(client, 'p.d', write_mode=write_mode, upload_dir=str(upload_dir), chunk_bytes=table.nbytes // 5,
+                        backoff_seconds=0)
+    sink.write(table, spec)
+    return sink, spec
+
+
+@pytest.mark.parametrize('write_mode', ['append', 'overwrite'])
+def test_chunked_upload_resumes_on_the_destination(tmp_path, write_mode):
+    broken = _BrokenClient(fail_at=2)
+    with pytest.raises(exceptions.BadRequest):
+        _chunked_write(broken, tmp_path, write_mode)
+    assert len(list(tmp_path.glob('*/manifest.json'))) == 1
+    client = RecordingClient()
+    sink, spec = _chunked_write(client, tmp_path, write_mode)
+    loaded = sum(sum(loads) for loads in client.loaded.values())
+    if write_mode == 'append':
+        # the two chunks confirmed before the failure are not loaded again
+        assert loaded + sum(broken.loaded['p.d.fff_segment_0_header']) == 60
+    else:
+        # the staging table of the broken sink is never swapped: every chunk goes to the new one
+        assert list(client.loaded) == [sink._staging['p.d.fff_segment_0_header']] and loaded == 60
+    assert list(tmp_path.iterdir()) == []
+
+
+def _batched_backfill(client, months: list, **kwargs) -> dict:
+    backfill(months, which_tables=['inquries'], project_id='p', dataset_id='d', push_rejected=False,
+             sink=BatchingSink(BigQuerySink(client, 'p.d', backoff_seconds=0), **kwargs))
+    return client.loaded
+
+
+def test_batching_sink_loads_each_table_once_across_months(client):
+    n_inquiries = sum(raw.count(' IQ ') for raw in make_frame()['file_raw_content'])
+    loaded = _batched_backfill(client, [(2024, 1), (2024, 2), (2024, 3)])
+    assert loaded == {'p.d.fff_segment_29_inquries': [3 * n_inquiries], 'p.d.fff_segment_0_header': [60]}
+
+
+def test_batching_sink_checkpoints_on_a_gap_and_on_max_rows(client):
+    # March is missing: January and February go out before April
+    assert _batched_backfill(client, [(2024, 1), (2024, 2), (2024, 4)])['p.d.fff_segment_0_header'] == [40, 20]
+    client.loaded.clear()
+    # the inquiries of three months reach max_rows, the last two months go out with the final flush
+    n_inquiries = sum(raw.count(' IQ ') for raw in make_frame()['file_raw_content'])
+    loaded = _batched_backfill(client, [(2024, month) for month in range(1, 6)], max_rows=2 * n_inquiries + 1)
+    assert loaded == {'p.d.fff_segment_29_inquries': [3 * n_inquiries, 2 * n_inquiries], 'p.d.fff_segment_0_header': [60, 40]}
@@ -0,0 +1,157 @@
+import sys
+import types
+
+import pyarrow as pa
+import pytest
+from google.api_core import exceptions
+
+from fff_schemas import get_registry
+from fff_streaming import LocalWriteClient, StorageWriteClient, StorageWriteSink
+from fffparser import main
+
+
+def _table(n: int) -> pa.Table:
+    import datetime
+    return pa.table({'bus_ptnr': [f'ID{k:06d}' for k in range(n)], 'file_date': [datetime.date(2024, 1, 1)] * n})
+
+
+# the response of every second append is lost after the rows went through
+class _LossyClient(LocalWriteClient):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def append(self, name: str, batch, offset: int):
+        super().append(name, batch, offset)
+        self.calls += 1
+        if self.calls % 2 == 1:
+            raise exceptions.ServiceUnavailable('connection dropped')
+
+
+def test_retried_append_is_not_written_twice():
+    client = _LossyClient()
+    sink = StorageWriteSink(client, 'p.d', max_batch_bytes=64, backoff_seconds=0)
+    sink.write(_table(50), get_registry()['address'])
+    sink.commit()
+    written = client.tables['p.d.fff_segment_1_2_3_address']
+    assert written.num_rows == 50
+    assert written['bus_ptnr'].to_pylist() == [f'ID{k:06d}' for k in range(50)]
+
+
+def test_local_client_ignores_written_offsets_and_rejects_gaps():
+    client = LocalWriteClient()
+    name = client.create_stream('p.d.t', pending=False)
+    client.append(name, _table(3).to_batches()[0], 0)
+    client.append(name, _table(3).to_batches()[0], 0)
+    with pytest.raises(ValueError):
+        client.append(name, _table(3).to_batches()[0], 5)
+    assert client.tables['p.d.t'].num_rows == 3
+
+
+def test_pending_rows_are_hidden_until_commit():
+    client = LocalWriteClient()
+    sink = StorageWriteSink(client, 'p.d', stream_type='pending')
+    sink.write(_table(10), get_registry()['address'])
+    assert client.tables == {}
+    sink.commit()
+    assert client.tables['p.d.fff_segment_1_2_3_address'].num_rows == 10
+
+
+def test_overwrite_is_refused_with_storage_write():
+    assert main(['run', '--begin', '2024-01', '--sink', 'storage-write', '--overwrite']) == 2
+
+
+# google-cloud-bigquery-storage stand-in: the request messages keep their fields as attributes, every AppendRowsStream
+# opened is kept in `connections` with the requests sent on it, and each send raises the next exception of `failures`
+# (None: the append goes through)
+class _Message:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class _Future:
+    def __init__(self, error):
+        self.error = error
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+
+
+class _AppendRowsStream:
+    connections = []
+    failures = []
+
+    def __init__(self, client, template):
+        self.template = template
+        self.sent = []
+        self.closed = False
+        self.connections.append(self)
+
+    def send(self, request):
+        self.sent.append(request)
+        return _Future(self.failures.pop(0) if len(self.failures) > 0 else None)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    import google.cloud
+    message_types = types.SimpleNamespace(
+        AppendRowsRequest=type('AppendRowsRequest', (_Message,), {'ArrowData': _Message}),
+        ArrowSchema=_Message, ArrowRecordBatch=_Message,
+    )
+    module = types.ModuleType('google.cloud.bigquery_storage_v1')
+    module.types = message_types
+    module.writer = types.SimpleNamespace(AppendRowsStream=_AppendRowsStream)
+    module.BigQueryWriteClient = object
+    monkeypatch.setitem(sys.modules, 'google.cloud.bigquery_storage_v1', module)
+    monkeypatch.setattr(google.cloud, 'bigquery_storage_v1', module, raising=False)
+    monkeypatch.setattr(_AppendRowsStream, 'connections', [])
+    monkeypatch.setattr(_AppendRowsStream, 'failures', [])
+    return _AppendRowsStream
+
+
+def _sent_offsets(connection) -> list:
+    return [request.offset for request in connection.sent]
+
+
+def test_first_request_of_a_connection_carries_the_schema(storage):
+    client = StorageWriteClient(client=None, write_client=object())
+    batch = _table(4).to_batches()[0]
+    client.append('s', batch, 0)
+    client.append('s', batch, 4)
+    assert len(storage.connections) == 1
+    connection = storage.connections[0]
+    assert connection.template.write_stream == 's'
+    schema = pa.ipc.read_schema(pa.py_buffer(connection.template.arrow_rows.writer_schema.serialized_schema))
+    assert schema.equals(batch.schema)
+    assert _sent_offsets(connection) == [0, 4]
+    sent = connection.sent[1].arrow_rows.rows
+    assert sent.row_count == 4
+    assert pa.ipc.read_record_batch(pa.py_buffer(sent.serialized_record_batch), schema).equals(batch)
+
+
+def test_retry_at_the_same_offset_already_written_is_not_an_error(storage):
+    storage.failures.extend([exceptions.ServiceUnavailable('response lost'), exceptions.AlreadyExists('offset 0')])
+    client = StorageWriteClient(client=None, write_client=object())
+    client.create_stream = lambda table_id, pending: 's'
+    client.ensure_table = lambda table_id, spec: None
+    sink = StorageWriteSink(client, 'p.d', backoff_seconds=0)
+    sink.write(_table(5), get_registry()['address'])
+    assert [_sent_offsets(connection) for connection in storage.connections] == [[0], [0]]
+    assert sink._streams['p.d.fff_segment_1_2_3_address'][1] == 5
+
+
+def test_connection_is_dropped_after_an_error(storage):
+    storage.failures.append(exceptions.ServiceUnavailable('connection reset'))
+    client = StorageWriteClient(client=None, write_client=object())
+    batch = _table(2).to_batches()[0]
+    with pytest.raises(exceptions.ServiceUnavailable):
+        client.append('s', batch, 0)
+    assert storage.connections[0].closed and 's' not in client._connections
+    client.append('s', batch, 0)
+    assert len(storage.connections) == 2 and storage.connections[1].template.write_stream == 's'
+    assert not storage.connections[1].closed
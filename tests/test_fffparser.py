@@ -0,0 +1,35 @@
+import pytest
+
+from fffparser import main
+from fff_schemas import get_registry
+
+TABLES = ['address', 'employment', 'trade_check', 'inquries']
+
+
+def _table_id(seg: str) -> str:
+    return f'p.d.{get_registry()[seg].table}'
+
+
+def test_no_header_pushes_every_table(client):
+    assert main(['run', '--begin', '2024-01', '--tables', *TABLES, '--no-header', '--project', 'p', '--dataset', 'd']) == 0
+    for seg in TABLES:
+        assert sum(client.loaded.get(_table_id(seg), [])) > 0, seg
+    assert _table_id('header') not in client.loaded
+
+
+def test_no_header_overwrite_swaps_only_the_requested_tables(client):
+    assert main(['run', '--begin', '2024-01', '--tables', *TABLES, '--no-header', '--overwrite',
+                 '--project', 'p', '--dataset', 'd']) == 0
+    for seg in TABLES + ['header', 'name', 'bureau_score']:
+        swapped = any(f'DELETE FROM `{_table_id(seg)}`' in script for script in client.scripts)
+        assert swapped == (seg in TABLES), seg
+
+
+def test_streams_skip_the_whole_month_prefetch(client):
+    queries = []
+    query = client.query
+    client.query = lambda q, job_config=None, **kwargs: queries.append(q) or query(q, job_config, **kwargs)
+    assert main(['run', '--begin', '2024-01', '--tables', *TABLES, '--streams', '3', '--project', 'p', '--dataset', 'd']) == 0
+    fetches = [q for q in queries if q.lstrip().startswith('SELECT')]
+    assert len(fetches) == 3
+    assert all('FARM_FINGERPRINT' in q for q in fetches)
@@ -0,0 +1,64 @@
+import re
+
+import pytest
+
+import parser as legacy
+from conftest import RecordingClient, _segment, make_frame
+
+
+def _frame():
+    frame = make_frame(12, seed=3)
+    extra = [_segment('NR', {3: 'A', 5: '01/2020', 13: 'S', 15: 'AB', 18: 'CD'}),
+             _segment('MI', {3: 'A', 5: '02/2021', 13: 'COURT', 34: '416', 38: '555-1234', 63: 'D', 65: '01/2022'})]
+    # report k holds k % 3 NR and (k + 1) % 3 MI segments
+    frame['file_raw_content'] = [raw + extra[0] * (k % 3) + extra[1] * ((k + 1) % 3)
+                                 for k, raw in enumerate(frame['file_raw_content'])]
+    return frame
+
+
+@pytest.fixture
+def run(monkeypatch):
+    client = RecordingClient(_frame())
+    monkeypatch.setattr(legacy.bigquery, 'Client', lambda project=None: client)
+    parser = legacy.FFFParser(2024, 1, which_tables=['address', 'non_responsibility', 'marital_item'],
+                              project_id='p', dataset_id='d')
+    parser.fetch_data_from_google_bigquery()
+    parser.push_tables_to_google_bigquery()
+    return client
+
+
+# the per-record loop the flags were built with: a running row number over the whole table, the records of a report
+# in the order of its codes, each code's records in their order in the report
+def _loop_flags(frame, codes: list):
+    flags, per_report, count = [], [], 0
+    for _, row in frame.iterrows():
+        mfile = row['file_raw_content'][row['file_raw_content'].index('FULL'):]
+        dt_str = str(row['file_date']).replace('-', '')
+        report = []
+        for code in codes:
+            for _ in re.finditer(f' {code} ', mfile):
+                report.append(f'{code}{row["id"]}{dt_str}{str(count).zfill(10)}')
+                count += 1
+        flags += report
+        per_report.append(', '.join(report))
+    return flags, per_report
+
+
+@pytest.mark.parametrize('seg, codes', [('address', ['CA', 'FA', 'F2']), ('non_responsibility', ['NR']),
+                                        ('marital_item', ['MI'])])
+def test_column_wise_flags_equal_the_loop(run, seg, codes):
+    flags, per_report = _loop_flags(_frame(), codes)
+    [table] = run.frames[f'p.d.fff_{seg}']
+    assert len(table) > 0
+    assert table['match_flag'].tolist() == [flags[k] for k in table.index]
+    [header] = run.frames['p.d.fff_header']
+    assert header[f'{seg}_flag'].tolist() == per_report
+
+
+def test_header_keeps_the_record_count_columns(run):
+    [header] = run.frames['p.d.fff_header']
+    frame = _frame()
+    for seg, code in [('non_responsibility', 'NR'), ('marital_item', 'MI')]:
+        counts = [float(raw.count(f' {code} ')) for raw in frame['file_raw_content']]
+        assert header[f'{seg}_records'].dtype == float
+        assert header[f'{seg}_records'].tolist() == header[f'{seg}_nrecords'].tolist() == counts
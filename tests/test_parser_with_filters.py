@@ -0,0 +1,165 @@
+import pandas as pd
+import pytest
+
+from conftest import make_frame
+from fff_engine import compile_segment
+from fff_schemas import get_registry
+from parser_with_filters import FFFParser
+
+
+# every fifth report has a city too long for check1 of the address segment
+def _frame_with_rejections():
+    frame = make_frame(20)
+    for row in range(0, 20, 5):
+        frame.at[row, 'file_raw_content'] = frame.at[row, 'file_raw_content'].replace('TORO ', 'TORONTO', 1)
+    return frame
+
+
+def _run(**kwargs) -> FFFParser:
+    parser = FFFParser(2024, 1, which_tables=['address'], push_header=False, project_id='p', dataset_id='d', **kwargs)
+    parser.push_tables_to_google_bigquery()
+    return parser
+
+
+def test_cache_hits_are_rejected_like_misses(client, tmp_path):
+    client.frame = _frame_with_rejections()
+    rejected = get_registry()['address_rejected'].table
+    first = _run(cache_dir=str(tmp_path))
+    second = _run(cache_dir=str(tmp_path))
+    assert first.run_stats['cache_misses'] == 20 and second.run_stats['cache_hits'] == 20
+    assert first.pushed_rows[rejected] == second.pushed_rows[rejected] == 4
+    assert first.run_stats['rejected.address.check1'] == second.run_stats['rejected.address.check1'] == 4
+    assert first.pushed_rows[get_registry()['address'].table] == second.pushed_rows[get_registry()['address'].table]
+
+
+def test_quarantined_records_are_not_rejected(client, monkeypatch):
+    client.frame = _frame_with_rejections()
+    compiled = compile_segment('address')
+
+    def check_city(value):
+        if 'TORONTO' in value:
+            raise ValueError(f'unexpected city {value.strip()}')
+        return len(value.strip()) <= 4
+
+    monkeypatch.setattr(compiled, 'checks', [('check1', 'city', check_city)] + compiled.checks[1:])
+    parser = _run()
+    assert parser.run_stats['quarantined_reports'] == 4
+    assert parser.pushed_rows.get(get_registry()['address_rejected'].table, 0) == 0
+
+
+def test_restart_after_a_failed_header_push(client, monkeypatch):
+    from google.api_core import exceptions
+    header = f'p.d.{get_registry()["header"].table}'
+    load = client.load_table_from_dataframe
+    failed = []
+
+    def load_once_broken(frame, table_id, job_config=None, **kwargs):
+        if table_id == header and len(failed) == 0:
+            failed.append(table_id)
+            raise exceptions.BadRequest('load rejected')
+        return load(frame, table_id, job_config, **kwargs)
+
+    monkeypatch.setattr(client, 'load_table_from_dataframe', load_once_broken)
+    parser = FFFParser(2024, 1, which_tables=['address'], project_id='p', dataset_id='d')
+    with pytest.raises(exceptions.BadRequest):
+        parser.push_tables_to_google_bigquery()
+    assert parser.error_log_info['left_pushed'] == ['header']
+    parser.restart_from_break()
+    assert parser.error_log_info['left_pushed'] == [] and parser.error_log_info['committed']
+    assert client.loaded[header] == [20]
+    assert sum(client.loaded[f'p.d.{get_registry()["address"].table}']) == parser.pushed_rows['fff_segment_1_2_3_address']
+
+
+def _pushed_tables(client, **kwargs) -> dict:
+    client.frames.clear()
+    FFFParser(2024, 1, which_tables=['address', 'trade_check', 'inquries'], project_id='p', dataset_id='d',
+              **kwargs).push_tables_to_google_bigquery()
+    return {table_id: pd.concat(frames, ignore_index=True) for table_id, frames in client.frames.items()}
+
+
+def test_chunked_run_pushes_the_unchunked_tables(client):
+    client.frame = make_frame(23, seed=5)
+    whole = _pushed_tables(client)
+    chunked = _pushed_tables(client, chunk_size=4)
+    # one append per chunk (6 chunks, the last one of 3 reports)
+    assert len(client.frames['p.d.fff_segment_29_inquries']) == 6
+    assert whole.keys() == chunked.keys()
+    for table_id, table in whole.items():
+        pd.testing.assert_frame_equal(chunked[table_id].astype(str), table.astype(str), obj=table_id)
+    inquiries = chunked['p.d.fff_segment_29_inquries']
+    for bus_ptnr, orders in inquiries.groupby('bus_ptnr', sort=False)['order_in_segment']:
+        assert orders.tolist() == list(range(1, len(orders) + 1)), bus_ptnr
+
+
+# how far ahead the downloader gets: the fetches done once it is blocked on the full queue while month j is pushed
+@pytest.mark.parametrize('depth', [1, 2])
+def test_backfill_prefetches_up_to_its_depth(client, monkeypatch, depth):
+    import time
+    import parser_with_filters
+    months = [(2024, month) for month in range(1, 6)]
+    fetched, pushed, ahead = [], [], []
+    query = client.query
+    monkeypatch.setattr(client, 'query', lambda sql, **kwargs: (sql.lstrip().startswith('SELECT') and fetched.append(sql))
+                        or query(sql, **kwargs))
+    push = FFFParser.push_tables_to_google_bigquery
+
+    def slow_push(self, *args, **kwargs):
+        expected = min(len(months), len(pushed) + depth + 2)
+        deadline = time.time() + 2
+        while len(fetched) < expected and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        ahead.append(len(fetched))
+        pushed.append((self.begin_year, self.begin_month))
+        return push(self, *args, **kwargs)
+
+    monkeypatch.setattr(FFFParser, 'push_tables_to_google_bigquery', slow_push)
+    parser_with_filters.backfill(months, prefetch_depth=depth, which_tables=['inquries'], project_id='p', dataset_id='d')
+    assert pushed == months
+    assert all(f'SAFE_CAST({month} AS INT64), 1)' in sql for (_, month), sql in zip(months, fetched))
+    # months 0..j, the `depth` waiting in the queue and the one downloaded but not queued yet
+    assert ahead == [min(len(months), j + depth + 2) for j in range(len(months))]
+    assert len(client.loaded['p.d.fff_segment_29_inquries']) == 5
+
+
+def test_nested_output_holds_the_flat_records_of_each_report(client):
+    client.frame = make_frame(10, seed=4)
+    flat = _pushed_tables(client, push_rejected=False)
+    nested = _pushed_tables(client, push_rejected=False, nested_output=True)
+    assert list(nested) == ['p.d.fff_reports']
+    reports = nested['p.d.fff_reports']
+    assert reports['id'].tolist() == flat['p.d.fff_segment_0_header']['id'].tolist() == client.frame['id'].tolist()
+    spec = get_registry().nested_spec(['address', 'trade_check', 'inquries'])
+    assert list(reports.columns) == [field.name for field in spec.schema]
+    assert [(field.field_type, field.mode) for field in spec.schema[-3:]] == [('RECORD', 'REPEATED')] * 3
+    for seg, table_id in [('address', 'p.d.fff_segment_1_2_3_address'), ('inquries', 'p.d.fff_segment_29_inquries')]:
+        table = flat[table_id].astype(object)
+        table = table.where(table.notna(), None)
+        for report_id, segments in zip(reports['id'], reports[seg]):
+            records = table.loc[table['bus_ptnr'] == report_id].drop(columns=['bus_ptnr', 'file_date'])
+            assert len(segments) > 0 and segments == records.to_dict('records'), (seg, report_id)
+
+
+def test_reports_raising_in_a_conversion_are_quarantined(client, monkeypatch):
+    client.frame = make_frame(8, seed=1)
+    broken = ['ID000002', 'ID000005']
+    for row in [2, 5]:
+        client.frame.at[row, 'file_raw_content'] = client.frame.at[row, 'file_raw_content'].replace('01/15/2024', '13/45/2024')
+    compiled = compile_segment('inquries')
+    column, source, convert, dtype = compiled.converters[0]
+
+    def strict(value):
+        if value.startswith('13/45'):
+            raise ValueError(f'no such date {value}')
+        return convert(value)
+
+    monkeypatch.setattr(compiled, 'converters', [(column, source, strict, dtype)])
+    tables = _pushed_tables(client, push_rejected=False)
+    quarantine = tables['p.d.fff_quarantine']
+    assert sorted(set(quarantine['bus_ptnr'])) == broken
+    assert set(zip(quarantine['segment'], quarantine['segment_code'], quarantine['column'], quarantine['error_type'])) == \
+        {('inquries', 'IQ', 'date_inquiry', 'ValueError')}
+    inquiries = tables['p.d.fff_segment_29_inquries']
+    assert sorted(set(inquiries['bus_ptnr'])) == [id for id in client.frame['id'] if id not in broken]
+    # the other segments of a quarantined report are untouched
+    assert set(broken) <= set(tables['p.d.fff_segment_1_2_3_address']['bus_ptnr'])